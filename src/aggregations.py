@@ -0,0 +1,867 @@
+"""Agregações das abas de logística e de estoque, calculadas no PostgreSQL ou em memória"""
+
+import numpy as np
+import pandas as pd
+
+from database import build_filters
+from sketches import (
+    SKETCH_INDICE_SQL,
+    build_sketch,
+    merge_sketches,
+    sketch_quantiles,
+)
+
+VARS_CORRELACAO = ["Tempo_Resposta_Real", "Custo_Logistico_USD", "Emissao_CO2_kg"]
+
+# Colunas com percentis estimados por sketches (ver `sketches.py`), guardados
+# por região×estado×mês e combinados para cada recorte exibido
+VARS_PERCENTIS = ["Tempo_Resposta_Real", "Custo_Logistico_USD"]
+CHAVES_SKETCH = ["Regiao", "Estado", "Mes"]
+
+COLUNAS_SQL = {
+    "Tempo_Resposta_Previsto": "tempo_resposta_previsto",
+    "Tempo_Resposta_Real": "tempo_resposta_real",
+    "Custo_Logistico_USD": "custo_logistico_usd",
+    "Emissao_CO2_kg": "emissao_co2_kg",
+}
+
+LOGISTICA_SKETCH_SQL = """
+    SELECT
+        data,
+        regiao,
+        estado,
+        {indice} AS indice,
+        COUNT(*) AS contagem
+    FROM logistica
+    WHERE status != 'Em Rota' AND {coluna} IS NOT NULL
+    GROUP BY 1, 2, 3, 4
+"""
+
+LOGISTICA_GROUPING_SQL = """
+    WITH base AS (
+        SELECT
+            data,
+            regiao,
+            estado,
+            status,
+            tempo_resposta_previsto,
+            tempo_resposta_real,
+            custo_logistico_usd,
+            emissao_co2_kg
+        FROM logistica
+        WHERE {where}
+    )
+    SELECT
+        GROUPING(data, regiao, status, estado) AS grupo,
+        data,
+        regiao,
+        status,
+        estado,
+        COUNT(*) AS linhas,
+        COUNT(*) FILTER (WHERE status = 'Atrasado') AS atrasados,
+        COUNT(tempo_resposta_previsto) AS n_tempo_resposta_previsto,
+        SUM(tempo_resposta_previsto)::float8 AS soma_tempo_resposta_previsto,
+        COUNT(tempo_resposta_real) AS n_tempo_resposta_real,
+        SUM(tempo_resposta_real)::float8 AS soma_tempo_resposta_real,
+        COUNT(custo_logistico_usd) AS n_custo_logistico_usd,
+        SUM(custo_logistico_usd)::float8 AS soma_custo_logistico_usd,
+        COUNT(emissao_co2_kg) AS n_emissao_co2_kg,
+        SUM(emissao_co2_kg)::float8 AS soma_emissao_co2_kg
+    FROM base
+    GROUP BY GROUPING SETS ((), (data), (regiao, status), (regiao), (estado))
+"""
+
+# Máscara de GROUPING(data, regiao, status, estado): bit 1 = coluna agregada
+GRUPO_TOTAL = 0b1111
+GRUPO_DATA = 0b0111
+GRUPO_REGIAO_STATUS = 0b1001
+GRUPO_REGIAO = 0b1011
+GRUPO_ESTADO = 0b1110
+
+
+def _resumo(linhas, atrasados, medias, custo_total):
+    return {
+        "linhas": int(linhas),
+        "atrasados": int(atrasados),
+        "tempo_medio_real": medias["Tempo_Resposta_Real"],
+        "tempo_medio_previsto": medias["Tempo_Resposta_Previsto"],
+        "custo_total": custo_total,
+        "emissao_media": medias["Emissao_CO2_kg"],
+    }
+
+
+def group_statistics(df, chaves, colunas):
+    """Calcula somas e contagens de várias colunas com um único groupby.
+
+    O resultado tem uma linha por combinação de `chaves`, com `linhas`,
+    `soma_<coluna>` e `n_<coluna>` (valores não nulos). Por serem aditivas,
+    essas estatísticas podem ser reagregadas com `rollup` para chaves mais
+    grossas sem percorrer as linhas de novo.
+    """
+    grupos = df.groupby(chaves, observed=True)
+    somas = grupos[colunas].sum()
+    contagens = grupos[colunas].count()
+
+    estatisticas = {"linhas": grupos.size()}
+    for coluna in colunas:
+        # Somas em float64 para que a reagregação não acumule erro de float32
+        soma = somas[coluna]
+        estatisticas[f"soma_{coluna}"] = (
+            soma.astype("float64") if soma.dtype.kind == "f" else soma
+        )
+        estatisticas[f"n_{coluna}"] = contagens[coluna]
+    return pd.DataFrame(estatisticas).reset_index()
+
+
+def rollup(estatisticas, chaves=None):
+    """Reagrega o resultado de `group_statistics` para `chaves` ou para o total"""
+    if not chaves:
+        return estatisticas.sum(numeric_only=True)
+    return (
+        estatisticas.groupby(chaves, observed=True).sum(numeric_only=True).reset_index()
+    )
+
+
+def _media(estatisticas, coluna):
+    n = estatisticas[f"n_{coluna}"]
+    return estatisticas[f"soma_{coluna}"] / np.where(n > 0, n, np.nan)
+
+
+def correlation_moments(df, colunas):
+    """Calcula as somas das quais sai a correlação de Pearson entre `colunas`.
+
+    As matrizes são aditivas: somadas entre blocos de linhas, dão a mesma
+    correlação que o bloco inteiro. Como em `DataFrame.corr`, cada par de
+    colunas considera só as linhas em que as duas têm valor.
+    """
+    valores = df[colunas].to_numpy(dtype="float64", na_value=np.nan)
+    presentes = ~np.isnan(valores)
+    valores = np.where(presentes, valores, 0.0)
+    presentes = presentes.astype("float64")
+    return {
+        "colunas": list(colunas),
+        "n": presentes.T @ presentes,
+        # soma[i, j]: soma da coluna i nas linhas em que a coluna j tem valor
+        "soma": valores.T @ presentes,
+        "soma_quadrados": (valores**2).T @ presentes,
+        "soma_produtos": valores.T @ valores,
+    }
+
+
+def combine_moments(momentos):
+    """Soma os momentos de vários blocos de linhas"""
+    combinado = dict(momentos[0])
+    for parte in momentos[1:]:
+        for chave in ("n", "soma", "soma_quadrados", "soma_produtos"):
+            combinado[chave] = combinado[chave] + parte[chave]
+    return combinado
+
+
+def correlation_from_moments(momentos):
+    """Matriz de correlação de Pearson a partir de `correlation_moments`"""
+    n, soma = momentos["n"], momentos["soma"]
+    covariancia = n * momentos["soma_produtos"] - soma * soma.T
+    variancia = n * momentos["soma_quadrados"] - soma**2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        correlacao = covariancia / np.sqrt(variancia * variancia.T)
+    correlacao = np.clip(np.where(np.isfinite(correlacao), correlacao, np.nan), -1, 1)
+    colunas = momentos["colunas"]
+    return pd.DataFrame(correlacao, index=colunas, columns=colunas)
+
+
+def inicio_mes(datas):
+    """Primeiro dia do mês de cada data"""
+    meses = datas.to_numpy().astype("datetime64[M]").astype("datetime64[ns]")
+    return pd.Series(meses, index=datas.index, name=datas.name)
+
+
+def logistica_sketches(df):
+    """Sketches de quantis das colunas de `VARS_PERCENTIS` por região×estado×mês"""
+    df = df.assign(Mes=inicio_mes(df["Data"]))
+    chaves = [coluna for coluna in CHAVES_SKETCH if coluna in df]
+    return {coluna: build_sketch(df, chaves, coluna) for coluna in VARS_PERCENTIS}
+
+
+def percentile_tables(sketches):
+    """Percentis p50/p90/p99 de cada coluna por estado, por região e por mês.
+
+    Retorna um DataFrame por chave, com a chave, `Medida` (a coluna), o
+    número de linhas e os percentis estimados.
+    """
+    tabelas = {}
+    for chave in CHAVES_SKETCH:
+        partes = [
+            sketch_quantiles(sketch, [chave]).assign(Medida=coluna)
+            for coluna, sketch in sketches.items()
+            if chave in sketch.columns
+        ]
+        tabelas[chave] = (
+            pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+        )
+    return tabelas
+
+
+def combine_statistics(partes):
+    """Combina as estatísticas de vários blocos de linhas como se fossem um só.
+
+    Recebe resultados de `logistica_statistics` ou `estoque_statistics`; a
+    memória usada depende do número de grupos, e não do número de linhas.
+    """
+    chaves = partes[0]["chaves"]
+    combinado = {
+        "chaves": chaves,
+        "base": rollup(
+            pd.concat([parte["base"] for parte in partes], ignore_index=True), chaves
+        ),
+        "diario": rollup(
+            pd.concat([parte["diario"] for parte in partes], ignore_index=True),
+            "Data",
+        ),
+        "momentos": combine_moments([parte["momentos"] for parte in partes]),
+    }
+    if "sketches" in partes[0]:
+        combinado["sketches"] = {
+            coluna: merge_sketches(
+                [parte["sketches"][coluna] for parte in partes],
+                [c for c in sketch.columns if c not in ("indice", "contagem")],
+            )
+            for coluna, sketch in partes[0]["sketches"].items()
+        }
+    return combinado
+
+
+def _chave_periodo(datas, granularidade):
+    if granularidade == "semana":
+        # Segunda-feira da semana
+        return datas - pd.to_timedelta(datas.dt.dayofweek, unit="D")
+    if granularidade == "trimestre":
+        return datas.dt.year * 4 + (datas.dt.month - 1) // 3
+    return datas.dt.year * 12 + datas.dt.month - 1
+
+
+def _rotulo_periodo(chaves, granularidade):
+    if granularidade == "semana":
+        return chaves.dt.strftime("%Y-%m-%d")
+    if granularidade == "trimestre":
+        return (chaves // 4).astype(str) + "-T" + (chaves % 4 + 1).astype(str)
+    return (chaves // 12).astype(str) + "-" + (chaves % 12 + 1).astype(str).str.zfill(2)
+
+
+def period_statistics(diario, granularidade="mes"):
+    """Reagrega estatísticas diárias em semanas, meses ou trimestres.
+
+    As chaves de período são inteiras (ou a data da segunda-feira, para
+    semanas) e só viram texto depois da reagregação, uma vez por período.
+    """
+    periodos = rollup(
+        diario.assign(Periodo=_chave_periodo(diario["Data"], granularidade)),
+        "Periodo",
+    )
+    periodos["Periodo"] = _rotulo_periodo(periodos["Periodo"], granularidade)
+    return periodos
+
+
+def logistica_period_series(diario, granularidade="mes"):
+    """Série de tempo, custo, emissão e taxa de atraso por período"""
+    periodos = period_statistics(diario, granularidade)
+    return pd.DataFrame(
+        {
+            "Periodo": periodos["Periodo"],
+            "Tempo_Medio": _media(periodos, "Tempo_Resposta_Real"),
+            "Custo_Medio": _media(periodos, "Custo_Logistico_USD"),
+            "Emissao_Media": _media(periodos, "Emissao_CO2_kg"),
+            "Taxa_Atraso": periodos["atrasados"] / periodos["linhas"] * 100,
+        }
+    )
+
+
+def estoque_period_series(diario, granularidade="mes"):
+    """Série de demanda, estoque, stock out e atendimento por período"""
+    periodos = period_statistics(diario, granularidade)
+    return pd.DataFrame(
+        {
+            "Periodo": periodos["Periodo"],
+            "Demanda_Diaria": periodos["soma_Demanda_Diaria"],
+            "Estoque_Final": _media(periodos, "Estoque_Final"),
+            "Stock_Out": periodos["soma_Stock_Out"],
+            "Taxa_Atendimento": _media(periodos, "Taxa_Atendimento"),
+            "Reabastecimento": periodos["soma_Reabastecimento"],
+        }
+    )
+
+
+# Resoluções das séries diárias, da mais fina para a mais grossa
+RESOLUCOES = ["dia", "semana", "mes", "trimestre"]
+FREQUENCIAS = {"semana": "W", "mes": "M", "trimestre": "Q"}
+
+# Granularidades das séries temporais: (adjetivo, nome do período)
+GRANULARIDADES = {
+    "semana": ("Semanal", "Semana"),
+    "mes": ("Mensal", "Mês"),
+    "trimestre": ("Trimestral", "Trimestre"),
+}
+
+
+def resample_statistics(diario, resolucao="dia"):
+    """Reagrega as estatísticas diárias em períodos datados pelo primeiro dia.
+
+    A coluna `dias` conta os dias com dados de cada período, para que totais
+    diários possam ser mostrados como média por dia.
+    """
+    diario = diario.assign(dias=1)
+    if resolucao == "dia":
+        return diario
+    inicio = diario["Data"].dt.to_period(FREQUENCIAS[resolucao]).dt.start_time
+    return rollup(diario.assign(Data=inicio), "Data")
+
+
+def downsample_statistics(diario, max_pontos=None):
+    """Reagrega as estatísticas diárias na resolução mais fina com até `max_pontos` pontos.
+
+    Se nenhuma couber, usa trimestres. Retorna as estatísticas e a
+    resolução usada. Médias e totais continuam
+    exatos, pois são recalculados a partir das somas e contagens de cada
+    período, e não das médias diárias.
+    """
+    for resolucao in RESOLUCOES:
+        estatisticas = resample_statistics(diario, resolucao)
+        if max_pontos is None or len(estatisticas) <= max_pontos:
+            break
+    return estatisticas, resolucao
+
+
+def logistica_trend_series(diario, max_pontos=None):
+    """Série de tempo de resposta previsto e real, reduzida a até `max_pontos` pontos"""
+    estatisticas, resolucao = downsample_statistics(diario, max_pontos)
+    serie = pd.DataFrame(
+        {
+            "Data": estatisticas["Data"],
+            "Tempo_Resposta_Previsto": _media(estatisticas, "Tempo_Resposta_Previsto"),
+            "Tempo_Resposta_Real": _media(estatisticas, "Tempo_Resposta_Real"),
+        }
+    )
+    return serie, resolucao
+
+
+def estoque_trend_series(diario, max_pontos=None):
+    """Série de demanda e stock out por dia e de estoque médio, reduzida a até `max_pontos` pontos"""
+    estatisticas, resolucao = downsample_statistics(diario, max_pontos)
+    serie = pd.DataFrame(
+        {
+            "Data": estatisticas["Data"],
+            "Demanda_Diaria": estatisticas["soma_Demanda_Diaria"]
+            / estatisticas["dias"],
+            "Estoque_Final": _media(estatisticas, "Estoque_Final"),
+            "Stock_Out": estatisticas["soma_Stock_Out"] / estatisticas["dias"],
+        }
+    )
+    return serie, resolucao
+
+
+def logistica_statistics(df):
+    """Resume as linhas de logística em estatísticas aditivas.
+
+    As linhas são agrupadas só duas vezes: por região×estado×status (`base`)
+    e por data (`diario`). Junto com os momentos da correlação e os sketches
+    dos percentis, o resultado pode ser combinado com o de outros blocos por
+    `combine_statistics`.
+    """
+    chaves = [coluna for coluna in ("Regiao", "Estado", "Status") if coluna in df]
+    base = group_statistics(df, chaves, list(COLUNAS_SQL))
+    base["atrasados"] = base["linhas"].where(base["Status"] == "Atrasado", 0)
+
+    diario = group_statistics(
+        df.assign(atrasados=df["Status"] == "Atrasado"),
+        "Data",
+        list(COLUNAS_SQL) + ["atrasados"],
+    )
+    diario = diario.rename(columns={"soma_atrasados": "atrasados"}).drop(
+        columns="n_atrasados"
+    )
+    return {
+        "chaves": chaves,
+        "base": base,
+        "diario": diario,
+        "momentos": correlation_moments(df, VARS_CORRELACAO),
+        "sketches": logistica_sketches(df),
+    }
+
+
+def logistica_aggregates_from_statistics(estatisticas):
+    """Monta os agregados da aba de logística a partir das estatísticas.
+
+    Totais, região×status, região e estado saem da reagregação de `base`,
+    que tem no máximo algumas centenas de linhas; as séries por período saem
+    das estatísticas diárias (`diario`) e os percentis, dos sketches.
+    """
+    base, diario = estatisticas["base"], estatisticas["diario"]
+
+    total = rollup(base)
+    resumo = _resumo(
+        total["linhas"],
+        total["atrasados"],
+        {coluna: _media(total, coluna) for coluna in COLUNAS_SQL},
+        total["soma_Custo_Logistico_USD"],
+    )
+
+    g_regiao_status = rollup(base, ["Regiao", "Status"])
+    por_regiao_status = pd.DataFrame(
+        {
+            "Regiao": g_regiao_status["Regiao"],
+            "Status": g_regiao_status["Status"],
+            "Contagem": g_regiao_status["linhas"],
+        }
+    )
+
+    g_regiao = rollup(base, "Regiao")
+    por_regiao = pd.DataFrame(
+        {
+            "Regiao": g_regiao["Regiao"],
+            "Total": g_regiao["linhas"],
+            "Custo_Medio_USD": _media(g_regiao, "Custo_Logistico_USD"),
+            "Emissao_Media_CO2": _media(g_regiao, "Emissao_CO2_kg"),
+        }
+    )
+
+    por_estado = pd.DataFrame()
+    if "Estado" in base.columns:
+        g_estado = rollup(base, "Estado")
+        por_estado = pd.DataFrame(
+            {
+                "Estado": g_estado["Estado"],
+                "Tempo_Resposta_Real": _media(g_estado, "Tempo_Resposta_Real"),
+                "Custo_Logistico_USD": g_estado["soma_Custo_Logistico_USD"],
+                "Emissao_CO2_kg": g_estado["soma_Emissao_CO2_kg"],
+            }
+        )
+
+    return {
+        "resumo": resumo,
+        "por_regiao_status": por_regiao_status,
+        "por_regiao": por_regiao,
+        "por_estado": por_estado,
+        "diario": diario,
+        "correlacao": correlation_from_moments(estatisticas["momentos"]),
+        "percentis": percentile_tables(estatisticas["sketches"]),
+    }
+
+
+def logistica_aggregates_from_frame(df):
+    """Calcula em memória os agregados da aba de logística a partir das linhas"""
+    return logistica_aggregates_from_statistics(logistica_statistics(df))
+
+
+def _correlation_from_sql(conn, tabela, colunas, colunas_sql, where, params):
+    """Matriz de correlação de Pearson calculada com corr() no PostgreSQL.
+
+    corr(x, x) reproduz a diagonal do pandas: 1.0, ou nulo sem variância.
+    """
+    pares = [(a, b) for i, a in enumerate(colunas) for b in colunas[i:]]
+    expressoes = ", ".join(
+        f"corr({colunas_sql[a]}, {colunas_sql[b]})" for a, b in pares
+    )
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT {expressoes} FROM {tabela} WHERE {where}", params)
+        valores = cur.fetchone()
+
+    correlacao = pd.DataFrame(index=colunas, columns=colunas, dtype=float)
+    for (a, b), valor in zip(pares, valores):
+        correlacao.loc[a, b] = valor
+        correlacao.loc[b, a] = valor
+    return correlacao
+
+
+def logistica_sketch_cells(conn):
+    """Sketches de `VARS_PERCENTIS` por dia×região×estado, contados no banco.
+
+    Retorna as células (Data, Regiao, Estado), ordenadas por data, e para
+    cada coluna os baldes de cada célula, no formato dos sketches do cubo:
+    `celula` é a posição da célula, seguida das chaves de `CHAVES_SKETCH`.
+    """
+    chaves = ["Data", "Regiao", "Estado"]
+    contagens = {}
+    for coluna in VARS_PERCENTIS:
+        coluna_sql = COLUNAS_SQL[coluna]
+        contagens[coluna] = pd.read_sql_query(
+            LOGISTICA_SKETCH_SQL.format(
+                indice=SKETCH_INDICE_SQL.format(coluna=coluna_sql), coluna=coluna_sql
+            ),
+            conn,
+        ).rename(columns={"data": "Data", "regiao": "Regiao", "estado": "Estado"})
+
+    celulas = (
+        pd.concat([contagem[chaves] for contagem in contagens.values()])
+        .assign(Data=lambda df: pd.to_datetime(df["Data"]))
+        .drop_duplicates()
+        .sort_values(chaves, kind="stable", ignore_index=True)
+    )
+    posicoes = celulas.rename_axis("celula").reset_index()
+    sketches = {}
+    for coluna, contagem in contagens.items():
+        sketch = contagem.assign(Data=pd.to_datetime(contagem["Data"])).merge(
+            posicoes, on=chaves
+        )
+        sketches[coluna] = sketch.assign(Mes=inicio_mes(sketch["Data"]))[
+            ["celula", "indice", "contagem"] + CHAVES_SKETCH
+        ]
+    return celulas, sketches
+
+
+def _medias(grupo):
+    """Converte as colunas soma_*/n_* do resultado SQL em médias por coluna"""
+    medias = {}
+    for coluna, coluna_sql in COLUNAS_SQL.items():
+        n = grupo[f"n_{coluna_sql}"]
+        medias[coluna] = grupo[f"soma_{coluna_sql}"] / n.where(n > 0)
+    return medias
+
+
+def logistica_aggregates_from_sql(conn, clauses, params, sketches):
+    """Calcula no PostgreSQL os agregados da aba de logística.
+
+    Um único GROUPING SETS devolve somas e contagens por data, região,
+    região×status e estado; as médias e as séries por período são derivadas
+    delas aqui, de modo que apenas alguns milhares de linhas trafegam em vez
+    da tabela inteira. Os percentis saem de `sketches`, os baldes das células
+    de `logistica_sketch_cells` já selecionados pelos mesmos filtros.
+    """
+    where = " AND ".join(["status != 'Em Rota'"] + clauses)
+
+    grupos = pd.read_sql_query(
+        LOGISTICA_GROUPING_SQL.format(where=where), conn, params=params
+    )
+    correlacao = _correlation_from_sql(
+        conn, "logistica", VARS_CORRELACAO, COLUNAS_SQL, where, params
+    )
+
+    g_total = grupos[grupos["grupo"] == GRUPO_TOTAL]
+    total = g_total.iloc[0]
+    medias_total = {coluna: media.iloc[0] for coluna, media in _medias(g_total).items()}
+    resumo = _resumo(
+        total["linhas"],
+        total["atrasados"],
+        medias_total,
+        total["soma_custo_logistico_usd"] if total["linhas"] else 0.0,
+    )
+
+    def grupo(mascara, chaves):
+        return (
+            grupos[grupos["grupo"] == mascara]
+            .sort_values(chaves)
+            .reset_index(drop=True)
+        )
+
+    # Tipos explícitos: sem linhas no filtro as colunas vêm como object e o
+    # sum(numeric_only=True) de `rollup` as descartaria
+    g_data = grupo(GRUPO_DATA, ["data"])
+    diario = pd.DataFrame(
+        {
+            "Data": pd.to_datetime(g_data["data"]),
+            "linhas": g_data["linhas"].astype("int64"),
+            "atrasados": g_data["atrasados"].astype("int64"),
+        }
+    )
+    for coluna, coluna_sql in COLUNAS_SQL.items():
+        diario[f"soma_{coluna}"] = (
+            g_data[f"soma_{coluna_sql}"].fillna(0.0).astype("float64")
+        )
+        diario[f"n_{coluna}"] = g_data[f"n_{coluna_sql}"].astype("int64")
+
+    g_regiao_status = grupo(GRUPO_REGIAO_STATUS, ["regiao", "status"])
+    por_regiao_status = pd.DataFrame(
+        {
+            "Regiao": g_regiao_status["regiao"],
+            "Status": g_regiao_status["status"],
+            "Contagem": g_regiao_status["linhas"],
+        }
+    )
+
+    g_regiao = grupo(GRUPO_REGIAO, ["regiao"])
+    medias = _medias(g_regiao)
+    por_regiao = pd.DataFrame(
+        {
+            "Regiao": g_regiao["regiao"],
+            "Total": g_regiao["linhas"],
+            "Custo_Medio_USD": medias["Custo_Logistico_USD"],
+            "Emissao_Media_CO2": medias["Emissao_CO2_kg"],
+        }
+    )
+
+    g_estado = grupo(GRUPO_ESTADO, ["estado"])
+    medias = _medias(g_estado)
+    por_estado = pd.DataFrame(
+        {
+            "Estado": g_estado["estado"],
+            "Tempo_Resposta_Real": medias["Tempo_Resposta_Real"],
+            "Custo_Logistico_USD": g_estado["soma_custo_logistico_usd"].fillna(0.0),
+            "Emissao_CO2_kg": g_estado["soma_emissao_co2_kg"].fillna(0.0),
+        }
+    )
+
+    return {
+        "resumo": resumo,
+        "por_regiao_status": por_regiao_status,
+        "por_regiao": por_regiao,
+        "por_estado": por_estado,
+        "diario": diario,
+        "correlacao": correlacao,
+        "percentis": percentile_tables(sketches),
+    }
+
+
+VARS_CORRELACAO_ESTOQUE = [
+    "Demanda_Diaria",
+    "Estoque_Final",
+    "Stock_Out",
+    "Taxa_Atendimento",
+    "Custo_Total_USD",
+    "Tempo_Medio_Entrega_Dias",
+]
+
+# Colunas de demanda_estoque usadas pelos agregados em memória
+ESTOQUE_COLUNAS = [
+    "Data",
+    "Estado",
+    "Regiao",
+    "Demanda_Diaria",
+    "Demanda_Atendida",
+    "Demanda_Nao_Atendida",
+    "Estoque_Disponivel",
+    "Estoque_Final",
+    "Stock_Out",
+    "Reabastecimento",
+    "Taxa_Atendimento",
+    "Custo_Total_USD",
+    "Tempo_Medio_Entrega_Dias",
+    "Indicador_Estoque_Baixo",
+    "Indicador_Stock_Out",
+]
+
+# Medidas de demanda_estoque somadas (ou médias) nos agregados em memória
+ESTOQUE_MEDIDAS = [
+    "Demanda_Diaria",
+    "Demanda_Atendida",
+    "Demanda_Nao_Atendida",
+    "Estoque_Final",
+    "Stock_Out",
+    "Reabastecimento",
+    "Taxa_Atendimento",
+    "Indicador_Stock_Out",
+]
+
+# Medidas das séries diárias, das quais saem as séries por período
+ESTOQUE_MEDIDAS_DIARIAS = [
+    "Demanda_Diaria",
+    "Estoque_Final",
+    "Stock_Out",
+    "Taxa_Atendimento",
+    "Reabastecimento",
+]
+
+ESTOQUE_ROLLUP_SQL = """
+    SELECT
+        GROUPING(data, regiao, estado) AS grupo,
+        data,
+        regiao,
+        estado,
+        MIN(regiao) AS regiao_estado,
+        SUM(linhas) AS linhas,
+        SUM(demanda_diaria) AS demanda_diaria,
+        SUM(demanda_atendida)::float8 AS demanda_atendida,
+        SUM(demanda_nao_atendida)::float8 AS demanda_nao_atendida,
+        SUM(stock_out) AS stock_out,
+        SUM(reabastecimento) AS reabastecimento,
+        SUM(soma_estoque_final)::float8 AS soma_estoque_final,
+        SUM(soma_taxa_atendimento)::float8 AS soma_taxa_atendimento,
+        SUM(dias_stock_out) AS dias_stock_out
+    FROM demanda_estoque_diario
+    {where}
+    GROUP BY GROUPING SETS ((), (data), (regiao), (estado))
+"""
+
+# Máscara de GROUPING(data, regiao, estado): bit 1 = coluna agregada
+GRUPO_ESTOQUE_TOTAL = 0b111
+GRUPO_ESTOQUE_DATA = 0b011
+GRUPO_ESTOQUE_REGIAO = 0b101
+GRUPO_ESTOQUE_ESTADO = 0b110
+
+
+def _where(clauses):
+    return f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+
+def estoque_statistics(df):
+    """Resume as linhas de estoque em estatísticas aditivas por região×estado e por data"""
+    chaves = [coluna for coluna in ("Regiao", "Estado") if coluna in df]
+    return {
+        "chaves": chaves,
+        "base": group_statistics(df, chaves, ESTOQUE_MEDIDAS),
+        "diario": group_statistics(df, "Data", ESTOQUE_MEDIDAS_DIARIAS),
+        "momentos": correlation_moments(
+            df, [v for v in VARS_CORRELACAO_ESTOQUE if v in df.columns]
+        ),
+    }
+
+
+def estoque_aggregates_from_statistics(estatisticas):
+    """Monta os agregados da aba de estoque a partir das estatísticas"""
+    base, diario = estatisticas["base"], estatisticas["diario"]
+
+    total = rollup(base)
+    if total["linhas"] == 0:
+        return None
+    resumo = {
+        "linhas": int(total["linhas"]),
+        "demanda_total": total["soma_Demanda_Diaria"],
+        "demanda_atendida": total["soma_Demanda_Atendida"],
+        "demanda_nao_atendida": total["soma_Demanda_Nao_Atendida"],
+        "stock_out_total": total["soma_Stock_Out"],
+        "estoque_final_medio": _media(total, "Estoque_Final"),
+        "taxa_atendimento_media": _media(total, "Taxa_Atendimento"),
+        # Indicador 0/1: a soma é o número de registros com stock out
+        "dias_stock_out": int(total["soma_Indicador_Stock_Out"]),
+    }
+
+    g_regiao = rollup(base, "Regiao")
+    por_regiao = pd.DataFrame(
+        {
+            "Regiao": g_regiao["Regiao"],
+            "Stock_Out": g_regiao["soma_Stock_Out"],
+            "Demanda_Diaria": g_regiao["soma_Demanda_Diaria"],
+            "Taxa_Atendimento": _media(g_regiao, "Taxa_Atendimento"),
+            "Reabastecimento": g_regiao["soma_Reabastecimento"],
+            "Demanda_Atendida": g_regiao["soma_Demanda_Atendida"],
+            "Demanda_Nao_Atendida": g_regiao["soma_Demanda_Nao_Atendida"],
+        }
+    )
+
+    por_estado = pd.DataFrame()
+    if "Estado" in base.columns:
+        # Cada estado pertence a uma região, então a base já está por estado
+        g_estado = base.sort_values("Estado", ignore_index=True)
+        por_estado = pd.DataFrame(
+            {
+                "Estado": g_estado["Estado"],
+                "Regiao": g_estado["Regiao"],
+                "Demanda_Diaria": g_estado["soma_Demanda_Diaria"],
+                "Stock_Out": g_estado["soma_Stock_Out"],
+                "Taxa_Atendimento": _media(g_estado, "Taxa_Atendimento"),
+                "Estoque_Final": _media(g_estado, "Estoque_Final"),
+                "Reabastecimento": g_estado["soma_Reabastecimento"],
+            }
+        )
+
+    return {
+        "resumo": resumo,
+        "por_regiao": por_regiao,
+        "por_estado": por_estado,
+        "diario": diario,
+        "correlacao": correlation_from_moments(estatisticas["momentos"]),
+    }
+
+
+def estoque_aggregates_from_frame(df):
+    """Calcula em memória os agregados da aba de estoque a partir das linhas"""
+    if df.empty:
+        return None
+    return estoque_aggregates_from_statistics(estoque_statistics(df))
+
+
+def estoque_aggregates_from_rollups(
+    conn, start_date=None, end_date=None, regioes=None, estados=None
+):
+    """Calcula os agregados da aba de estoque a partir dos rollups materializados.
+
+    Totais, séries diárias e resumos por região/estado vêm do rollup
+    dia×estado. Só a correlação, que depende de linhas individuais, consulta
+    a tabela `demanda_estoque`.
+    """
+    clauses, params = build_filters(start_date, end_date, regioes, estados)
+
+    grupos = pd.read_sql_query(
+        ESTOQUE_ROLLUP_SQL.format(where=_where(clauses)), conn, params=params
+    )
+
+    def grupo(mascara, chave):
+        selecionado = grupos[grupos["grupo"] == mascara]
+        if chave:
+            selecionado = selecionado.sort_values(chave)
+        return selecionado.reset_index(drop=True)
+
+    total = grupo(GRUPO_ESTOQUE_TOTAL, None).iloc[0]
+    if pd.isna(total["linhas"]) or total["linhas"] == 0:
+        return None
+    linhas = total["linhas"]
+
+    colunas_sql = {coluna: coluna.lower() for coluna in VARS_CORRELACAO_ESTOQUE}
+    correlacao = _correlation_from_sql(
+        conn,
+        "demanda_estoque",
+        VARS_CORRELACAO_ESTOQUE,
+        colunas_sql,
+        " AND ".join(clauses) or "TRUE",
+        params,
+    )
+
+    resumo = {
+        "linhas": int(linhas),
+        "demanda_total": total["demanda_diaria"],
+        "demanda_atendida": total["demanda_atendida"],
+        "demanda_nao_atendida": total["demanda_nao_atendida"],
+        "stock_out_total": total["stock_out"],
+        "estoque_final_medio": total["soma_estoque_final"] / linhas,
+        "taxa_atendimento_media": total["soma_taxa_atendimento"] / linhas,
+        "dias_stock_out": int(total["dias_stock_out"]),
+    }
+
+    g_data = grupo(GRUPO_ESTOQUE_DATA, "data")
+    # Mesmo formato de `group_statistics`; o rollup não guarda valores nulos
+    diario = pd.DataFrame(
+        {
+            "Data": pd.to_datetime(g_data["data"]),
+            "linhas": g_data["linhas"],
+            "soma_Demanda_Diaria": g_data["demanda_diaria"],
+            "n_Demanda_Diaria": g_data["linhas"],
+            "soma_Estoque_Final": g_data["soma_estoque_final"],
+            "n_Estoque_Final": g_data["linhas"],
+            "soma_Stock_Out": g_data["stock_out"],
+            "n_Stock_Out": g_data["linhas"],
+            "soma_Taxa_Atendimento": g_data["soma_taxa_atendimento"],
+            "n_Taxa_Atendimento": g_data["linhas"],
+            "soma_Reabastecimento": g_data["reabastecimento"],
+            "n_Reabastecimento": g_data["linhas"],
+        }
+    )
+    g_regiao = grupo(GRUPO_ESTOQUE_REGIAO, "regiao")
+    por_regiao = pd.DataFrame(
+        {
+            "Regiao": g_regiao["regiao"],
+            "Stock_Out": g_regiao["stock_out"],
+            "Demanda_Diaria": g_regiao["demanda_diaria"],
+            "Taxa_Atendimento": g_regiao["soma_taxa_atendimento"] / g_regiao["linhas"],
+            "Reabastecimento": g_regiao["reabastecimento"],
+            "Demanda_Atendida": g_regiao["demanda_atendida"],
+            "Demanda_Nao_Atendida": g_regiao["demanda_nao_atendida"],
+        }
+    )
+
+    g_estado = grupo(GRUPO_ESTOQUE_ESTADO, "estado")
+    por_estado = pd.DataFrame(
+        {
+            "Estado": g_estado["estado"],
+            "Regiao": g_estado["regiao_estado"],
+            "Demanda_Diaria": g_estado["demanda_diaria"],
+            "Stock_Out": g_estado["stock_out"],
+            "Taxa_Atendimento": g_estado["soma_taxa_atendimento"] / g_estado["linhas"],
+            "Estoque_Final": g_estado["soma_estoque_final"] / g_estado["linhas"],
+            "Reabastecimento": g_estado["reabastecimento"],
+        }
+    )
+
+    return {
+        "resumo": resumo,
+        "por_regiao": por_regiao,
+        "por_estado": por_estado,
+        "diario": diario,
+        "correlacao": correlacao,
+    }
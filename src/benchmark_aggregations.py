@@ -0,0 +1,290 @@
+"""Compara os agregados em memória com um groupby por gráfico.
+
+Para cada seção, mede o tempo e conta quantos agrupamentos percorrem todas
+as linhas filtradas: na referência, cada gráfico agrupa o DataFrame por
+conta própria, como o dashboard fazia originalmente; em `aggregations.py`,
+as linhas são agrupadas uma vez por chave e os gráficos usam reagregações
+desse resultado; com o cubo de `cube.py`, montado uma vez por versão dos
+dados, nenhum agrupamento percorre as linhas, só as células do cubo.
+`--escala` replica as linhas nos mesmos dias e estados, o que aumenta as
+linhas sem aumentar as células (nos CSVs de exemplo, cada célula de estoque
+tem uma única linha).
+
+Uso:
+    uv run python src/benchmark_aggregations.py
+    uv run python src/benchmark_aggregations.py --dir /caminho/dos/csvs --repeticoes 10
+    uv run python src/benchmark_aggregations.py --escala 20
+"""
+
+import argparse
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+from aggregations import (
+    ESTOQUE_COLUNAS,
+    VARS_CORRELACAO,
+    VARS_CORRELACAO_ESTOQUE,
+    estoque_aggregates_from_frame,
+    estoque_aggregates_from_statistics,
+    estoque_period_series,
+    logistica_aggregates_from_frame,
+    logistica_aggregates_from_statistics,
+    logistica_period_series,
+)
+from cube import cube_statistics, estoque_cube, logistica_cube
+from schema import ESTOQUE_DTYPES, LOGISTICA_DTYPES, apply_schema
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+ASSETS_DIR = BASE_DIR / "assets"
+
+
+def _mensal_logistica(df):
+    return (
+        df.assign(Ano_Mes=df["Data"].dt.to_period("M").astype(str))
+        .groupby("Ano_Mes", observed=True)
+        .agg(
+            {
+                "Tempo_Resposta_Real": "mean",
+                "Custo_Logistico_USD": "mean",
+                "Emissao_CO2_kg": "mean",
+                "Status": lambda x: (x == "Atrasado").sum() / len(x) * 100,
+            }
+        )
+    )
+
+
+def _mensal_estoque(df):
+    return (
+        df.assign(Ano_Mes=df["Data"].dt.to_period("M").astype(str))
+        .groupby("Ano_Mes", observed=True)
+        .agg(
+            {
+                "Demanda_Diaria": "sum",
+                "Estoque_Final": "mean",
+                "Stock_Out": "sum",
+                "Taxa_Atendimento": "mean",
+                "Reabastecimento": "sum",
+            }
+        )
+    )
+
+
+# Um agrupamento por gráfico, como no dashboard antes dos agregados
+# compartilhados; indicadores, série mensal e correlação são calculados como
+# em `aggregations.py` para que os tempos sejam comparáveis
+LOGISTICA_POR_GRAFICO = {
+    "resumo": lambda df: (
+        df["Tempo_Resposta_Real"].mean(),
+        df["Tempo_Resposta_Previsto"].mean(),
+        df["Custo_Logistico_USD"].sum(),
+        df["Emissao_CO2_kg"].mean(),
+        (df["Status"] == "Atrasado").sum(),
+    ),
+    "tendencia": lambda df: df.groupby("Data", observed=True)[
+        ["Tempo_Resposta_Previsto", "Tempo_Resposta_Real"]
+    ].mean(),
+    "regiao_status": lambda df: df.groupby(["Regiao", "Status"], observed=True).size(),
+    "regiao_total": lambda df: df.groupby("Regiao", observed=True).size(),
+    "estado_rapido": lambda df: df.groupby("Estado", observed=True)[
+        "Tempo_Resposta_Real"
+    ].mean(),
+    "estado_lento": lambda df: df.groupby("Estado", observed=True)[
+        "Tempo_Resposta_Real"
+    ].mean(),
+    "custo_emissao": lambda df: df.groupby("Regiao", observed=True)[
+        ["Custo_Logistico_USD", "Emissao_CO2_kg"]
+    ].mean(),
+    "custo_estado": lambda df: df.groupby("Estado", observed=True)[
+        "Custo_Logistico_USD"
+    ].sum(),
+    "emissao_estado": lambda df: df.groupby("Estado", observed=True)[
+        "Emissao_CO2_kg"
+    ].sum(),
+    "mensal": _mensal_logistica,
+    "correlacao": lambda df: df[VARS_CORRELACAO].corr(),
+}
+
+ESTOQUE_POR_GRAFICO = {
+    "resumo": lambda df: (
+        df["Demanda_Diaria"].sum(),
+        df["Demanda_Atendida"].sum(),
+        df["Demanda_Nao_Atendida"].sum(),
+        df["Stock_Out"].sum(),
+        df["Estoque_Final"].mean(),
+        df["Taxa_Atendimento"].mean(),
+        (df["Indicador_Stock_Out"] == 1).sum(),
+    ),
+    "demanda_estoque": lambda df: df.groupby("Data", observed=True).agg(
+        {"Demanda_Diaria": "sum", "Estoque_Final": "mean", "Stock_Out": "sum"}
+    ),
+    "stock_out": lambda df: df.groupby("Regiao", observed=True)[
+        ["Stock_Out", "Demanda_Diaria"]
+    ].sum(),
+    "atendimento": lambda df: df.groupby("Regiao", observed=True)[
+        "Taxa_Atendimento"
+    ].mean(),
+    "estado_stock": lambda df: df.groupby("Estado", observed=True)["Stock_Out"].sum(),
+    "resumo_estados": lambda df: df.groupby("Estado", observed=True).agg(
+        {
+            "Regiao": "first",
+            "Demanda_Diaria": "sum",
+            "Stock_Out": "sum",
+            "Taxa_Atendimento": "mean",
+            "Estoque_Final": "mean",
+            "Reabastecimento": "sum",
+        }
+    ),
+    "demanda_estado": lambda df: df.groupby("Estado", observed=True)[
+        "Demanda_Diaria"
+    ].sum(),
+    "atendimento_estado": lambda df: df.groupby("Estado", observed=True)[
+        "Taxa_Atendimento"
+    ].mean(),
+    "reab_regiao": lambda df: df.groupby("Regiao", observed=True)[
+        "Reabastecimento"
+    ].sum(),
+    "reab_estado": lambda df: df.groupby("Estado", observed=True)[
+        "Reabastecimento"
+    ].sum(),
+    "atend_comparacao": lambda df: df.groupby("Regiao", observed=True)[
+        ["Demanda_Atendida", "Demanda_Nao_Atendida"]
+    ].sum(),
+    "mensal": _mensal_estoque,
+    "correlacao": lambda df: df[
+        [v for v in VARS_CORRELACAO_ESTOQUE if v in df.columns]
+    ].corr(),
+}
+
+
+@contextmanager
+def contar_agrupamentos(linhas):
+    """Conta os groupby chamados sobre DataFrames com `linhas` linhas ou mais"""
+    original = pd.DataFrame.groupby
+    contagem = {"agrupamentos": 0}
+
+    def groupby(self, *args, **kwargs):
+        if len(self) >= linhas:
+            contagem["agrupamentos"] += 1
+        return original(self, *args, **kwargs)
+
+    pd.DataFrame.groupby = groupby
+    try:
+        yield contagem
+    finally:
+        pd.DataFrame.groupby = original
+
+
+def medir(funcao, df, repeticoes):
+    """Retorna o menor tempo, em segundos, e os agrupamentos sobre as linhas"""
+    with contar_agrupamentos(len(df)) as contagem:
+        funcao(df)
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(df)
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), contagem["agrupamentos"]
+
+
+def _com_serie_mensal(agregar, serie_periodo):
+    """Inclui a série mensal, que o dashboard deriva dos agregados diários"""
+
+    def calcular(df):
+        agregados = agregar(df)
+        return agregados, serie_periodo(agregados["diario"], "mes")
+
+    return calcular
+
+
+def _pelo_cubo(cubo, montar, serie_periodo):
+    """Agrega pelo cubo já montado, como o dashboard faz a cada seleção de filtros"""
+
+    def calcular(df):
+        agregados = montar(cube_statistics(cubo))
+        return agregados, serie_periodo(agregados["diario"], "mes")
+
+    return calcular
+
+
+def _por_grafico(graficos):
+    def calcular(df):
+        return {nome: agrupar(df) for nome, agrupar in graficos.items()}
+
+    return calcular
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compara os agregados em memória com um groupby por gráfico"
+    )
+    parser.add_argument(
+        "--dir",
+        type=Path,
+        default=ASSETS_DIR,
+        help="Diretório com logistica_simulada.csv e demanda_estoque.csv",
+    )
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--escala", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    df = apply_schema(
+        pd.read_csv(args.dir / "logistica_simulada.csv"), LOGISTICA_DTYPES
+    )
+    secoes = [
+        (
+            "Logística",
+            df[df["Status"] != "Em Rota"],
+            LOGISTICA_POR_GRAFICO,
+            _com_serie_mensal(logistica_aggregates_from_frame, logistica_period_series),
+            logistica_cube,
+            logistica_aggregates_from_statistics,
+            logistica_period_series,
+        ),
+        (
+            "Estoque",
+            apply_schema(
+                pd.read_csv(args.dir / "demanda_estoque.csv", usecols=ESTOQUE_COLUNAS),
+                ESTOQUE_DTYPES,
+            ),
+            ESTOQUE_POR_GRAFICO,
+            _com_serie_mensal(estoque_aggregates_from_frame, estoque_period_series),
+            estoque_cube,
+            estoque_aggregates_from_statistics,
+            estoque_period_series,
+        ),
+    ]
+
+    for nome, df, graficos, agregar, montar_cubo, montar, serie_periodo in secoes:
+        df = pd.concat([df] * args.escala, ignore_index=True)
+        tempo_ref, agrupamentos_ref = medir(_por_grafico(graficos), df, args.repeticoes)
+        tempo, agrupamentos = medir(agregar, df, args.repeticoes)
+        inicio = time.perf_counter()
+        cubo = montar_cubo(df)
+        tempo_montagem = time.perf_counter() - inicio
+        tempo_cubo, agrupamentos_cubo = medir(
+            _pelo_cubo(cubo, montar, serie_periodo), df, args.repeticoes
+        )
+        print(f"{nome} ({len(df):,} linhas)")
+        print(
+            f"  Um groupby por gráfico: {agrupamentos_ref} agrupamentos sobre as "
+            f"linhas, {tempo_ref * 1000:.1f} ms"
+        )
+        print(
+            f"  aggregations.py:        {agrupamentos} agrupamentos sobre as "
+            f"linhas, {tempo * 1000:.1f} ms"
+        )
+        print(
+            f"  cube.py:                {agrupamentos_cubo} agrupamentos sobre as "
+            f"linhas, {tempo_cubo * 1000:.1f} ms "
+            f"(montagem do cubo com {len(cubo['celulas']):,} células: "
+            f"{tempo_montagem * 1000:.1f} ms)"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""Compara as formas de trazer as tabelas do PostgreSQL para DataFrames.
+
+Para cada tabela, mede linhas por segundo e o pico de memória de três
+caminhos, todos terminando nos tipos de `schema.py`:
+
+- `pd.read_sql_query`, que cria um `Decimal` por valor NUMERIC e colunas de
+  objetos antes da conversão (o caminho usado antes de `read_sql_frame`);
+- cursor com `DECIMAL_AS_FLOAT`, que converte NUMERIC para float na leitura
+  (usado na leitura em blocos);
+- `read_sql_frame`, que transfere o resultado com `COPY ... TO STDOUT` e o
+  converte com o leitor de CSV do Arrow.
+
+As tabelas são copiadas `--escala` vezes para tabelas temporárias, e cada
+caminho é medido em um processo próprio, para que o pico de memória de um
+não esconda o do outro.
+
+Uso:
+    uv run python src/benchmark_fetch.py
+    uv run python src/benchmark_fetch.py --escala 20 --repeticoes 3
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import warnings
+
+import pandas as pd
+import psycopg2
+import psycopg2.extensions
+from dotenv import load_dotenv
+
+from aggregations import ESTOQUE_COLUNAS
+from database import decimal_as_float, read_sql_frame
+from schema import ESTOQUE_DTYPES, LOGISTICA_DTYPES, apply_schema
+
+TABELAS = {
+    "logistica": (list(LOGISTICA_DTYPES), LOGISTICA_DTYPES),
+    "demanda_estoque": (["ID"] + ESTOQUE_COLUNAS, ESTOQUE_DTYPES),
+}
+
+
+def _read_sql_query(conn, query):
+    with warnings.catch_warnings():
+        # O pandas avisa que só testa conexões SQLAlchemy
+        warnings.simplefilter("ignore", UserWarning)
+        return pd.read_sql_query(query, conn)
+
+
+def _decimal_as_float(conn, query):
+    with conn.cursor() as cur:
+        psycopg2.extensions.register_type(decimal_as_float(), cur)
+        cur.execute(query)
+        colunas = [descricao[0] for descricao in cur.description]
+        return pd.DataFrame.from_records(cur.fetchall(), columns=colunas)
+
+
+CAMINHOS = {
+    "pd.read_sql_query": _read_sql_query,
+    "DECIMAL_AS_FLOAT": _decimal_as_float,
+    "read_sql_frame": read_sql_frame,
+}
+
+
+def _pico_memoria():
+    # ru_maxrss é informado em KiB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def medir_caminho(database_url, tabela, caminho, escala, repeticoes):
+    """Mede um caminho de leitura de uma tabela no processo atual"""
+    colunas, dtypes = TABELAS[tabela]
+    conn = psycopg2.connect(database_url)
+    with conn.cursor() as cur:
+        cur.execute(
+            f"""
+            CREATE TEMP TABLE copia AS
+            SELECT t.* FROM {tabela} t, generate_series(1, %s)
+            """,
+            [escala],
+        )
+    query = f"SELECT {', '.join(c.lower() for c in colunas)} FROM copia"
+    renomear = {coluna.lower(): coluna for coluna in colunas}
+
+    base = _pico_memoria()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        df = CAMINHOS[caminho](conn, query).rename(columns=renomear)
+        df = apply_schema(df, dtypes)
+        tempos.append(time.perf_counter() - inicio)
+    conn.close()
+    return {
+        "linhas": len(df),
+        "segundos": min(tempos),
+        "pico_bytes": _pico_memoria() - base,
+        "bytes_finais": int(df.memory_usage(deep=True).sum()),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compara as formas de trazer as tabelas do PostgreSQL para DataFrames"
+    )
+    parser.add_argument("--escala", type=int, default=10)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--medir", nargs=2, metavar=("TABELA", "CAMINHO"))
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        print("Defina DATABASE_URL para medir a leitura do banco de dados")
+        return 1
+
+    if args.medir:
+        tabela, caminho = args.medir
+        resultado = medir_caminho(
+            database_url, tabela, caminho, args.escala, args.repeticoes
+        )
+        print(json.dumps(resultado))
+        return 0
+
+    for tabela in TABELAS:
+        print(f"{tabela} (x{args.escala})")
+        for caminho in CAMINHOS:
+            saida = subprocess.run(
+                [
+                    sys.executable,
+                    __file__,
+                    "--escala",
+                    str(args.escala),
+                    "--repeticoes",
+                    str(args.repeticoes),
+                    "--medir",
+                    tabela,
+                    caminho,
+                ],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            resultado = json.loads(saida.stdout.splitlines()[-1])
+            print(
+                f"  {caminho:<18} {resultado['linhas'] / resultado['segundos']:>12,.0f} "
+                f"linhas/s · pico {resultado['pico_bytes'] / 1024 ** 2:7.1f} MB · "
+                f"DataFrame {resultado['bytes_finais'] / 1024 ** 2:6.1f} MB"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""Cache colunar em Arrow IPC dos CSVs usados como fallback do dashboard.
+
+Na primeira leitura o CSV é convertido, com os tipos de `schema.py`, para um
+arquivo Arrow IPC sem compressão ao lado de um JSON com a impressão digital
+da origem (tamanho, mtime e sha256). As leituras seguintes mapeiam o arquivo
+em memória e carregam apenas as colunas pedidas, sem reprocessar o texto.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.feather as feather
+
+from schema import arrow_types_mapper
+
+CACHE_VERSION = 1
+
+_build_lock = threading.Lock()
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(bloco)
+    return digest.hexdigest()
+
+
+def _schema_hash(dtypes):
+    texto = json.dumps([CACHE_VERSION, dtypes], sort_keys=True)
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+
+def _fingerprint(csv_path):
+    stat = csv_path.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _sorted_dictionary(coluna):
+    """Codifica texto como dicionário com categorias em ordem alfabética"""
+    coluna = coluna.combine_chunks() if isinstance(coluna, pa.ChunkedArray) else coluna
+    if pa.types.is_dictionary(coluna.type):
+        coluna = coluna.cast(pa.string())
+    valores = pc.unique(coluna).drop_null()
+    valores = pc.take(valores, pc.sort_indices(valores))
+    codigos = pc.index_in(coluna, value_set=valores).cast(pa.int32())
+    return pa.DictionaryArray.from_arrays(codigos, valores)
+
+
+def _convert_column(coluna, dtype):
+    if dtype == "category":
+        return _sorted_dictionary(coluna)
+    if dtype.startswith("datetime64"):
+        return coluna.cast(pa.date64())
+    if dtype == "object" or dtype.startswith("string"):
+        return coluna.cast(pa.string())
+    try:
+        return coluna.cast(pa.from_numpy_dtype(np.dtype(dtype)))
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        # Valores fora do tipo declarado: mantém o tipo inferido do CSV
+        return coluna
+
+
+def _build_cache(csv_path, cache_path, meta_path, dtypes):
+    tipos_leitura = {}
+    for coluna, dtype in dtypes.items():
+        if dtype in ("category", "object") or dtype.startswith("string"):
+            tipos_leitura[coluna] = pa.string()
+        elif dtype.startswith("datetime64"):
+            tipos_leitura[coluna] = pa.date32()
+
+    tabela = pacsv.read_csv(
+        csv_path, convert_options=pacsv.ConvertOptions(column_types=tipos_leitura)
+    )
+    colunas = [
+        _convert_column(tabela[nome], dtypes[nome]) if nome in dtypes else tabela[nome]
+        for nome in tabela.column_names
+    ]
+    tabela = pa.table(colunas, names=tabela.column_names)
+
+    sufixo = f".{os.getpid()}.{threading.get_ident()}.tmp"
+    tmp_cache = cache_path.with_name(cache_path.name + sufixo)
+    tmp_meta = meta_path.with_name(meta_path.name + sufixo)
+    feather.write_feather(tabela, tmp_cache, compression="uncompressed")
+    meta = {
+        **_fingerprint(csv_path),
+        "sha256": _sha256(csv_path),
+        "schema": _schema_hash(dtypes),
+    }
+    tmp_meta.write_text(json.dumps(meta))
+    os.replace(tmp_cache, cache_path)
+    os.replace(tmp_meta, meta_path)
+
+
+def _cache_is_valid(csv_path, cache_path, meta_path, dtypes):
+    if not cache_path.exists() or not meta_path.exists():
+        return False
+    try:
+        meta = json.loads(meta_path.read_text())
+    except (OSError, ValueError):
+        return False
+    if meta.get("schema") != _schema_hash(dtypes):
+        return False
+
+    fingerprint = _fingerprint(csv_path)
+    if all(meta.get(chave) == valor for chave, valor in fingerprint.items()):
+        return True
+
+    # mtime/tamanho mudaram (ex.: checkout ou cópia): confere o conteúdo
+    if meta.get("sha256") != _sha256(csv_path):
+        return False
+    meta.update(fingerprint)
+    meta_path.write_text(json.dumps(meta))
+    return True
+
+
+def read_csv_cached(csv_path, dtypes, cache_dir, columns=None):
+    """Lê um CSV através do cache Arrow IPC, reconstruindo-o se a origem mudou"""
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    cache_path = cache_dir / f"{csv_path.stem}.arrow"
+    meta_path = cache_dir / f"{csv_path.stem}.json"
+
+    with _build_lock:
+        if not _cache_is_valid(csv_path, cache_path, meta_path, dtypes):
+            _build_cache(csv_path, cache_path, meta_path, dtypes)
+
+    if columns is not None:
+        with pa.memory_map(str(cache_path)) as origem:
+            disponiveis = set(pa.ipc.open_file(origem).schema.names)
+        columns = [coluna for coluna in columns if coluna in disponiveis]
+
+    tabela = feather.read_table(cache_path, columns=columns, memory_map=True)
+    return tabela.to_pandas(
+        date_as_object=False,
+        coerce_temporal_nanoseconds=True,
+        types_mapper=arrow_types_mapper,
+    )
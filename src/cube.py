@@ -0,0 +1,214 @@
+"""Cubo de estatísticas suficientes por dia × estado (× status).
+
+Para cada célula (Data, Regiao, Estado e, na logística, Status), o cubo
+guarda contagens, somas e os momentos da correlação de Pearson (somas de
+quadrados e de produtos cruzados); na logística, também os sketches dos
+percentis (`sketches.py`). Como todas essas estatísticas são
+aditivas, qualquer combinação de período, regiões e estados é respondida
+somando as células selecionadas: o custo depende do número de células, que
+é limitado por dias × estados × status, e não do número de linhas.
+
+O cubo é montado uma vez por versão dos dados (ver `SharedDataset`), e
+`cube_statistics` devolve as estatísticas no mesmo formato de
+`logistica_statistics` e `estoque_statistics`.
+"""
+
+import numpy as np
+import pandas as pd
+
+from aggregations import (
+    CHAVES_SKETCH,
+    COLUNAS_SQL,
+    ESTOQUE_MEDIDAS,
+    VARS_CORRELACAO,
+    VARS_CORRELACAO_ESTOQUE,
+    VARS_PERCENTIS,
+    group_statistics,
+    inicio_mes,
+    rollup,
+)
+from dataset import FrameIndex
+from sketches import build_sketch
+
+MOMENTOS = ("n", "soma", "soma_quadrados", "soma_produtos")
+
+
+def grouped_correlation_moments(df, chaves, colunas):
+    """Calcula os momentos de `correlation_moments` para cada grupo de `chaves`.
+
+    Os grupos seguem a ordem de `group_statistics` com as mesmas chaves, e
+    cada momento é um array (grupos, colunas, colunas).
+    """
+    codigos = df.groupby(chaves, observed=True).ngroup().to_numpy()
+    grupos = int(codigos.max()) + 1 if len(codigos) else 0
+    k = len(colunas)
+    if grupos == 0:
+        vazio = np.zeros((0, k, k))
+        return {"colunas": list(colunas), **{chave: vazio for chave in MOMENTOS}}
+
+    # Linhas com chave nula ficam fora dos grupos, como em `group_statistics`
+    validas = np.flatnonzero(codigos >= 0)
+    ordem = validas[np.argsort(codigos[validas], kind="stable")]
+    codigos = codigos[ordem]
+    inicios = np.flatnonzero(np.r_[True, codigos[1:] != codigos[:-1]])
+
+    valores = df[colunas].to_numpy(dtype="float64", na_value=np.nan)[ordem]
+    presentes = ~np.isnan(valores)
+    valores = np.where(presentes, valores, 0.0)
+    presentes = presentes.astype("float64")
+
+    def somar(a, b):
+        # [g, i, j]: soma de a[:, i] * b[:, j] nas linhas do grupo g
+        return np.stack(
+            [np.add.reduceat(a[:, [i]] * b, inicios, axis=0) for i in range(k)],
+            axis=1,
+        )
+
+    return {
+        "colunas": list(colunas),
+        "n": somar(presentes, presentes),
+        "soma": somar(valores, presentes),
+        "soma_quadrados": somar(valores**2, presentes),
+        "soma_produtos": somar(valores, valores),
+    }
+
+
+def grouped_sketches(df, chaves, colunas, celulas):
+    """Sketches de cada coluna por célula, com as chaves de `CHAVES_SKETCH` da célula.
+
+    `celulas` é o resultado de `group_statistics` com as mesmas `chaves`;
+    a coluna `celula` guarda a posição da célula nele.
+    """
+    codigos = df.groupby(chaves, observed=True).ngroup().to_numpy()
+    df = df.assign(celula=codigos)[codigos >= 0]
+    atributos = celulas.assign(Mes=inicio_mes(celulas["Data"]))
+    atributos = atributos[[c for c in CHAVES_SKETCH if c in atributos]]
+    sketches = {}
+    for coluna in colunas:
+        sketch = build_sketch(df, ["celula"], coluna)
+        sketches[coluna] = pd.concat(
+            [
+                sketch,
+                atributos.iloc[sketch["celula"].to_numpy()].reset_index(drop=True),
+            ],
+            axis=1,
+        )
+    return sketches
+
+
+def build_cube(df, chaves, medidas, colunas_correlacao, colunas_percentis=()):
+    """Monta o cubo de `df` com uma célula por combinação de Data e `chaves`.
+
+    Retorna None se `df` estiver vazio (ex.: CSV ausente).
+    """
+    if df.empty:
+        return None
+    chaves = [coluna for coluna in chaves if coluna in df]
+    celulas = group_statistics(df, ["Data"] + chaves, medidas)
+    cubo = {
+        "chaves": chaves,
+        "celulas": celulas,
+        "indice": FrameIndex(celulas),
+        "momentos": grouped_correlation_moments(
+            df, ["Data"] + chaves, [c for c in colunas_correlacao if c in df.columns]
+        ),
+    }
+    if colunas_percentis:
+        cubo["sketches"] = grouped_sketches(
+            df, ["Data"] + chaves, colunas_percentis, celulas
+        )
+    return cubo
+
+
+def logistica_cube(df):
+    """Cubo de logística por dia × região × estado × status, com os atrasos de cada célula"""
+    cubo = build_cube(
+        df,
+        ["Regiao", "Estado", "Status"],
+        list(COLUNAS_SQL),
+        VARS_CORRELACAO,
+        VARS_PERCENTIS,
+    )
+    if cubo is None:
+        return None
+    celulas = cubo["celulas"]
+    celulas["atrasados"] = celulas["linhas"].where(celulas["Status"] == "Atrasado", 0)
+    return cubo
+
+
+def estoque_cube(df):
+    """Cubo de estoque por dia × região × estado"""
+    return build_cube(
+        df, ["Regiao", "Estado"], ESTOQUE_MEDIDAS, VARS_CORRELACAO_ESTOQUE
+    )
+
+
+def sketch_cube(celulas, sketches):
+    """Cubo só com os sketches dos percentis, como o de `logistica_sketch_cells`.
+
+    `celulas` tem Data, Regiao e Estado, ordenadas por `Data`, e `sketches`
+    os baldes de cada célula, como em `grouped_sketches`.
+    """
+    return {
+        "chaves": ["Regiao", "Estado"],
+        "celulas": celulas,
+        "indice": FrameIndex(celulas),
+        "sketches": sketches,
+    }
+
+
+def select_cells(cubo, start_date=None, end_date=None, regioes=None, estados=None):
+    """Retorna as posições das células que atendem aos filtros.
+
+    As células estão ordenadas por `Data` e indexadas por `FrameIndex`, como
+    as linhas dos dados compartilhados: o período vira uma fatia e região e
+    estado juntam as posições de cada par.
+    """
+    indice = cubo["indice"]
+    inicio, fim = indice.intervalo(start_date, end_date)
+    if regioes or (estados and "Estado" in cubo["chaves"]):
+        return indice.selecionar(inicio, fim, regioes, estados)
+    return np.arange(inicio, fim)
+
+
+def cube_statistics(cubo, start_date=None, end_date=None, regioes=None, estados=None):
+    """Soma as células selecionadas nas estatísticas usadas pelos agregados.
+
+    O resultado tem o formato de `logistica_statistics`/`estoque_statistics`
+    e pode ser passado a `*_aggregates_from_statistics`.
+    """
+    posicoes = select_cells(cubo, start_date, end_date, regioes, estados)
+    celulas = cubo["celulas"].iloc[posicoes]
+    momentos = cubo["momentos"]
+    chaves = cubo["chaves"]
+    estatisticas = {
+        "chaves": chaves,
+        "base": rollup(celulas.drop(columns="Data"), chaves),
+        "diario": rollup(celulas.drop(columns=chaves), "Data"),
+        "momentos": {
+            "colunas": momentos["colunas"],
+            **{chave: momentos[chave][posicoes].sum(axis=0) for chave in MOMENTOS},
+        },
+    }
+    if "sketches" in cubo:
+        estatisticas["sketches"] = select_sketches(cubo, posicoes)
+    return estatisticas
+
+
+def select_sketches(cubo, posicoes):
+    """Baldes dos sketches do cubo que pertencem às células em `posicoes`"""
+    selecionadas = np.zeros(len(cubo["celulas"]), dtype=bool)
+    selecionadas[posicoes] = True
+    # Os baldes de células diferentes não são somados aqui: os percentis
+    # já combinam as contagens por chave e balde
+    return {
+        coluna: sketch[selecionadas[sketch["celula"].to_numpy()]].drop(columns="celula")
+        for coluna, sketch in cubo["sketches"].items()
+    }
+
+
+def cube_sketches(cubo, start_date=None, end_date=None, regioes=None, estados=None):
+    """Baldes dos sketches das células que atendem aos filtros"""
+    return select_sketches(
+        cubo, select_cells(cubo, start_date, end_date, regioes, estados)
+    )
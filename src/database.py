@@ -0,0 +1,343 @@
+"""Acesso ao banco de dados PostgreSQL com pool de conexões reutilizáveis.
+
+O psycopg2 e o leitor de CSV do Arrow são importados só quando uma conexão
+é aberta ou um resultado é lido, para que os modos sem PostgreSQL não os
+carreguem.
+"""
+
+import io
+import threading
+import time
+from contextlib import contextmanager
+
+from schema import arrow_types_mapper
+
+
+def decimal_as_float():
+    """Tipo do psycopg2 que converte NUMERIC direto para float, sem um Decimal por valor"""
+    import psycopg2.extensions
+
+    return psycopg2.extensions.new_type(
+        psycopg2.extensions.DECIMAL.values,
+        "DECIMAL_AS_FLOAT",
+        lambda valor, cur: float(valor) if valor is not None else None,
+    )
+
+
+def _tipos_arrow():
+    # Tipos Arrow usados na leitura do COPY, por tipo do PostgreSQL
+    import psycopg2.extensions
+    import pyarrow as pa
+
+    return [
+        (psycopg2.STRING.values, pa.string()),
+        (psycopg2.extensions.DECIMAL.values, pa.float64()),
+        (psycopg2.extensions.FLOAT.values, pa.float64()),
+        (psycopg2.extensions.INTEGER.values, pa.int64()),
+        (psycopg2.extensions.LONGINTEGER.values, pa.int64()),
+        (psycopg2.extensions.DATE.values, pa.date32()),
+        (psycopg2.extensions.BOOLEAN.values, pa.bool_()),
+    ]
+
+
+class PoolTimeoutError(Exception):
+    """Nenhuma conexão ficou disponível dentro do tempo limite de espera"""
+
+
+class ConnectionPool:
+    """Pool de conexões thread-safe compartilhado entre as sessões do Streamlit.
+
+    Mantém até `max_size` conexões abertas, reaproveitando-as entre as cargas
+    para evitar um novo handshake TCP+TLS+autenticação a cada expiração de
+    cache. Conexões ociosas há mais de `idle_timeout` segundos são fechadas
+    (o Neon suspende endpoints ociosos) e conexões paradas há mais de
+    `health_check_interval` segundos passam por um `SELECT 1` antes de serem
+    entregues.
+    """
+
+    def __init__(
+        self,
+        dsn,
+        max_size=5,
+        idle_timeout=300,
+        health_check_interval=30,
+        checkout_timeout=10,
+        connect_timeout=10,
+    ):
+        self.dsn = dsn
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.checkout_timeout = checkout_timeout
+        self.connect_timeout = connect_timeout
+
+        self._cond = threading.Condition()
+        self._idle = []
+        self._in_use = 0
+        self._closed = False
+        self._stats = {
+            "checkouts": 0,
+            "conexoes_criadas": 0,
+            "conexoes_reutilizadas": 0,
+            "conexoes_descartadas": 0,
+            "health_checks_falhos": 0,
+            "reconexoes": 0,
+            "timeouts": 0,
+            "espera_total_s": 0.0,
+            "espera_max_s": 0.0,
+            "pico_em_uso": 0,
+        }
+
+    def _connect(self):
+        import psycopg2
+
+        conn = psycopg2.connect(self.dsn, connect_timeout=self.connect_timeout)
+        with self._cond:
+            self._stats["conexoes_criadas"] += 1
+        return conn
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._stats["conexoes_descartadas"] += 1
+
+    def _evict_idle(self):
+        """Fecha conexões ociosas além do `idle_timeout` (chamado com o lock)"""
+        agora = time.monotonic()
+        ativas = []
+        for conn, ultimo_uso in self._idle:
+            if conn.closed or agora - ultimo_uso > self.idle_timeout:
+                self._discard(conn)
+            else:
+                ativas.append((conn, ultimo_uso))
+        self._idle = ativas
+
+    def _is_healthy(self, conn, ultimo_uso):
+        import psycopg2
+
+        if conn.closed:
+            return False
+        if time.monotonic() - ultimo_uso < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def acquire(self):
+        """Retira uma conexão do pool, aguardando se o limite foi atingido"""
+        inicio = time.monotonic()
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeoutError("Pool de conexões encerrado")
+                self._evict_idle()
+                if self._idle:
+                    conn, ultimo_uso = self._idle.pop()
+                    break
+                if self._in_use < self.max_size:
+                    conn, ultimo_uso = None, None
+                    break
+                restante = self.checkout_timeout - (time.monotonic() - inicio)
+                if restante <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeoutError(
+                        f"Nenhuma conexão disponível após {self.checkout_timeout}s"
+                    )
+                self._cond.wait(restante)
+
+            self._in_use += 1
+            espera = time.monotonic() - inicio
+            self._stats["checkouts"] += 1
+            self._stats["espera_total_s"] += espera
+            self._stats["espera_max_s"] = max(self._stats["espera_max_s"], espera)
+            self._stats["pico_em_uso"] = max(self._stats["pico_em_uso"], self._in_use)
+
+        if conn is not None:
+            if self._is_healthy(conn, ultimo_uso):
+                with self._cond:
+                    self._stats["conexoes_reutilizadas"] += 1
+                return conn
+            with self._cond:
+                self._stats["health_checks_falhos"] += 1
+                self._discard(conn)
+
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn, broken=False):
+        """Devolve a conexão ao pool, descartando-a se estiver quebrada"""
+        import psycopg2
+
+        if not broken and not conn.closed:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+
+        with self._cond:
+            self._in_use -= 1
+            if broken or conn.closed or self._closed:
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Context manager que retira e devolve uma conexão do pool"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            # Conexões perdidas ou que recusam o rollback são descartadas em
+            # `release`; após um erro de consulta, a conexão volta ao pool
+            self.release(conn)
+
+    def run(self, func, retries=1):
+        """Executa `func(conn)`, repetindo até `retries` vezes se a conexão cair.
+
+        Só a perda da conexão leva a uma nova tentativa: erros da consulta,
+        como cancelamentos por `statement_timeout`, são repassados. Quem grava
+        dados que não podem ser gravados duas vezes passa `retries=0`.
+        """
+        import psycopg2
+
+        tentativa = 0
+        while True:
+            conn = None
+            try:
+                with self.connection() as conn:
+                    return func(conn)
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                # conn é None se a falha foi ao abrir a conexão
+                perdida = conn is None or conn.closed
+                if tentativa >= retries or not perdida:
+                    raise
+                tentativa += 1
+                with self._cond:
+                    self._stats["reconexoes"] += 1
+
+    def stats(self):
+        """Retorna os contadores de uso do pool para dimensionamento"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats["em_uso"] = self._in_use
+            stats["ociosas"] = len(self._idle)
+            stats["max_size"] = self.max_size
+        checkouts = stats["checkouts"]
+        stats["espera_media_ms"] = (
+            stats["espera_total_s"] / checkouts * 1000 if checkouts else 0.0
+        )
+        return stats
+
+    def close(self):
+        """Fecha todas as conexões ociosas e impede novos checkouts"""
+        with self._cond:
+            self._closed = True
+            for conn, _ in self._idle:
+                self._discard(conn)
+            self._idle = []
+            self._cond.notify_all()
+
+
+INDEXES_SQL = [
+    "CREATE INDEX IF NOT EXISTS idx_logistica_data ON logistica (data)",
+    "CREATE INDEX IF NOT EXISTS idx_logistica_regiao ON logistica (regiao)",
+    "CREATE INDEX IF NOT EXISTS idx_logistica_estado ON logistica (estado)",
+    "CREATE INDEX IF NOT EXISTS idx_demanda_estoque_data ON demanda_estoque (data)",
+    "CREATE INDEX IF NOT EXISTS idx_demanda_estoque_regiao ON demanda_estoque (regiao)",
+    "CREATE INDEX IF NOT EXISTS idx_demanda_estoque_estado ON demanda_estoque (estado)",
+    "CREATE INDEX IF NOT EXISTS idx_logistica_created_at ON logistica (created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_demanda_estoque_created_at ON demanda_estoque (created_at)",
+]
+
+
+def ensure_indexes(pool):
+    """Cria os índices usados pelos filtros de período, região e estado"""
+
+    def criar(conn):
+        with conn.cursor() as cur:
+            for sql in INDEXES_SQL:
+                cur.execute(sql)
+        conn.commit()
+
+    pool.run(criar)
+
+
+def _tipos_colunas(cur, query, params):
+    cur.execute(f"SELECT * FROM ({query}) AS consulta LIMIT 0", params)
+    tipos = {}
+    for coluna in cur.description:
+        for codigos, tipo in _tipos_arrow():
+            if coluna.type_code in codigos:
+                tipos[coluna.name] = tipo
+                break
+    return tipos
+
+
+def read_sql_frame(conn, query, params=None):
+    """Lê o resultado de uma consulta em um DataFrame com colunas nativas.
+
+    O resultado é transferido com `COPY ... TO STDOUT` e convertido pelo
+    leitor de CSV do Arrow com os tipos das colunas da consulta: NUMERIC
+    chega como float64, datas como datetime64 e textos como strings Arrow,
+    sem o `Decimal` por valor e as colunas de objetos de `pd.read_sql_query`.
+    """
+    import psycopg2.extensions
+    import pyarrow.csv as pacsv
+
+    buffer = io.BytesIO()
+    with conn.cursor() as cur:
+        tipos = _tipos_colunas(cur, query, params)
+        sql = cur.mogrify(query, params).decode(
+            psycopg2.extensions.encodings[conn.encoding]
+        )
+        cur.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER)", buffer)
+
+    buffer.seek(0)
+    tabela = pacsv.read_csv(
+        buffer,
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(
+            column_types=tipos,
+            # Só o NULL do COPY (campo vazio sem aspas) vira nulo
+            null_values=[""],
+            strings_can_be_null=True,
+            quoted_strings_can_be_null=False,
+            true_values=["t"],
+            false_values=["f"],
+        ),
+    )
+    return tabela.to_pandas(types_mapper=arrow_types_mapper, date_as_object=False)
+
+
+def build_filters(
+    start_date=None, end_date=None, regioes=None, estados=None, date_column="data"
+):
+    """Monta as cláusulas WHERE parametrizadas dos filtros da barra lateral"""
+    clauses = []
+    params = []
+    if start_date is not None:
+        clauses.append(f"{date_column} >= %s")
+        params.append(start_date)
+    if end_date is not None:
+        clauses.append(f"{date_column} <= %s")
+        params.append(end_date)
+    if regioes:
+        clauses.append("regiao = ANY(%s)")
+        params.append(list(regioes))
+    if estados:
+        clauses.append("estado = ANY(%s)")
+        params.append(list(estados))
+    return clauses, params
@@ -0,0 +1,445 @@
+"""Conjunto de dados mantido uma única vez por processo e compartilhado pelas sessões.
+
+Os DataFrames são tratados como somente leitura: as sessões recebem visões
+filtradas e, com o Copy-on-Write do pandas ativo, qualquer alteração feita
+por quem consome uma visão gera uma cópia local sem afetar os dados
+compartilhados.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from schema import memory_footprint
+
+pd.set_option("mode.copy_on_write", True)
+
+
+def merge_delta(df, delta, chave="ID"):
+    """Acrescenta ao DataFrame as linhas de `delta` cuja chave ainda não existe.
+
+    Retorna o DataFrame combinado e as linhas efetivamente acrescentadas.
+    Linhas já carregadas (ex.: relidas pela janela de sobreposição) são
+    ignoradas; alterações nelas são refletidas na reconciliação completa.
+    """
+    delta = delta[~delta[chave].isin(df[chave])]
+    if delta.empty:
+        return df, delta
+
+    delta = delta[df.columns]
+    for coluna in df.columns:
+        if isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            # Categorias novas (ex.: um estado que ainda não existia) entram em ordem
+            categorias = sorted(
+                set(df[coluna].cat.categories).union(delta[coluna].dropna().unique())
+            )
+            df = df.assign(**{coluna: df[coluna].cat.set_categories(categorias)})
+            delta = delta.assign(
+                **{coluna: delta[coluna].astype(pd.CategoricalDtype(categorias))}
+            )
+
+    combinado = pd.concat([df, delta], ignore_index=True)
+    return combinado.sort_values("Data", kind="stable", ignore_index=True), delta
+
+
+def _intersecta(alteracao, start_date, end_date, regioes, estados):
+    data_min, data_max, regioes_alteradas, estados_alterados = alteracao
+    if start_date is not None and data_max < pd.to_datetime(start_date):
+        return False
+    if end_date is not None and data_min > pd.to_datetime(end_date):
+        return False
+    if regioes and regioes_alteradas.isdisjoint(regioes):
+        return False
+    if estados and estados_alterados and estados_alterados.isdisjoint(estados):
+        return False
+    return True
+
+
+class FrameIndex:
+    """Índices de posição de um DataFrame ordenado por `Data`.
+
+    As datas são guardadas como um array ordenado, e um intervalo de datas
+    vira uma fatia contígua encontrada por busca binária. Para cada par
+    (Regiao, Estado), guarda as posições das linhas em ordem crescente, de
+    modo que os filtros de região e estado juntam apenas as posições dos
+    pares selecionados, sem comparar todas as linhas.
+    """
+
+    def __init__(self, df):
+        self.linhas = len(df)
+        self.datas = df["Data"].to_numpy() if "Data" in df else None
+        # NaT fica no fim da ordenação e não atende a nenhum filtro de período
+        self.validas = (
+            self.linhas - int(pd.isna(self.datas).sum())
+            if self.datas is not None
+            else self.linhas
+        )
+        self.posicoes = {}
+        if self.linhas and "Regiao" in df:
+            colunas = ["Regiao", "Estado"] if "Estado" in df else ["Regiao"]
+            grupos = df.groupby(
+                colunas, observed=True, sort=False, dropna=False
+            ).indices
+            for chave, posicoes in grupos.items():
+                if not isinstance(chave, tuple):
+                    chave = (chave, None)
+                self.posicoes[chave] = posicoes
+
+    def intervalo(self, start_date=None, end_date=None):
+        """Retorna o início e o fim (exclusivo) das linhas dentro do período"""
+        if start_date is None and end_date is None:
+            return 0, self.linhas
+        inicio, fim = 0, self.validas
+        if start_date is not None:
+            inicio = self.datas[:fim].searchsorted(
+                np.datetime64(pd.to_datetime(start_date)), side="left"
+            )
+        if end_date is not None:
+            fim = self.datas[:fim].searchsorted(
+                np.datetime64(pd.to_datetime(end_date)), side="right"
+            )
+        return int(inicio), int(max(inicio, fim))
+
+    def selecionar(self, inicio, fim, regioes=None, estados=None):
+        """Retorna as posições, em ordem, dos pares selecionados dentro da fatia"""
+        partes = []
+        for (regiao, estado), posicoes in self.posicoes.items():
+            if regioes and regiao not in regioes:
+                continue
+            if estados and estado is not None and estado not in estados:
+                continue
+            a, b = posicoes.searchsorted([inicio, fim])
+            if b > a:
+                partes.append(posicoes[a:b])
+        if not partes:
+            return np.empty(0, dtype=np.intp)
+        return np.sort(np.concatenate(partes))
+
+
+def load_concurrently(loaders):
+    """Executa em paralelo os carregadores de cada DataFrame.
+
+    `loaders` mapeia o nome de cada DataFrame à função sem argumentos que o
+    carrega. Retorna os DataFrames e o tempo de carga de cada um, em
+    segundos; o tempo total fica sendo o da carga mais lenta, e não a soma.
+    """
+
+    def medir(carregar):
+        inicio = time.perf_counter()
+        df = carregar()
+        return df, time.perf_counter() - inicio
+
+    with ThreadPoolExecutor(
+        max_workers=max(len(loaders), 1), thread_name_prefix="shared-dataset-load"
+    ) as executor:
+        futuros = {
+            nome: executor.submit(medir, carregar) for nome, carregar in loaders.items()
+        }
+        resultados = {nome: futuro.result() for nome, futuro in futuros.items()}
+
+    frames = {nome: df for nome, (df, _) in resultados.items()}
+    tempos = {nome: duracao for nome, (_, duracao) in resultados.items()}
+    return frames, tempos
+
+
+def _tem_datas(df):
+    # CSVs ausentes ou ilegíveis chegam como DataFrames vazios, sem colunas
+    return not df.empty and "Data" in df
+
+
+def _ordenar_por_data(df):
+    if not _tem_datas(df):
+        return df
+    return df.sort_values("Data", kind="stable", ignore_index=True)
+
+
+class SharedDataset:
+    """Guarda os DataFrames completos e os mantém atualizados em segundo plano.
+
+    `loader` mapeia o nome de cada DataFrame à função que o carrega (as
+    funções são executadas em paralelo) e `version_loader` retorna uma
+    identificação barata da versão dos dados de origem. Apenas a primeira
+    leitura é feita pela sessão que pediu os dados; depois dela uma thread
+    verifica a versão a cada `interval` segundos e, quando ela muda, carrega
+    a nova versão e a troca de forma atômica. Durante a recarga, e também se
+    ela falhar, as sessões continuam recebendo a última versão válida.
+    `fallback`, no mesmo formato de `loader`, é usado somente quando a
+    primeira leitura falha.
+
+    Com `delta_loader`, as mudanças de versão são aplicadas de forma
+    incremental: ele recebe a versão carregada e retorna, para cada DataFrame,
+    as linhas criadas desde ela e o total de linhas esperado (ou None para
+    pedir uma recarga completa). Se o total não bater, houve exclusões e os
+    dados são recarregados por completo, o que também acontece a cada
+    `reconcile_interval` segundos para refletir linhas alteradas.
+
+    `cubes`, no formato `{nome: função}`, resume cada DataFrame publicado em
+    um cubo de estatísticas (ver `cube.py`), montado junto com os índices a
+    cada nova versão e obtido com `cube(nome)`.
+    """
+
+    def __init__(
+        self,
+        loader,
+        version_loader,
+        interval=60,
+        fallback=None,
+        delta_loader=None,
+        reconcile_interval=3600,
+        chave="ID",
+        cubes=None,
+    ):
+        self._loader = loader
+        self._version_loader = version_loader
+        self._fallback = fallback
+        self._delta_loader = delta_loader
+        self.interval = interval
+        self.reconcile_interval = reconcile_interval
+        self._chave = chave
+        self._construtores_cubos = cubes or {}
+        self._lock = threading.Lock()
+        self._carga_inicial = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+        self._frames = None
+        self._indices = {}
+        self._cubos = {}
+        self._versao = None
+        self._geracao = 0
+        self._geracao_completa = 0
+        self._alteracoes = {}
+        self.memoria = {}
+        self.carregado_em = None
+        self.completo_em = None
+        self.tempos_carga = {}
+        self.duracao_carga = None
+        self.verificado_em = None
+        self.recargas = 0
+        self.incrementos = 0
+        self.ultimo_erro = None
+
+    def _publicar(self, frames, versao, alteracoes=None):
+        memoria = {nome: memory_footprint(df) for nome, df in frames.items()}
+        indices = {
+            nome: FrameIndex(df) for nome, df in frames.items() if _tem_datas(df)
+        }
+        cubos = {
+            nome: construir(frames[nome])
+            for nome, construir in self._construtores_cubos.items()
+            if nome in frames
+        }
+        agora = time.time()
+        with self._lock:
+            self._geracao += 1
+            if alteracoes is None:
+                self._geracao_completa = self._geracao
+                self._alteracoes = {nome: [] for nome in frames}
+                self.completo_em = agora
+                self.recargas += 1
+            else:
+                for nome, alteracao in alteracoes.items():
+                    self._alteracoes[nome].append((self._geracao, alteracao))
+                self.incrementos += 1
+            self._frames, self._indices, self._cubos = frames, indices, cubos
+            self._versao, self.memoria = versao, memoria
+            self.carregado_em = self.verificado_em = agora
+
+    def _carregar(self, loader=None, versao=None):
+        if loader is None:
+            loader, versao = self._loader, self._version_loader()
+        inicio = time.perf_counter()
+        frames, tempos = load_concurrently(
+            {
+                nome: lambda carregar=carregar: _ordenar_por_data(carregar())
+                for nome, carregar in loader.items()
+            }
+        )
+        duracao = time.perf_counter() - inicio
+        print(
+            f"Carga completa dos dados em {duracao:.2f} s ("
+            + ", ".join(f"{nome}: {tempo:.2f} s" for nome, tempo in tempos.items())
+            + ")"
+        )
+        self._publicar(frames, versao)
+        self.tempos_carga, self.duracao_carga = tempos, duracao
+
+    def _aplicar_delta(self, versao):
+        deltas = self._delta_loader(self._versao)
+        if deltas is None:
+            return False
+
+        frames = dict(self._frames)
+        alteracoes = {}
+        for nome, (delta, total) in deltas.items():
+            combinado, delta = merge_delta(frames[nome], delta, self._chave)
+            if len(combinado) != total:
+                return False
+            frames[nome] = combinado
+            if not delta.empty:
+                alteracoes[nome] = (
+                    delta["Data"].min(),
+                    delta["Data"].max(),
+                    set(delta["Regiao"].dropna()),
+                    set(delta["Estado"].dropna()) if "Estado" in delta else set(),
+                )
+
+        self._publicar(frames, versao, alteracoes)
+        return True
+
+    def snapshot(self):
+        """Retorna a versão atual dos DataFrames sem esperar por atualizações"""
+        frames = self._frames
+        if frames is not None:
+            return frames
+
+        with self._carga_inicial:
+            if self._frames is None:
+                try:
+                    self._carregar()
+                    self.ultimo_erro = None
+                except Exception as e:
+                    if self._fallback is None:
+                        raise
+                    print(f"Erro ao carregar dados compartilhados: {e}")
+                    # Sem versão: a próxima verificação tenta a origem novamente
+                    self._carregar(self._fallback, None)
+                    self.ultimo_erro = str(e)
+        self.start()
+        return self._frames
+
+    def view(self, nome, start_date=None, end_date=None, regioes=None, estados=None):
+        """Retorna a visão filtrada de um DataFrame usando os índices da versão atual"""
+        self.snapshot()
+        with self._lock:
+            df, indice = self._frames[nome], self._indices.get(nome)
+        return filtered_view(df, start_date, end_date, regioes, estados, indice)
+
+    def cube(self, nome):
+        """Retorna o cubo de estatísticas da versão atual de um DataFrame"""
+        self.snapshot()
+        with self._lock:
+            return self._cubos[nome]
+
+    def refresh(self):
+        """Verifica a versão da origem e aplica as mudanças, se houver.
+
+        Retorna "completa", "incremental" ou None quando nada mudou.
+        """
+        try:
+            versao = self._version_loader()
+            reconciliar = (
+                self.reconcile_interval is not None
+                and self.completo_em is not None
+                and time.time() - self.completo_em >= self.reconcile_interval
+            )
+            if versao == self._versao and not reconciliar:
+                self.verificado_em = time.time()
+                self.ultimo_erro = None
+                return None
+
+            incremental = (
+                not reconciliar
+                and self._delta_loader is not None
+                and self._versao is not None
+                and self._aplicar_delta(versao)
+            )
+            if not incremental:
+                self._carregar(self._loader, versao)
+            self.ultimo_erro = None
+            return "incremental" if incremental else "completa"
+        except Exception as e:
+            print(f"Erro ao atualizar dados compartilhados em segundo plano: {e}")
+            self.ultimo_erro = str(e)
+            return None
+
+    def _executar(self):
+        while not self._parar.wait(self.interval):
+            self.refresh()
+
+    def start(self):
+        """Inicia a thread de atualização em segundo plano, se ainda não iniciada"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._executar, name="shared-dataset-refresh", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """Interrompe a thread de atualização em segundo plano"""
+        self._parar.set()
+
+    def geracao(self, nome, start_date=None, end_date=None, regioes=None, estados=None):
+        """Identifica a última mudança dos dados que afeta a combinação de filtros.
+
+        Serve como chave de cache dos agregados: atualizações incrementais que
+        não tocam o período, as regiões ou os estados filtrados mantêm a mesma
+        geração, e os agregados em cache continuam válidos.
+        """
+        self.snapshot()
+        with self._lock:
+            ultima = self._geracao_completa
+            for geracao, alteracao in self._alteracoes.get(nome, []):
+                if _intersecta(alteracao, start_date, end_date, regioes, estados):
+                    ultima = geracao
+        return ultima
+
+    @property
+    def versao(self):
+        return self._versao
+
+    @property
+    def carregado(self):
+        return self._frames is not None
+
+    def idade(self):
+        """Segundos desde a última leitura ou verificação bem-sucedida da origem"""
+        if self.verificado_em is None:
+            return None
+        return time.time() - self.verificado_em
+
+
+def filtered_view(
+    df, start_date=None, end_date=None, regioes=None, estados=None, indice=None
+):
+    """Retorna as linhas que atendem aos filtros sem copiar o DataFrame inteiro.
+
+    Sem filtros, devolve uma cópia rasa (que não duplica os dados com o
+    Copy-on-Write ativo); com filtros, apenas as linhas selecionadas são
+    materializadas. Com o `indice` do DataFrame (ordenado por `Data`), o
+    período vira uma fatia sem cópia e região e estado são resolvidos pelas
+    posições de cada par, sem máscaras do tamanho do DataFrame.
+    """
+    if df.empty:
+        return df.copy(deep=False)
+
+    if indice is not None:
+        inicio, fim = indice.intervalo(start_date, end_date)
+        if regioes or (estados and "Estado" in df.columns):
+            posicoes = indice.selecionar(inicio, fim, regioes, estados)
+            if len(posicoes) < fim - inicio:
+                return df.take(posicoes)
+        if inicio == 0 and fim == len(df):
+            return df.copy(deep=False)
+        return df.iloc[inicio:fim]
+
+    mask = None
+    if start_date is not None:
+        mask = df["Data"] >= pd.to_datetime(start_date)
+    if end_date is not None:
+        condicao = df["Data"] <= pd.to_datetime(end_date)
+        mask = condicao if mask is None else mask & condicao
+    if regioes:
+        condicao = df["Regiao"].isin(regioes)
+        mask = condicao if mask is None else mask & condicao
+    if estados and "Estado" in df.columns:
+        condicao = df["Estado"].isin(estados)
+        mask = condicao if mask is None else mask & condicao
+
+    if mask is None or mask.all():
+        return df.copy(deep=False)
+    return df[mask]
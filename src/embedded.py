@@ -0,0 +1,193 @@
+"""Banco embutido DuckDB sobre os arquivos de `assets/`, para uso sem PostgreSQL.
+
+Os CSVs (ou arquivos Parquet com o mesmo nome, quando existirem) são
+importados para tabelas DuckDB com os mesmos nomes e colunas do PostgreSQL,
+e as consultas de agregação do dashboard rodam sem alterações sobre elas:
+o DuckDB as executa de forma vetorizada, em vários núcleos, e o banco em
+disco permite trabalhar com bases maiores que a memória. As tabelas são
+reimportadas quando o tamanho ou a data de modificação do arquivo mudam.
+
+`EmbeddedDatabase.run(func)` segue a interface do pool de conexões do
+PostgreSQL: `func` recebe uma conexão com `cursor()` e placeholders `%s`.
+"""
+
+import re
+import threading
+
+import duckdb
+
+from rollups import ROLLUP_MEDIDAS_SQL
+
+# Tabela do banco -> nome do arquivo em assets/, sem extensão
+FONTES = {
+    "logistica": "logistica_simulada",
+    "demanda_estoque": "demanda_estoque",
+}
+
+# Leitor do DuckDB para cada formato aceito, em ordem de preferência
+LEITORES = [(".parquet", "read_parquet"), (".csv", "read_csv")]
+
+ROLLUP_ESTOQUE_SQL = f"""
+    CREATE OR REPLACE TABLE demanda_estoque_diario AS
+    SELECT data, estado, regiao, {ROLLUP_MEDIDAS_SQL}
+    FROM demanda_estoque
+    GROUP BY data, estado, regiao
+"""
+
+
+def _placeholders(query):
+    # %s do psycopg2 vira ? no DuckDB; %% volta a ser um % literal
+    return re.sub(r"%([s%])", lambda m: "?" if m.group(1) == "s" else "%", query)
+
+
+def _literal(texto):
+    return "'" + str(texto).replace("'", "''") + "'"
+
+
+class EmbeddedCursor:
+    """Cursor DB-API sobre o DuckDB que aceita os placeholders do psycopg2"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=None):
+        self._cursor.execute(_placeholders(query), list(params) if params else None)
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchmany(self, size):
+        return self._cursor.fetchmany(size)
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class EmbeddedConnection:
+    """Conexão entregue por `EmbeddedDatabase.run`, no formato usado pelas consultas"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self):
+        return EmbeddedCursor(self._cursor)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class EmbeddedDatabase:
+    """Banco DuckDB com as tabelas importadas de `assets_dir`.
+
+    `path` é o arquivo do banco (":memory:" para mantê-lo só em memória) e
+    `memory_limit`, se informado, limita a memória usada pelo DuckDB; acima
+    dele, os operadores gravam resultados intermediários em disco.
+    """
+
+    def __init__(self, assets_dir, path=":memory:", memory_limit=None):
+        self.assets_dir = assets_dir
+        config = {"memory_limit": memory_limit} if memory_limit else {}
+        self._conn = duckdb.connect(str(path), config=config)
+        self._lock = threading.Lock()
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS fontes_importadas (
+                tabela TEXT PRIMARY KEY,
+                origem TEXT,
+                tamanho BIGINT,
+                mtime_ns BIGINT
+            )
+            """
+        )
+
+    def _origem(self, nome_arquivo):
+        for sufixo, leitor in LEITORES:
+            caminho = self.assets_dir / f"{nome_arquivo}{sufixo}"
+            if caminho.exists():
+                return caminho, leitor
+        return None, None
+
+    def _importar(self, tabela, caminho, leitor):
+        origem = f"{leitor}({_literal(caminho)})"
+        colunas = [
+            linha[0]
+            for linha in self._conn.execute(
+                f"DESCRIBE SELECT * FROM {origem}"
+            ).fetchall()
+        ]
+        selecao = ", ".join(f'"{coluna}" AS {coluna.lower()}' for coluna in colunas)
+        if "id" not in {coluna.lower() for coluna in colunas}:
+            # Os CSVs não têm chave; a posição da linha desempata a ordenação por data
+            selecao = f"row_number() OVER () AS id, {selecao}"
+        self._conn.execute(
+            f"CREATE OR REPLACE TABLE {tabela} AS SELECT {selecao} FROM {origem}"
+        )
+
+    def sync(self):
+        """Reimporta as tabelas cujos arquivos mudaram desde a última importação.
+
+        Retorna os nomes das tabelas reimportadas.
+        """
+        with self._lock:
+            importadas = {
+                tabela: (origem, tamanho, mtime_ns)
+                for tabela, origem, tamanho, mtime_ns in self._conn.execute(
+                    "SELECT * FROM fontes_importadas"
+                ).fetchall()
+            }
+            alteradas = []
+            for tabela, nome_arquivo in FONTES.items():
+                caminho, leitor = self._origem(nome_arquivo)
+                if caminho is None:
+                    continue
+                stat = caminho.stat()
+                versao = (str(caminho), stat.st_size, stat.st_mtime_ns)
+                if importadas.get(tabela) == versao:
+                    continue
+
+                self._conn.execute("BEGIN")
+                try:
+                    self._importar(tabela, caminho, leitor)
+                    if tabela == "demanda_estoque":
+                        self._conn.execute(ROLLUP_ESTOQUE_SQL)
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO fontes_importadas VALUES (?, ?, ?, ?)",
+                        [tabela, *versao],
+                    )
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+                alteradas.append(tabela)
+            return alteradas
+
+    def run(self, func):
+        """Executa `func(conn)` em um cursor próprio, após sincronizar as tabelas"""
+        self.sync()
+        cursor = self._conn.cursor()
+        try:
+            return func(EmbeddedConnection(cursor))
+        finally:
+            cursor.close()
+
+    def close(self):
+        """Fecha o banco"""
+        with self._lock:
+            self._conn.close()
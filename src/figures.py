@@ -0,0 +1,462 @@
+"""Montagem dos gráficos do dashboard a partir dos agregados de cada seção.
+
+As funções são puras: recebem o dicionário produzido por `aggregations.py` e
+retornam as figuras Plotly por nome, o que permite guardá-las em cache por
+versão dos dados e combinação de filtros. Os gráficos por período ficam em
+funções próprias, para que trocar a granularidade não remonte os demais.
+
+As séries diárias de tendência são reduzidas a no máximo `max_pontos`
+pontos por série, agrupando os dias em semanas, meses ou trimestres quando
+o período selecionado é longo; o tamanho do JSON enviado ao navegador fica
+registrado em `figuras["series_temporais"]`.
+"""
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from aggregations import (
+    GRANULARIDADES,
+    estoque_period_series,
+    estoque_trend_series,
+    logistica_period_series,
+    logistica_trend_series,
+)
+
+# Nome do período de cada resolução das séries de tendência
+PERIODOS_RESOLUCAO = {"dia": "Dia"} | {
+    codigo: periodo for codigo, (_, periodo) in GRANULARIDADES.items()
+}
+
+
+def _titulo_tendencia(titulo, resolucao):
+    if resolucao == "dia":
+        return titulo
+    return f"{titulo} (média por {PERIODOS_RESOLUCAO[resolucao].lower()})"
+
+
+def _resumo_serie(figura, resolucao):
+    """Pontos por série, resolução e tamanho do JSON da figura enviado ao navegador"""
+    return {
+        "pontos": len(figura.data[0].x) if figura.data else 0,
+        "resolucao": PERIODOS_RESOLUCAO[resolucao],
+        "bytes": len(figura.to_json()),
+    }
+
+
+def _top_estados(df_por_estado, coluna, rotulo, ascending=False):
+    df_top = (
+        df_por_estado[["Estado", coluna]]
+        .sort_values(coluna, ascending=ascending)
+        .head(10)
+    )
+    df_top.columns = ["Estado", rotulo]
+    return df_top
+
+
+def _percentis_estados(df_percentis, medida, rotulo):
+    """p50, p90 e p99 dos 10 estados com maior p90, no formato longo do Plotly"""
+    df_top = (
+        df_percentis[df_percentis["Medida"] == medida]
+        .sort_values("p90", ascending=False)
+        .head(10)
+    )
+    return df_top.melt(
+        id_vars="Estado",
+        value_vars=["p50", "p90", "p99"],
+        var_name="Percentil",
+        value_name=rotulo,
+    )
+
+
+def logistica_figures(agregados, max_pontos=None):
+    """Monta os gráficos da seção de logística"""
+    figuras = {}
+
+    df_trend, resolucao = logistica_trend_series(agregados["diario"], max_pontos)
+    fig_trend = px.line(
+        df_trend,
+        x="Data",
+        y=["Tempo_Resposta_Previsto", "Tempo_Resposta_Real"],
+        labels={"value": "Tempo Médio (dias)", "variable": "Métrica"},
+        title=_titulo_tendencia(
+            "Comparação de Tempo de Resposta ao Longo do Tempo", resolucao
+        ),
+    )
+    fig_trend.update_layout(legend_title_text="Tempo de Resposta")
+    figuras["tendencia"] = fig_trend
+    figuras["series_temporais"] = {"tendencia": _resumo_serie(fig_trend, resolucao)}
+
+    df_region = agregados["por_regiao_status"]
+    df_region_total = agregados["por_regiao"][["Regiao", "Total"]]
+    df_region = pd.merge(df_region, df_region_total, on="Regiao")
+    df_region["Taxa_Atraso"] = np.where(
+        df_region["Status"] == "Atrasado",
+        (df_region["Contagem"] / df_region["Total"]) * 100,
+        0,
+    )
+    figuras["regiao"] = px.bar(
+        df_region.sort_values("Taxa_Atraso", ascending=False),
+        x="Regiao",
+        y="Taxa_Atraso",
+        color="Regiao",
+        labels={"Taxa_Atraso": "Taxa de Atraso (%)", "Regiao": "Região"},
+        title="Taxa de Atraso por Região",
+    )
+
+    df_por_estado = agregados["por_estado"]
+
+    if "Estado" in df_por_estado.columns:
+        figuras["estado_rapido"] = px.bar(
+            _top_estados(
+                df_por_estado,
+                "Tempo_Resposta_Real",
+                "Tempo Médio (dias)",
+                ascending=True,
+            ),
+            x="Tempo Médio (dias)",
+            y="Estado",
+            orientation="h",
+            title="Top 10 Estados - Menor Tempo de Entrega",
+            color="Tempo Médio (dias)",
+            color_continuous_scale="Greens_r",
+        )
+        figuras["estado_lento"] = px.bar(
+            _top_estados(df_por_estado, "Tempo_Resposta_Real", "Tempo Médio (dias)"),
+            x="Tempo Médio (dias)",
+            y="Estado",
+            orientation="h",
+            title="Top 10 Estados - Maior Tempo de Entrega",
+            color="Tempo Médio (dias)",
+            color_continuous_scale="Reds",
+        )
+
+        df_percentis = agregados["percentis"]["Estado"]
+        figuras["percentis_tempo_estado"] = px.bar(
+            _percentis_estados(df_percentis, "Tempo_Resposta_Real", "Tempo (dias)"),
+            x="Tempo (dias)",
+            y="Estado",
+            color="Percentil",
+            barmode="group",
+            orientation="h",
+            title="Top 10 Estados - Maior p90 do Tempo de Entrega",
+            color_discrete_sequence=px.colors.sequential.Reds[3::2],
+        )
+        figuras["percentis_custo_estado"] = px.bar(
+            _percentis_estados(df_percentis, "Custo_Logistico_USD", "Custo (USD)"),
+            x="Custo (USD)",
+            y="Estado",
+            color="Percentil",
+            barmode="group",
+            orientation="h",
+            title="Top 10 Estados - Maior p90 do Custo Logístico",
+            color_discrete_sequence=px.colors.sequential.Blues[3::2],
+        )
+
+    df_summary = agregados["por_regiao"][
+        ["Regiao", "Custo_Medio_USD", "Emissao_Media_CO2"]
+    ].sort_values("Custo_Medio_USD", ascending=False)
+    figuras["custo_emissao"] = px.scatter(
+        df_summary,
+        x="Custo_Medio_USD",
+        y="Emissao_Media_CO2",
+        color="Regiao",
+        size="Emissao_Media_CO2",
+        hover_name="Regiao",
+        title="Relação Custo vs. Emissão de Carbono por Região",
+        labels={
+            "Custo_Medio_USD": "Custo Médio Logístico (USD)",
+            "Emissao_Media_CO2": "Emissão Média de CO2 (kg)",
+        },
+    )
+
+    fig_corr = px.imshow(
+        agregados["correlacao"],
+        text_auto=".2f",
+        aspect="auto",
+        color_continuous_scale="RdBu",
+        title="Matriz de Correlação - Variáveis de Logística",
+        labels=dict(color="Correlação"),
+    )
+    fig_corr.update_layout(height=500)
+    figuras["correlacao"] = fig_corr
+
+    figuras["custo_estado"] = px.bar(
+        _top_estados(df_por_estado, "Custo_Logistico_USD", "Custo Total (USD)"),
+        x="Custo Total (USD)",
+        y="Estado",
+        orientation="h",
+        title="Top 10 Estados - Maior Custo Logístico",
+        color="Custo Total (USD)",
+        color_continuous_scale="Blues",
+    )
+    figuras["emissao_estado"] = px.bar(
+        _top_estados(df_por_estado, "Emissao_CO2_kg", "Emissão Total (kg CO2)"),
+        x="Emissão Total (kg CO2)",
+        y="Estado",
+        orientation="h",
+        title="Top 10 Estados - Maior Emissão de CO2",
+        color="Emissão Total (kg CO2)",
+        color_continuous_scale="Oranges",
+    )
+
+    return figuras
+
+
+def logistica_period_figures(agregados, granularidade="mes"):
+    """Monta os gráficos por período da seção de logística"""
+    adjetivo, periodo = GRANULARIDADES[granularidade]
+    df_periodo = logistica_period_series(agregados["diario"], granularidade)
+
+    fig_tempo = px.line(
+        df_periodo,
+        x="Periodo",
+        y="Tempo_Medio",
+        markers=True,
+        title=f"Tempo Médio de Entrega {adjetivo}",
+        labels={"Tempo_Medio": "Tempo (dias)", "Periodo": periodo},
+    )
+    fig_tempo.update_xaxes(tickangle=45)
+
+    fig_custo = px.line(
+        df_periodo,
+        x="Periodo",
+        y="Custo_Medio",
+        markers=True,
+        title=f"Custo Médio {adjetivo} (USD)",
+        labels={"Custo_Medio": "Custo (USD)", "Periodo": periodo},
+    )
+    fig_custo.update_xaxes(tickangle=45)
+
+    return {"tempo_periodo": fig_tempo, "custo_periodo": fig_custo}
+
+
+def estoque_figures(agregados, max_pontos=None):
+    """Monta os gráficos da seção de estoque e demanda"""
+    figuras = {}
+    df_por_regiao = agregados["por_regiao"]
+    df_estoque_estado = agregados["por_estado"]
+
+    df_trend, resolucao = estoque_trend_series(agregados["diario"], max_pontos)
+    fig_demanda_estoque = px.line(
+        df_trend,
+        x="Data",
+        y=["Demanda_Diaria", "Estoque_Final"],
+        labels={"value": "Quantidade", "variable": "Métrica"},
+        title=_titulo_tendencia("Tendência de Demanda e Estoque", resolucao),
+    )
+    fig_demanda_estoque.update_layout(legend_title_text="Métrica")
+    figuras["demanda_estoque"] = fig_demanda_estoque
+    figuras["series_temporais"] = {
+        "demanda_estoque": _resumo_serie(fig_demanda_estoque, resolucao)
+    }
+
+    df_stock_out_regiao = df_por_regiao[
+        ["Regiao", "Stock_Out", "Demanda_Diaria"]
+    ].copy()
+    df_stock_out_regiao["Percentual_Stock_Out"] = (
+        df_stock_out_regiao["Stock_Out"] / df_stock_out_regiao["Demanda_Diaria"] * 100
+    )
+    figuras["stock_out"] = px.bar(
+        df_stock_out_regiao.sort_values("Stock_Out", ascending=False),
+        x="Regiao",
+        y="Stock_Out",
+        color="Percentual_Stock_Out",
+        color_continuous_scale="Reds",
+        labels={"Stock_Out": "Stock Out Total", "Regiao": "Região"},
+        title="Stock Out Total por Região",
+    )
+
+    figuras["atendimento"] = px.bar(
+        df_por_regiao[["Regiao", "Taxa_Atendimento"]].sort_values(
+            "Taxa_Atendimento", ascending=False
+        ),
+        x="Regiao",
+        y="Taxa_Atendimento",
+        color="Taxa_Atendimento",
+        color_continuous_scale="Greens",
+        labels={"Taxa_Atendimento": "Taxa de Atendimento (%)", "Regiao": "Região"},
+        title="Taxa Média de Atendimento por Região",
+    )
+
+    figuras["estado_stock"] = px.bar(
+        df_estoque_estado[["Estado", "Stock_Out"]]
+        .sort_values("Stock_Out", ascending=False)
+        .head(10),
+        x="Stock_Out",
+        y="Estado",
+        orientation="h",
+        color="Stock_Out",
+        color_continuous_scale="Reds",
+        labels={"Stock_Out": "Stock Out Total"},
+        title="Top 10 Estados com Maior Stock Out",
+    )
+
+    fig_corr_estoque = px.imshow(
+        agregados["correlacao"],
+        text_auto=".2f",
+        aspect="auto",
+        color_continuous_scale="RdYlGn",
+        title="Matriz de Correlação - Variáveis de Estoque e Demanda",
+        labels=dict(color="Correlação"),
+    )
+    fig_corr_estoque.update_layout(height=600)
+    figuras["correlacao"] = fig_corr_estoque
+
+    figuras["demanda_estado"] = px.bar(
+        _top_estados(df_estoque_estado, "Demanda_Diaria", "Demanda Total"),
+        x="Demanda Total",
+        y="Estado",
+        orientation="h",
+        title="Top 10 Estados - Maior Demanda Total",
+        color="Demanda Total",
+        color_continuous_scale="Blues",
+    )
+    figuras["atendimento_estado"] = px.bar(
+        _top_estados(df_estoque_estado, "Taxa_Atendimento", "Taxa de Atendimento (%)"),
+        x="Taxa de Atendimento (%)",
+        y="Estado",
+        orientation="h",
+        title="Top 10 Estados - Melhor Taxa de Atendimento",
+        color="Taxa de Atendimento (%)",
+        color_continuous_scale="Greens",
+    )
+
+    figuras["reab_regiao"] = px.bar(
+        df_por_regiao[["Regiao", "Reabastecimento"]].sort_values(
+            "Reabastecimento", ascending=False
+        ),
+        x="Regiao",
+        y="Reabastecimento",
+        title="Total de Reabastecimentos por Região",
+        color="Reabastecimento",
+        color_continuous_scale="Viridis",
+        labels={"Reabastecimento": "Total Reabastecimentos", "Regiao": "Região"},
+    )
+    figuras["reab_estado"] = px.bar(
+        _top_estados(df_estoque_estado, "Reabastecimento", "Total Reabastecimentos"),
+        x="Total Reabastecimentos",
+        y="Estado",
+        orientation="h",
+        title="Top 10 Estados - Mais Reabastecimentos",
+        color="Total Reabastecimentos",
+        color_continuous_scale="Purples",
+    )
+
+    df_atend_vs_nao = df_por_regiao[
+        ["Regiao", "Demanda_Atendida", "Demanda_Nao_Atendida"]
+    ]
+    fig_atend_comparacao = go.Figure()
+    fig_atend_comparacao.add_trace(
+        go.Bar(
+            x=df_atend_vs_nao["Regiao"],
+            y=df_atend_vs_nao["Demanda_Atendida"],
+            name="Demanda Atendida",
+            marker_color="#00FFC6",
+        )
+    )
+    fig_atend_comparacao.add_trace(
+        go.Bar(
+            x=df_atend_vs_nao["Regiao"],
+            y=df_atend_vs_nao["Demanda_Nao_Atendida"],
+            name="Demanda Não Atendida",
+            marker_color="#FF6B6B",
+        )
+    )
+    fig_atend_comparacao.update_layout(
+        title="Demanda Atendida vs Não Atendida por Região",
+        xaxis_title="Região",
+        yaxis_title="Demanda",
+        barmode="group",
+        height=500,
+    )
+    figuras["atend_comparacao"] = fig_atend_comparacao
+
+    return figuras
+
+
+def estoque_period_figures(agregados, granularidade="mes"):
+    """Monta os gráficos por período da seção de estoque e demanda"""
+    adjetivo, periodo = GRANULARIDADES[granularidade]
+    df_periodo = estoque_period_series(agregados["diario"], granularidade)
+
+    fig_demanda = go.Figure()
+    fig_demanda.add_trace(
+        go.Scatter(
+            x=df_periodo["Periodo"],
+            y=df_periodo["Demanda_Diaria"],
+            name="Demanda Total",
+            line=dict(color="#00FFC6", width=2),
+            mode="lines+markers",
+        )
+    )
+    fig_demanda.add_trace(
+        go.Scatter(
+            x=df_periodo["Periodo"],
+            y=df_periodo["Estoque_Final"],
+            name="Estoque Final Médio",
+            line=dict(color="#1DE9B6", width=2),
+            mode="lines+markers",
+        )
+    )
+    fig_demanda.update_layout(
+        title=f"Demanda e Estoque {adjetivo}",
+        xaxis_title=periodo,
+        yaxis_title="Quantidade",
+        hovermode="x unified",
+        height=400,
+    )
+    fig_demanda.update_xaxes(tickangle=45)
+
+    fig_stock = go.Figure()
+    fig_stock.add_trace(
+        go.Scatter(
+            x=df_periodo["Periodo"],
+            y=df_periodo["Stock_Out"],
+            name="Stock Out Total",
+            line=dict(color="#FF6B6B", width=2),
+            mode="lines+markers",
+            yaxis="y",
+        )
+    )
+    fig_stock.add_trace(
+        go.Scatter(
+            x=df_periodo["Periodo"],
+            y=df_periodo["Taxa_Atendimento"],
+            name="Taxa de Atendimento (%)",
+            line=dict(color="#FFD93D", width=2),
+            mode="lines+markers",
+            yaxis="y2",
+        )
+    )
+    fig_stock.update_layout(
+        title=f"Stock Out e Taxa de Atendimento {adjetivo}",
+        xaxis_title=periodo,
+        yaxis=dict(title="Stock Out Total", side="left"),
+        yaxis2=dict(title="Taxa de Atendimento (%)", side="right", overlaying="y"),
+        hovermode="x unified",
+        height=400,
+    )
+    fig_stock.update_xaxes(tickangle=45)
+
+    return {"demanda_periodo": fig_demanda, "stock_periodo": fig_stock}
+
+
+def simulation_figures(serie, resolucao):
+    """Monta os gráficos da simulação de reposição a partir de `simulation_series`"""
+    fig_estoque = px.line(
+        serie,
+        x="Data",
+        y=["Estoque_Simulado", "Estoque_Historico"],
+        labels={"value": "Estoque Total (unidades)", "variable": "Cenário"},
+        title=_titulo_tendencia("Estoque Total: Simulado vs. Histórico", resolucao),
+    )
+    fig_stock_out = px.line(
+        serie,
+        x="Data",
+        y=["Stock_Out_Simulado", "Stock_Out_Historico"],
+        labels={"value": "Stock Out (unidades)", "variable": "Cenário"},
+        title=_titulo_tendencia("Stock Out: Simulado vs. Histórico", resolucao),
+    )
+    return {"estoque": fig_estoque, "stock_out": fig_stock_out}
@@ -0,0 +1,325 @@
+"""Importação em massa dos CSVs de `assets/` para o PostgreSQL via COPY.
+
+O CSV é enviado em blocos com `COPY ... FROM STDIN` para uma tabela
+temporária e, na mesma transação, transferido para a tabela de destino:
+
+- `upsert` (padrão): os dias presentes no CSV são substituídos. Executar a
+  mesma importação de novo produz o mesmo resultado.
+- `append`: apenas os dias posteriores ao último já importado são inseridos.
+
+Os índices secundários são mantidos durante a carga: removê-los na
+transação exigiria um bloqueio ACCESS EXCLUSIVE, e o painel não conseguiria
+ler a tabela até o fim da importação.
+
+Uso:
+    uv run python src/importer.py                      # importa os dois CSVs
+    uv run python src/importer.py --tabela logistica assets/logistica_simulada.csv
+    uv run python src/importer.py --modo append
+"""
+
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+from pathlib import Path
+
+import psycopg2
+from dotenv import load_dotenv
+
+from database import INDEXES_SQL
+from rollups import ensure_rollups, refresh_rollups
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+ASSETS_DIR = BASE_DIR / "assets"
+
+CHUNK_SIZE = 8 * 1024 * 1024
+
+TABELAS = {
+    "logistica": {
+        "csv": "logistica_simulada.csv",
+        # Rotas em andamento não são importadas, como no notebook original
+        "filtro": "status IS DISTINCT FROM 'Em Rota'",
+    },
+    "demanda_estoque": {
+        "csv": "demanda_estoque.csv",
+        "filtro": None,
+    },
+}
+
+TABELAS_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS logistica (
+        id INTEGER PRIMARY KEY GENERATED ALWAYS AS IDENTITY,
+        data DATE NOT NULL,
+        estado TEXT NOT NULL,
+        regiao TEXT NOT NULL,
+        rota_id TEXT NOT NULL,
+        tempo_resposta_previsto NUMERIC(5, 2),
+        tempo_resposta_real NUMERIC(5, 2),
+        status TEXT,
+        custo_logistico_usd NUMERIC(10, 2) NOT NULL,
+        emissao_co2_kg NUMERIC(8, 2) NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS demanda_estoque (
+        id INTEGER PRIMARY KEY GENERATED ALWAYS AS IDENTITY,
+        data DATE NOT NULL,
+        estado TEXT NOT NULL,
+        regiao TEXT NOT NULL,
+        demanda_diaria INTEGER NOT NULL DEFAULT 0,
+        entregas_concluidas INTEGER NOT NULL DEFAULT 0,
+        entregas_atrasadas INTEGER NOT NULL DEFAULT 0,
+        custo_total_usd NUMERIC(12, 2) NOT NULL,
+        custo_medio_usd NUMERIC(10, 2) NOT NULL,
+        emissao_total_co2_kg NUMERIC(10, 2) NOT NULL,
+        emissao_media_co2_kg NUMERIC(8, 2) NOT NULL,
+        tempo_medio_entrega_dias NUMERIC(5, 2) NOT NULL,
+        tempo_previsto_medio_dias NUMERIC(5, 2) NOT NULL,
+        estoque_inicial INTEGER NOT NULL DEFAULT 0,
+        estoque_disponivel INTEGER NOT NULL DEFAULT 0,
+        estoque_final INTEGER NOT NULL DEFAULT 0,
+        reabastecimento INTEGER NOT NULL DEFAULT 0,
+        reabastecimento_chegando INTEGER NOT NULL DEFAULT 0,
+        stock_out INTEGER NOT NULL DEFAULT 0,
+        demanda_atendida NUMERIC(10, 2) NOT NULL,
+        demanda_nao_atendida NUMERIC(10, 2) NOT NULL,
+        taxa_atendimento NUMERIC(5, 2) NOT NULL,
+        nivel_servico NUMERIC(5, 2) NOT NULL,
+        dias_estoque_restante INTEGER NOT NULL DEFAULT 0,
+        ponto_reposicao INTEGER NOT NULL DEFAULT 0,
+        indicador_estoque_baixo INTEGER NOT NULL DEFAULT 0,
+        indicador_stock_out INTEGER NOT NULL DEFAULT 0,
+        demanda_acumulada NUMERIC(12, 2) NOT NULL,
+        stock_out_acumulado INTEGER NOT NULL DEFAULT 0,
+        custo_total_acumulado NUMERIC(12, 2) NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+]
+
+
+class ProgressReader(io.RawIOBase):
+    """Arquivo somente leitura que conta bytes e linhas entregues ao COPY"""
+
+    def __init__(self, arquivo, callback=None, intervalo=2.0):
+        self._arquivo = arquivo
+        self._callback = callback
+        self._intervalo = intervalo
+        self._ultimo_aviso = time.monotonic()
+        self.bytes_lidos = 0
+        self.linhas = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        bloco = self._arquivo.read(size)
+        self.bytes_lidos += len(bloco)
+        self.linhas += bloco.count(b"\n")
+        agora = time.monotonic()
+        if self._callback and agora - self._ultimo_aviso >= self._intervalo:
+            self._ultimo_aviso = agora
+            self._callback(self)
+        return bloco
+
+
+def create_tables(conn):
+    """Cria as tabelas de origem e os índices dos filtros, se não existirem"""
+    with conn.cursor() as cur:
+        for sql in TABELAS_DDL + INDEXES_SQL:
+            cur.execute(sql)
+    conn.commit()
+
+
+def _colunas_destino(cur, tabela):
+    cur.execute(
+        """
+        SELECT a.attname, format_type(a.atttypid, a.atttypmod)
+        FROM pg_attribute a
+        WHERE a.attrelid = %s::regclass
+          AND a.attnum > 0
+          AND NOT a.attisdropped
+          AND a.attname NOT IN ('id', 'created_at')
+        ORDER BY a.attnum
+        """,
+        (tabela,),
+    )
+    return dict(cur.fetchall())
+
+
+def _cast(coluna, tipo):
+    # Inteiros exportados pelo pandas podem vir como "12.0"
+    if tipo in ("smallint", "integer", "bigint"):
+        return f'"{coluna}"::numeric::{tipo}'
+    return f'"{coluna}"::{tipo}'
+
+
+def import_csv(conn, tabela, csv_path, modo="upsert", progress=None):
+    """Importa um CSV para `tabela` com COPY e retorna as estatísticas da carga"""
+    if tabela not in TABELAS:
+        raise ValueError(f"Tabela desconhecida: {tabela}")
+    if modo not in ("upsert", "append"):
+        raise ValueError(f"Modo de importação desconhecido: {modo}")
+
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        cabecalho = [coluna.strip().lower() for coluna in next(csv.reader(f))]
+
+    inicio = time.perf_counter()
+    with conn.cursor() as cur:
+        # Impede que duas importações da mesma tabela se intercalem
+        cur.execute(
+            "SELECT pg_advisory_xact_lock(hashtext(%s))", (f"importar_{tabela}",)
+        )
+
+        cur.execute("SET LOCAL synchronous_commit = off")
+
+        tipos = _colunas_destino(cur, tabela)
+        colunas = [coluna for coluna in cabecalho if coluna in tipos]
+        if "data" not in colunas:
+            raise ValueError(f"O CSV {csv_path} não possui a coluna Data")
+
+        staging = f"staging_{tabela}"
+        cur.execute(
+            f"""
+            CREATE TEMP TABLE {staging} (
+                {", ".join(f'"{coluna}" TEXT' for coluna in cabecalho)}
+            ) ON COMMIT DROP
+            """
+        )
+        with open(csv_path, "rb") as arquivo:
+            leitor = ProgressReader(arquivo, progress)
+            cur.copy_expert(
+                f"""
+                COPY {staging} ({", ".join(f'"{coluna}"' for coluna in cabecalho)})
+                FROM STDIN WITH (FORMAT csv, HEADER true)
+                """,
+                leitor,
+                size=CHUNK_SIZE,
+            )
+        cur.execute(f"SELECT COUNT(*) FROM {staging}")
+        linhas_lidas = cur.fetchone()[0]
+
+        filtros = []
+        if TABELAS[tabela]["filtro"]:
+            filtros.append(TABELAS[tabela]["filtro"])
+
+        linhas_removidas = 0
+        if modo == "upsert":
+            cur.execute(
+                f"""
+                DELETE FROM {tabela}
+                WHERE data IN (SELECT DISTINCT data::date FROM {staging})
+                """
+            )
+            linhas_removidas = cur.rowcount
+        else:
+            filtros.append(
+                f"data::date > (SELECT COALESCE(MAX(data), '-infinity') FROM {tabela})"
+            )
+
+        where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+        cur.execute(
+            f"""
+            INSERT INTO {tabela} ({", ".join(colunas)})
+            SELECT {", ".join(_cast(coluna, tipos[coluna]) for coluna in colunas)}
+            FROM {staging}
+            {where}
+            """
+        )
+        linhas_inseridas = cur.rowcount
+    conn.commit()
+
+    segundos = time.perf_counter() - inicio
+    with conn.cursor() as cur:
+        cur.execute(f"ANALYZE {tabela}")
+    conn.commit()
+
+    return {
+        "tabela": tabela,
+        "linhas_lidas": linhas_lidas,
+        "linhas_inseridas": linhas_inseridas,
+        "linhas_removidas": linhas_removidas,
+        "segundos": segundos,
+        "linhas_por_segundo": linhas_lidas / segundos if segundos > 0 else 0.0,
+    }
+
+
+def _mostrar_progresso(leitor):
+    print(
+        f"   ... {leitor.linhas:,} linhas enviadas ({leitor.bytes_lidos / 1024 ** 2:.0f} MB)"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Importa os CSVs de logística e estoque para o PostgreSQL via COPY"
+    )
+    parser.add_argument(
+        "csv",
+        nargs="?",
+        type=Path,
+        help="Arquivo CSV a importar (exige --tabela); sem ele, importa os CSVs de assets/",
+    )
+    parser.add_argument("--tabela", choices=sorted(TABELAS), help="Tabela de destino")
+    parser.add_argument(
+        "--modo",
+        choices=["upsert", "append"],
+        default="upsert",
+        help="upsert substitui os dias presentes no CSV; append insere apenas dias novos",
+    )
+    parser.add_argument(
+        "--database-url",
+        default=None,
+        help="URL de conexão (padrão: variável de ambiente DATABASE_URL)",
+    )
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    database_url = args.database_url or os.getenv("DATABASE_URL")
+    if not database_url:
+        parser.error("Defina DATABASE_URL ou use --database-url")
+
+    if args.csv is not None:
+        if args.tabela is None:
+            parser.error("Informe --tabela ao importar um CSV específico")
+        cargas = [(args.tabela, args.csv)]
+    else:
+        tabelas = [args.tabela] if args.tabela else list(TABELAS)
+        cargas = [(tabela, ASSETS_DIR / TABELAS[tabela]["csv"]) for tabela in tabelas]
+
+    conn = psycopg2.connect(database_url)
+    try:
+        create_tables(conn)
+        for tabela, csv_path in cargas:
+            if not csv_path.exists():
+                print(f"⚠️  Arquivo não encontrado: {csv_path}")
+                continue
+
+            print(f"📥 Importando {csv_path.name} em {tabela} (modo {args.modo})...")
+            stats = import_csv(conn, tabela, csv_path, args.modo, _mostrar_progresso)
+            print(
+                f"✅ {stats['linhas_inseridas']:,} registros inseridos, "
+                f"{stats['linhas_removidas']:,} substituídos, "
+                f"{stats['linhas_lidas']:,} lidos em {stats['segundos']:.1f}s "
+                f"({stats['linhas_por_segundo']:,.0f} linhas/s)"
+            )
+
+        if any(tabela == "demanda_estoque" for tabela, _ in cargas):
+            ensure_rollups(conn)
+            dias = refresh_rollups(conn)
+            print(f"✅ Rollups de estoque atualizados: {dias} dia(s) recalculado(s)")
+    except Exception as e:
+        conn.rollback()
+        print(f"Erro ao importar dados: {e}")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
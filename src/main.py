@@ -1,17 +1,93 @@
+import time
+
+# Marcado antes das demais importações para medir o tempo até a primeira renderização
+INICIO_EXECUCAO = time.perf_counter()
+
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import numpy as np
-import psycopg2
 from dotenv import load_dotenv
+import math
 import os
 from pathlib import Path
 
+from aggregations import (
+    ESTOQUE_COLUNAS,
+    GRANULARIDADES,
+    estoque_aggregates_from_rollups,
+    estoque_aggregates_from_statistics,
+    estoque_statistics,
+    logistica_aggregates_from_sql,
+    logistica_aggregates_from_statistics,
+    logistica_sketch_cells,
+    logistica_statistics,
+)
+from columnar_cache import read_csv_cached
+from cube import (
+    cube_sketches,
+    cube_statistics,
+    estoque_cube,
+    logistica_cube,
+    select_cells,
+    sketch_cube,
+)
+from dataset import SharedDataset, filtered_view
+from database import ConnectionPool, build_filters, ensure_indexes, read_sql_frame
+from memo import LRUCache
+from monitoring import (
+    COLUNAS_ESTOQUE_SQL,
+    COLUNAS_ROTAS_SQL,
+    OCORRENCIAS_ESTOQUE,
+    OCORRENCIAS_ROTAS,
+    TAMANHO_PAGINA,
+    highlight_routes,
+    highlight_stock,
+    page_from_chunks,
+    route_condition,
+    route_page_from_frame,
+    route_page_from_sql,
+    stock_condition,
+    stock_page_from_frame,
+    stock_page_from_sql,
+)
+from rollups import REFRESH_OVERLAP, ensure_rollups, refresh_rollups
+from schema import ESTOQUE_DTYPES, LOGISTICA_DTYPES, apply_schema
+from simulation import (
+    daily_demand,
+    daily_demand_from_sql,
+    demand_matrix,
+    simulate_inventory,
+    simulation_series,
+    simulation_summary,
+)
+from sketches import PRECISAO_RELATIVA
+from startup import first_render, record_render
+from streaming import StreamingAggregator, iter_csv_chunks, iter_query_chunks
+
+IMPORTACOES_CONCLUIDAS = time.perf_counter()
+
 load_dotenv()
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 ASSETS_DIR = BASE_DIR / "assets"
+CACHE_DIR = Path(os.getenv("COLUMNAR_CACHE_DIR", BASE_DIR / ".cache"))
+
+# "sql" agrega no PostgreSQL; "pandas" carrega as linhas filtradas e agrega em memória;
+# "stream" lê as linhas em blocos e agrega sem manter a tabela em memória;
+# "duckdb" executa as consultas do modo sql no DuckDB, sobre os arquivos de assets/
+AGGREGATION_MODE = os.getenv("AGGREGATION_MODE", "sql").lower()
+
+# Arquivo do banco DuckDB (AGGREGATION_MODE=duckdb)
+DUCKDB_PATH = os.getenv("DUCKDB_PATH", str(CACHE_DIR / "assets.duckdb"))
+
+# Modos que agregam com as consultas SQL de `aggregations.py`
+SQL_MODES = ("sql", "duckdb")
+
+# Linhas por bloco na leitura em blocos (AGGREGATION_MODE=stream)
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "100000"))
+
+# Pontos por série nos gráficos de tendência diária; acima disso os dias são
+# agrupados em semanas, meses ou trimestres
+MAX_CHART_POINTS = int(os.getenv("MAX_CHART_POINTS", "500"))
 
 st.set_page_config(
     page_title="PharmaSense AI - Otimização Logística",
@@ -25,256 +101,1036 @@ st.markdown(
 )
 
 
-def get_db_connection():
-    """Obtém conexão com o banco de dados PostgreSQL"""
+@st.cache_resource
+def get_connection_pool():
+    """Obtém o pool de conexões com o PostgreSQL compartilhado pelo processo"""
     database_url = os.getenv("DATABASE_URL")
 
     if not database_url:
         return None
 
+    return ConnectionPool(
+        database_url,
+        max_size=int(os.getenv("DB_POOL_MAX_SIZE", "5")),
+        idle_timeout=float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300")),
+        health_check_interval=float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", "30")),
+        checkout_timeout=float(os.getenv("DB_POOL_CHECKOUT_TIMEOUT", "10")),
+        connect_timeout=int(os.getenv("DB_CONNECT_TIMEOUT", "10")),
+    )
+
+
+@st.cache_resource
+def get_embedded_database():
+    """Obtém o banco DuckDB embutido sobre os arquivos de assets/"""
     try:
-        conn = psycopg2.connect(database_url)
-        return conn
+        from embedded import EmbeddedDatabase
+
+        Path(DUCKDB_PATH).parent.mkdir(parents=True, exist_ok=True)
+        return EmbeddedDatabase(
+            ASSETS_DIR, DUCKDB_PATH, os.getenv("DUCKDB_MEMORY_LIMIT")
+        )
     except Exception as e:
-        print(f"Erro ao conectar ao banco de dados: {e}")
+        print(f"Erro ao abrir o banco DuckDB embutido: {e}")
         return None
 
 
-def load_logistica_csv():
+def get_sql_backend():
+    """Banco das consultas SQL: DuckDB no modo duckdb, PostgreSQL nos demais"""
+    if AGGREGATION_MODE == "duckdb":
+        return get_embedded_database()
+    return get_connection_pool()
+
+
+@st.cache_resource
+def prepare_database():
+    """Garante os índices dos filtros uma única vez por processo"""
+    pool = get_connection_pool()
+    if pool is None:
+        return False
+
+    try:
+        ensure_indexes(pool)
+        return True
+    except Exception as e:
+        print(f"Erro ao criar índices no banco de dados: {e}")
+        return False
+
+
+@st.cache_resource
+def prepare_rollups():
+    """Cria as tabelas de rollup de estoque uma única vez por processo"""
+    pool = get_connection_pool()
+    if pool is None:
+        return False
+
+    try:
+        pool.run(ensure_rollups)
+        return True
+    except Exception as e:
+        print(f"Erro ao criar rollups de estoque no banco de dados: {e}")
+        return False
+
+
+@st.cache_data(ttl=60)
+def refresh_estoque_rollups():
+    """Atualiza incrementalmente os rollups de estoque, no máximo uma vez por TTL"""
+    pool = get_connection_pool()
+    if pool is None or not prepare_rollups():
+        return False
+
+    try:
+        dias = pool.run(refresh_rollups, retries=0)
+        if dias:
+            print(f"Rollups de estoque atualizados: {dias} dia(s) recalculado(s)")
+        return True
+    except Exception as e:
+        print(f"Erro ao atualizar rollups de estoque: {e}")
+        return False
+
+
+def without_routes_in_transit(df):
+    """Remove as rotas em trânsito, como o filtro `status != 'Em Rota'` das consultas"""
+    if "Status" not in df:
+        return df
+    status = df["Status"]
+    return df[(status != "Em Rota") & status.notna()]
+
+
+def load_logistica_csv(columns=None):
     """Carrega dados de logA-stica a partir do CSV local"""
     csv_path = ASSETS_DIR / "logistica_simulada.csv"
     if not csv_path.exists():
         return pd.DataFrame()
 
     try:
-        df = pd.read_csv(csv_path)
-        df["Data"] = pd.to_datetime(df["Data"])
-        return df
+        return without_routes_in_transit(
+            read_csv_cached(csv_path, LOGISTICA_DTYPES, CACHE_DIR, columns)
+        )
+    except Exception as e:
+        print(f"Erro ao usar o cache colunar de logística: {e}")
+
+    try:
+        return without_routes_in_transit(
+            apply_schema(pd.read_csv(csv_path, usecols=columns), LOGISTICA_DTYPES)
+        )
     except Exception as e:
         print(f"Erro ao carregar dados de logA-stica do CSV: {e}")
         return pd.DataFrame()
 
 
-def load_estoque_csv():
+def load_estoque_csv(columns=None):
     """Carrega dados de estoque e demanda a partir do CSV local"""
     csv_path = ASSETS_DIR / "demanda_estoque.csv"
     if not csv_path.exists():
         return pd.DataFrame()
 
     try:
-        df = pd.read_csv(csv_path)
-        df["Data"] = pd.to_datetime(df["Data"])
-        return df
+        return read_csv_cached(csv_path, ESTOQUE_DTYPES, CACHE_DIR, columns)
+    except Exception as e:
+        print(f"Erro ao usar o cache colunar de estoque: {e}")
+
+    try:
+        return apply_schema(pd.read_csv(csv_path, usecols=columns), ESTOQUE_DTYPES)
     except Exception as e:
         print(f"Erro ao carregar dados de estoque do CSV: {e}")
         return pd.DataFrame()
 
 
-@st.cache_data(ttl=60)
-def load_data():
-    """Carrega dados de logística do banco de dados"""
-    conn = get_db_connection()
-    if conn is None:
-        return load_logistica_csv()
+LOGISTICA_QUERY = """
+    SELECT 
+        id,
+        data,
+        estado,
+        regiao,
+        rota_id,
+        tempo_resposta_previsto,
+        tempo_resposta_real,
+        status,
+        custo_logistico_usd,
+        emissao_co2_kg
+    FROM logistica
+    WHERE status != 'Em Rota' {filtro}
+"""
+
+LOGISTICA_COLUMN_MAPPING = {
+    "id": "ID",
+    "data": "Data",
+    "estado": "Estado",
+    "regiao": "Regiao",
+    "rota_id": "Rota_ID",
+    "tempo_resposta_previsto": "Tempo_Resposta_Previsto",
+    "tempo_resposta_real": "Tempo_Resposta_Real",
+    "status": "Status",
+    "custo_logistico_usd": "Custo_Logistico_USD",
+    "emissao_co2_kg": "Emissao_CO2_kg",
+}
+
+ESTOQUE_QUERY = f"""
+    SELECT id, {", ".join(coluna.lower() for coluna in ESTOQUE_COLUNAS)}
+    FROM demanda_estoque
+    {{filtro}}
+"""
+
+ESTOQUE_COLUMN_MAPPING = {coluna.lower(): coluna for coluna in ESTOQUE_COLUNAS}
+ESTOQUE_COLUMN_MAPPING["id"] = "ID"
+
+# Linhas gravadas por transações longas podem ter created_at anterior à marca
+# d'água; a janela de sobreposição as inclui e a chave `ID` evita duplicatas.
+DELTA_FILTER_SQL = f"created_at > %s - INTERVAL '{REFRESH_OVERLAP}'"
+
+
+def read_logistica_db(conn, desde=None):
+    """Lê as linhas de logística do banco, ou apenas as criadas após `desde`"""
+    filtro = f"AND {DELTA_FILTER_SQL}" if desde is not None else ""
+    params = [desde] if desde is not None else None
+    df = read_sql_frame(
+        conn, LOGISTICA_QUERY.format(filtro=filtro) + "ORDER BY data", params
+    )
+    df = df.rename(columns=LOGISTICA_COLUMN_MAPPING)
+    return apply_schema(df, LOGISTICA_DTYPES)
 
-    try:
-        query = """
-            SELECT 
-                data,
-                estado,
-                regiao,
-                rota_id,
-                tempo_resposta_previsto,
-                tempo_resposta_real,
-                status,
-                custo_logistico_usd,
-                emissao_co2_kg
-            FROM logistica
-            WHERE status != 'Em Rota'
-            ORDER BY data DESC
+
+def read_estoque_db(conn, desde=None):
+    """Lê as colunas de estoque usadas pelo dashboard, ou apenas as linhas criadas após `desde`"""
+    filtro = f"WHERE {DELTA_FILTER_SQL}" if desde is not None else ""
+    params = [desde] if desde is not None else None
+    df_estoque = read_sql_frame(
+        conn, ESTOQUE_QUERY.format(filtro=filtro) + "ORDER BY data", params
+    )
+    df_estoque = df_estoque.rename(columns=ESTOQUE_COLUMN_MAPPING)
+    return apply_schema(df_estoque, ESTOQUE_DTYPES)
+
+
+def stream_db(nome, conn, clauses, params):
+    """Lê em blocos as linhas filtradas de logística ou de estoque do banco"""
+    if nome == "logistica":
+        filtro = "".join(f" AND {clause}" for clause in clauses)
+        query = LOGISTICA_QUERY.format(filtro=filtro)
+        mapping, dtypes = LOGISTICA_COLUMN_MAPPING, LOGISTICA_DTYPES
+    else:
+        filtro = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        query = ESTOQUE_QUERY.format(filtro=filtro)
+        mapping, dtypes = ESTOQUE_COLUMN_MAPPING, ESTOQUE_DTYPES
+
+    for chunk in iter_query_chunks(conn, query, params, STREAM_CHUNK_ROWS):
+        yield apply_schema(chunk.rename(columns=mapping), dtypes)
+
+
+def stream_csv(nome, start_date=None, end_date=None, regioes=None, estados=None):
+    """Lê em blocos o CSV de logística ou de estoque, filtrando cada bloco"""
+    if nome == "logistica":
+        csv_path, dtypes, columns = (
+            ASSETS_DIR / "logistica_simulada.csv",
+            LOGISTICA_DTYPES,
+            None,
+        )
+    else:
+        csv_path, dtypes, columns = (
+            ASSETS_DIR / "demanda_estoque.csv",
+            ESTOQUE_DTYPES,
+            ESTOQUE_COLUNAS,
+        )
+    if not csv_path.exists():
+        return
+
+    for chunk in iter_csv_chunks(csv_path, dtypes, columns, STREAM_CHUNK_ROWS):
+        if nome == "logistica":
+            chunk = without_routes_in_transit(chunk)
+        yield filtered_view(chunk, start_date, end_date, regioes, estados)
+
+
+def db_frame_loaders(pool):
+    """Carregadores dos DataFrames completos do banco, cada um com sua conexão do pool"""
+    return {
+        "logistica": lambda: pool.run(read_logistica_db),
+        "estoque": lambda: pool.run(read_estoque_db),
+    }
+
+
+def csv_frame_loaders():
+    """Carregadores dos DataFrames completos dos CSVs locais"""
+    return {
+        "logistica": load_logistica_csv,
+        "estoque": lambda: load_estoque_csv(columns=ESTOQUE_COLUNAS),
+    }
+
+
+def _consultar_versao(cur):
+    cur.execute(
         """
-        df = pd.read_sql_query(query, conn)
-
-        column_mapping = {
-            "data": "Data",
-            "estado": "Estado",
-            "regiao": "Regiao",
-            "rota_id": "Rota_ID",
-            "tempo_resposta_previsto": "Tempo_Resposta_Previsto",
-            "tempo_resposta_real": "Tempo_Resposta_Real",
-            "status": "Status",
-            "custo_logistico_usd": "Custo_Logistico_USD",
-            "emissao_co2_kg": "Emissao_CO2_kg",
+        SELECT COUNT(*) FILTER (WHERE status != 'Em Rota'), MAX(created_at)
+        FROM logistica
+        """
+    )
+    logistica = cur.fetchone()
+    cur.execute("SELECT COUNT(*), MAX(created_at) FROM demanda_estoque")
+    estoque = cur.fetchone()
+    return ("banco", logistica, estoque)
+
+
+def db_version(pool):
+    """Identifica a versão dos dados no banco pela quantidade de linhas e maior created_at"""
+
+    def consultar(conn):
+        with conn.cursor() as cur:
+            return _consultar_versao(cur)
+
+    return pool.run(consultar)
+
+
+def load_db_delta(pool, anterior):
+    """Carrega apenas as linhas criadas desde a versão já carregada"""
+    marca_logistica, marca_estoque = anterior[1][1], anterior[2][1]
+    if marca_logistica is None or marca_estoque is None:
+        return None
+
+    def consultar(conn):
+        with conn.cursor() as cur:
+            # Linhas novas e totais esperados no mesmo snapshot, para que a
+            # conferência de exclusões seja consistente
+            cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            versao = _consultar_versao(cur)
+        return {
+            "logistica": (read_logistica_db(conn, marca_logistica), versao[1][0]),
+            "estoque": (read_estoque_db(conn, marca_estoque), versao[2][0]),
         }
-        df = df.rename(columns=column_mapping)
-        df["Data"] = pd.to_datetime(df["Data"])
-        return df
-    except Exception as e:
-        print(f"Erro ao carregar dados de logística: {e}")
-        return load_logistica_csv()
-    finally:
-        if conn:
-            conn.close()
+
+    return pool.run(consultar)
+
+
+def csv_version():
+    """Identifica a versão dos CSVs locais pelo tamanho e data de modificação"""
+    versao = ["csv"]
+    for nome in ("logistica_simulada.csv", "demanda_estoque.csv"):
+        csv_path = ASSETS_DIR / nome
+        if csv_path.exists():
+            stat = csv_path.stat()
+            versao.append((nome, stat.st_size, stat.st_mtime_ns))
+    return tuple(versao)
+
+
+# Cubo de estatísticas de cada DataFrame compartilhado, refeito a cada versão
+FRAME_CUBES = {"logistica": logistica_cube, "estoque": estoque_cube}
+
+
+@st.cache_resource
+def get_shared_dataset():
+    """Obtém o conjunto de dados compartilhado por todas as sessões do processo"""
+    intervalo = float(os.getenv("DATA_REFRESH_INTERVAL", "60"))
+    pool = get_connection_pool()
+    if pool is None:
+        return SharedDataset(
+            csv_frame_loaders(), csv_version, intervalo, cubes=FRAME_CUBES
+        )
+
+    prepare_database()
+    return SharedDataset(
+        db_frame_loaders(pool),
+        lambda: db_version(pool),
+        intervalo,
+        fallback=csv_frame_loaders(),
+        delta_loader=lambda anterior: load_db_delta(pool, anterior),
+        reconcile_interval=float(os.getenv("DATA_RECONCILE_INTERVAL", "3600")),
+        cubes=FRAME_CUBES,
+    )
+
+
+def load_shared_frame(nome):
+    """Retorna o DataFrame compartilhado mais recente, sem esperar por recargas"""
+    return get_shared_dataset().snapshot()[nome]
+
+
+def filter_options_from_frame(df):
+    """Extrai período, regiões e estados disponíveis de um DataFrame"""
+    if df.empty:
+        return None
+
+    estados_por_regiao = {}
+    if "Estado" in df.columns:
+        pares = df[["Regiao", "Estado"]].drop_duplicates()
+        for regiao, estado in pares.itertuples(index=False):
+            estados_por_regiao.setdefault(regiao, []).append(estado)
+    else:
+        estados_por_regiao = {regiao: [] for regiao in df["Regiao"].unique()}
+
+    return {
+        "data_min": df["Data"].min().date(),
+        "data_max": df["Data"].max().date(),
+        "estados_por_regiao": estados_por_regiao,
+    }
+
+
+def filter_options_from_chunks(chunks):
+    """Extrai período, regiões e estados disponíveis lendo os dados em blocos"""
+    resumos = []
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        colunas = [coluna for coluna in ("Data", "Regiao", "Estado") if coluna in chunk]
+        datas = chunk["Data"]
+        resumos.append(chunk.loc[[datas.idxmin(), datas.idxmax()], colunas])
+        resumos.append(chunk[colunas].drop_duplicates(subset=colunas[1:]))
+    if not resumos:
+        return None
+    return filter_options_from_frame(pd.concat(resumos, ignore_index=True))
+
+
+def local_filter_options():
+    """Opções de filtro sem consultar o banco, a partir dos dados em memória ou do CSV"""
+    if AGGREGATION_MODE == "stream":
+        return filter_options_from_chunks(stream_csv("logistica"))
+    return filter_options_from_frame(load_shared_frame("logistica"))
 
 
 @st.cache_data(ttl=60)
-def load_estoque_data():
-    """Carrega dados de estoque e demanda do banco de dados"""
-    conn = get_db_connection()
-    if conn is None:
-        return load_estoque_csv()
+def load_filter_options():
+    """Carrega período, regiões e estados disponíveis para os filtros"""
+    backend = get_sql_backend()
+    if backend is None:
+        return local_filter_options()
+
+    def consultar(conn):
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT MIN(data), MAX(data) FROM logistica WHERE status != 'Em Rota'"
+            )
+            data_min, data_max = cur.fetchone()
+            cur.execute(
+                """
+                SELECT DISTINCT regiao, estado
+                FROM logistica
+                WHERE status != 'Em Rota'
+                """
+            )
+            pares = cur.fetchall()
+        return data_min, data_max, pares
 
     try:
-        query = """
-            SELECT 
-                data,
-                estado,
-                regiao,
-                demanda_diaria,
-                entregas_concluidas,
-                entregas_atrasadas,
-                custo_total_usd,
-                custo_medio_usd,
-                emissao_total_co2_kg,
-                emissao_media_co2_kg,
-                tempo_medio_entrega_dias,
-                tempo_previsto_medio_dias,
-                estoque_inicial,
-                estoque_disponivel,
-                estoque_final,
-                reabastecimento,
-                reabastecimento_chegando,
-                stock_out,
-                demanda_atendida,
-                demanda_nao_atendida,
-                taxa_atendimento,
-                nivel_servico,
-                dias_estoque_restante,
-                ponto_reposicao,
-                indicador_estoque_baixo,
-                indicador_stock_out,
-                demanda_acumulada,
-                stock_out_acumulado,
-                custo_total_acumulado
-            FROM demanda_estoque
-            ORDER BY data DESC
-        """
-        df_estoque = pd.read_sql_query(query, conn)
-
-        column_mapping = {
-            "data": "Data",
-            "estado": "Estado",
-            "regiao": "Regiao",
-            "demanda_diaria": "Demanda_Diaria",
-            "entregas_concluidas": "Entregas_Concluidas",
-            "entregas_atrasadas": "Entregas_Atrasadas",
-            "custo_total_usd": "Custo_Total_USD",
-            "custo_medio_usd": "Custo_Medio_USD",
-            "emissao_total_co2_kg": "Emissao_Total_CO2_kg",
-            "emissao_media_co2_kg": "Emissao_Media_CO2_kg",
-            "tempo_medio_entrega_dias": "Tempo_Medio_Entrega_Dias",
-            "tempo_previsto_medio_dias": "Tempo_Previsto_Medio_Dias",
-            "estoque_inicial": "Estoque_Inicial",
-            "estoque_disponivel": "Estoque_Disponivel",
-            "estoque_final": "Estoque_Final",
-            "reabastecimento": "Reabastecimento",
-            "reabastecimento_chegando": "Reabastecimento_Chegando",
-            "stock_out": "Stock_Out",
-            "demanda_atendida": "Demanda_Atendida",
-            "demanda_nao_atendida": "Demanda_Nao_Atendida",
-            "taxa_atendimento": "Taxa_Atendimento",
-            "nivel_servico": "Nivel_Servico",
-            "dias_estoque_restante": "Dias_Estoque_Restante",
-            "ponto_reposicao": "Ponto_Reposicao",
-            "indicador_estoque_baixo": "Indicador_Estoque_Baixo",
-            "indicador_stock_out": "Indicador_Stock_Out",
-            "demanda_acumulada": "Demanda_Acumulada",
-            "stock_out_acumulado": "Stock_Out_Acumulado",
-            "custo_total_acumulado": "Custo_Total_Acumulado",
+        data_min, data_max, pares = backend.run(consultar)
+        if data_min is None:
+            return None
+
+        estados_por_regiao = {}
+        for regiao, estado in pares:
+            estados_por_regiao.setdefault(regiao, []).append(estado)
+        return {
+            "data_min": data_min,
+            "data_max": data_max,
+            "estados_por_regiao": estados_por_regiao,
         }
-        df_estoque = df_estoque.rename(columns=column_mapping)
-        df_estoque["Data"] = pd.to_datetime(df_estoque["Data"])
-        return df_estoque
     except Exception as e:
-        print(f"Erro ao carregar dados de estoque: {e}")
-        return load_estoque_csv()
-    finally:
-        if conn:
-            conn.close()
+        print(f"Erro ao carregar opções de filtro: {e}")
+        return local_filter_options()
+
+
+def load_data(start_date=None, end_date=None, regioes=None, estados=None):
+    """Retorna a visão filtrada dos dados de logística compartilhados"""
+    return get_shared_dataset().view(
+        "logistica", start_date, end_date, regioes, estados
+    )
+
+
+def load_estoque_data(start_date=None, end_date=None, regioes=None, estados=None):
+    """Retorna a visão filtrada dos dados de estoque e demanda compartilhados"""
+    return get_shared_dataset().view("estoque", start_date, end_date, regioes, estados)
+
+
+def with_version(agregados, versao):
+    """Marca os agregados com a versão dos dados, usada na chave do cache de gráficos"""
+    if agregados is not None:
+        agregados["versao"] = versao
+    return agregados
+
+
+def sql_version(conn):
+    """Versão dos dados do banco: arquivos importados no DuckDB ou linhas no PostgreSQL"""
+    with conn.cursor() as cur:
+        if AGGREGATION_MODE == "duckdb":
+            cur.execute("SELECT * FROM fontes_importadas ORDER BY tabela")
+            return ("duckdb",) + tuple(cur.fetchall())
+        return _consultar_versao(cur)
+
+
+def read_with_version(conn, ler):
+    """Executa `ler(conn)` e marca os agregados com a versão lida antes deles"""
+    versao = sql_version(conn)
+    return with_version(ler(conn), versao)
+
+
+@st.cache_data(max_entries=64)
+def compute_frame_aggregates(
+    nome, geracao, start_date=None, end_date=None, regioes=None, estados=None
+):
+    """Agrega em memória os dados compartilhados somando as células do cubo dentro dos filtros"""
+    cubo = get_shared_dataset().cube(nome)
+    if cubo is None:
+        return None
+    estatisticas = cube_statistics(cubo, start_date, end_date, regioes, estados)
+    return with_version(ESTATISTICAS_SECAO[nome][1](estatisticas), geracao)
+
+
+def load_frame_aggregates(
+    nome, start_date=None, end_date=None, regioes=None, estados=None
+):
+    """Obtém os agregados em memória, recalculando só os afetados por mudanças"""
+    geracao = get_shared_dataset().geracao(nome, start_date, end_date, regioes, estados)
+    return compute_frame_aggregates(
+        nome, geracao, start_date, end_date, regioes, estados
+    )
+
+
+@st.cache_data(ttl=60, max_entries=32)
+@st.cache_resource(max_entries=2)
+def load_logistica_sketch_cube(versao, _conn):
+    """Sketches dos percentis por dia × estado, contados no banco uma vez por versão dos dados"""
+    return sketch_cube(*logistica_sketch_cells(_conn))
+
+
+def load_logistica_aggregates_sql(
+    start_date=None, end_date=None, regioes=None, estados=None
+):
+    """Calcula no PostgreSQL (ou no DuckDB) os agregados da aba de logística"""
+    backend = get_sql_backend()
+    prepare_database()
+    clauses, params = build_filters(start_date, end_date, regioes, estados)
+
+    def ler(conn):
+        versao = sql_version(conn)
+        sketches = cube_sketches(
+            load_logistica_sketch_cube(versao, conn),
+            start_date,
+            end_date,
+            regioes,
+            estados,
+        )
+        return with_version(
+            logistica_aggregates_from_sql(conn, clauses, params, sketches), versao
+        )
+
+    try:
+        return backend.run(ler)
+    except Exception as e:
+        print(f"Erro ao agregar dados de logística no banco de dados: {e}")
+        return load_frame_aggregates(
+            "logistica", start_date, end_date, regioes, estados
+        )
+
+
+@st.cache_data(ttl=60, max_entries=32)
+def load_estoque_aggregates_rollups(
+    start_date=None, end_date=None, regioes=None, estados=None
+):
+    """Lê dos rollups do PostgreSQL (ou do DuckDB) os agregados da aba de estoque"""
+    backend = get_sql_backend()
+    prepare_database()
+
+    try:
+        return backend.run(
+            lambda conn: read_with_version(
+                conn,
+                lambda conn: estoque_aggregates_from_rollups(
+                    conn, start_date, end_date, regioes, estados
+                ),
+            )
+        )
+    except Exception as e:
+        print(f"Erro ao agregar dados de estoque nos rollups: {e}")
+        return load_frame_aggregates("estoque", start_date, end_date, regioes, estados)
+
+
+# Resumo de um bloco de linhas e montagem dos agregados, por seção
+ESTATISTICAS_SECAO = {
+    "logistica": (logistica_statistics, logistica_aggregates_from_statistics),
+    "estoque": (estoque_statistics, estoque_aggregates_from_statistics),
+}
+
+
+@st.cache_data(ttl=60, max_entries=32)
+def load_stream_aggregates(
+    nome, start_date=None, end_date=None, regioes=None, estados=None
+):
+    """Agrega a seção lendo em blocos as linhas filtradas do banco ou dos CSVs locais"""
+    estatisticas, montar = ESTATISTICAS_SECAO[nome]
+
+    pool = get_connection_pool()
+    if pool is not None:
+        prepare_database()
+        clauses, params = build_filters(start_date, end_date, regioes, estados)
+        try:
+            versao, resultado = pool.run(
+                lambda conn: (
+                    sql_version(conn),
+                    StreamingAggregator(estatisticas)
+                    .consume(stream_db(nome, conn, clauses, params))
+                    .result(),
+                )
+            )
+        except Exception as e:
+            print(f"Erro ao agregar em blocos os dados do banco de dados: {e}")
+            return load_frame_aggregates(nome, start_date, end_date, regioes, estados)
+    else:
+        versao = csv_version()
+        resultado = (
+            StreamingAggregator(estatisticas)
+            .consume(stream_csv(nome, start_date, end_date, regioes, estados))
+            .result()
+        )
+    if resultado is None:
+        return None
+    return with_version(montar(resultado), versao)
+
+
+def load_logistica_aggregates(
+    start_date=None, end_date=None, regioes=None, estados=None
+):
+    """Carrega os agregados da aba de logística para a combinação de filtros"""
+    if AGGREGATION_MODE == "stream":
+        return load_stream_aggregates(
+            "logistica", start_date, end_date, regioes, estados
+        )
+    if get_sql_backend() is None or AGGREGATION_MODE not in SQL_MODES:
+        return load_frame_aggregates(
+            "logistica", start_date, end_date, regioes, estados
+        )
+    return load_logistica_aggregates_sql(start_date, end_date, regioes, estados)
+
+
+def load_estoque_aggregates(start_date=None, end_date=None, regioes=None, estados=None):
+    """Carrega os agregados da aba de estoque, lendo dos rollups quando possível"""
+    if AGGREGATION_MODE == "stream":
+        return load_stream_aggregates("estoque", start_date, end_date, regioes, estados)
+    if (
+        get_sql_backend() is None
+        or AGGREGATION_MODE not in SQL_MODES
+        # No DuckDB o rollup é refeito a cada importação dos arquivos
+        or (AGGREGATION_MODE == "sql" and not refresh_estoque_rollups())
+    ):
+        return load_frame_aggregates("estoque", start_date, end_date, regioes, estados)
+    return load_estoque_aggregates_rollups(start_date, end_date, regioes, estados)
+
+
+def daily_demand_from_chunks(chunks):
+    """Demanda por dia e estado somada bloco a bloco"""
+    partes = [daily_demand(chunk) for chunk in chunks]
+    return daily_demand(pd.concat(partes, ignore_index=True)) if partes else None
+
+
+def load_daily_demand(start_date=None, end_date=None, regioes=None, estados=None):
+    """Demanda por dia e estado dos filtros, da mesma origem dos agregados de estoque"""
+    clauses, params = build_filters(start_date, end_date, regioes, estados)
+    pool = get_connection_pool()
+
+    if AGGREGATION_MODE == "stream":
+        if pool is None:
+            return daily_demand_from_chunks(
+                stream_csv("estoque", start_date, end_date, regioes, estados)
+            )
+        prepare_database()
+        try:
+            return pool.run(
+                lambda conn: daily_demand_from_chunks(
+                    stream_db("estoque", conn, clauses, params)
+                )
+            )
+        except Exception as e:
+            print(f"Erro ao ler em blocos a demanda do banco de dados: {e}")
+
+    elif get_sql_backend() is not None and AGGREGATION_MODE in SQL_MODES:
+        # Sem o rollup, a demanda exigiria carregar a tabela inteira em memória
+        if AGGREGATION_MODE == "sql" and not refresh_estoque_rollups():
+            return None
+        try:
+            return get_sql_backend().run(
+                lambda conn: daily_demand_from_sql(conn, clauses, params)
+            )
+        except Exception as e:
+            print(f"Erro ao ler a demanda diária nos rollups: {e}")
+            return None
+
+    cubo = get_shared_dataset().cube("estoque")
+    if cubo is None:
+        return None
+    celulas = cubo["celulas"].iloc[
+        select_cells(cubo, start_date, end_date, regioes, estados)
+    ]
+    return daily_demand(celulas, "soma_Demanda_Diaria")
+
+
+@st.cache_data(ttl=60, max_entries=32)
+def load_demand_matrix(start_date=None, end_date=None, regioes=None, estados=None):
+    """Array estados × dias da demanda filtrada, ponto de partida da simulação"""
+    demanda = load_daily_demand(start_date, end_date, regioes, estados)
+    if demanda is None:
+        return None
+    return demand_matrix(demanda)
+
+
+@st.cache_resource
+def get_figure_cache():
+    """Obtém o cache LRU de gráficos compartilhado por todas as sessões do processo"""
+    return LRUCache(int(os.getenv("FIGURE_CACHE_SIZE", "64")))
+
+
+def load_section_figures(
+    nome,
+    agregados,
+    granularidade="mes",
+    start_date=None,
+    end_date=None,
+    regioes=None,
+    estados=None,
+):
+    """Obtém os gráficos da seção, montando-os só uma vez por versão dos dados e filtros"""
+    # Importado só aqui: o Plotly é a dependência mais lenta de carregar e não
+    # é necessário para o cabeçalho, os filtros e os indicadores
+    from figures import (
+        estoque_figures,
+        estoque_period_figures,
+        logistica_figures,
+        logistica_period_figures,
+    )
+
+    cache = get_figure_cache()
+    chave = (nome, agregados["versao"], start_date, end_date, regioes, estados)
+    if nome == "logistica":
+        montar, montar_periodo = logistica_figures, logistica_period_figures
+    else:
+        montar, montar_periodo = estoque_figures, estoque_period_figures
+
+    figuras = dict(
+        cache.get_or_build(chave, lambda: montar(agregados, MAX_CHART_POINTS))
+    )
+    # Os gráficos por período têm entrada própria, com a granularidade na chave
+    figuras.update(
+        cache.get_or_build(
+            chave + (granularidade,),
+            lambda: montar_periodo(agregados, granularidade),
+        )
+    )
+    return figuras
+
+
+@st.cache_data(max_entries=64)
+def compute_monitor_page(
+    nome,
+    geracao,
+    start_date=None,
+    end_date=None,
+    regioes=None,
+    estados=None,
+    ocorrencia=None,
+    busca="",
+    pagina=0,
+):
+    """Seleciona em memória uma página da tabela de monitoramento da seção"""
+    if nome == "logistica":
+        return route_page_from_frame(
+            load_data(start_date, end_date, regioes, estados),
+            ocorrencia,
+            busca,
+            pagina,
+        )
+    return stock_page_from_frame(
+        load_estoque_data(start_date, end_date, regioes, estados),
+        ocorrencia,
+        busca,
+        pagina,
+    )
+
+
+@st.cache_data(ttl=60, max_entries=64)
+def load_monitor_page_sql(
+    nome,
+    start_date=None,
+    end_date=None,
+    regioes=None,
+    estados=None,
+    ocorrencia=None,
+    busca="",
+    pagina=0,
+):
+    """Lê do PostgreSQL (ou do DuckDB) uma página da tabela de monitoramento da seção"""
+    backend = get_sql_backend()
+    prepare_database()
+    clauses, params = build_filters(start_date, end_date, regioes, estados)
+    ler_pagina = route_page_from_sql if nome == "logistica" else stock_page_from_sql
+
+    try:
+        return backend.run(
+            lambda conn: ler_pagina(conn, clauses, params, ocorrencia, busca, pagina)
+        )
+    except Exception as e:
+        print(f"Erro ao carregar página de monitoramento do banco de dados: {e}")
+        return None
+
+
+@st.cache_data(ttl=60, max_entries=64)
+def load_monitor_page_stream(
+    nome,
+    start_date=None,
+    end_date=None,
+    regioes=None,
+    estados=None,
+    ocorrencia=None,
+    busca="",
+    pagina=0,
+):
+    """Seleciona uma página da tabela de monitoramento lendo o CSV em blocos"""
+    if nome == "logistica":
+        condicao, colunas = route_condition, COLUNAS_ROTAS_SQL
+    else:
+        condicao, colunas = stock_condition, COLUNAS_ESTOQUE_SQL
+    return page_from_chunks(
+        stream_csv(nome, start_date, end_date, regioes, estados),
+        lambda df: condicao(df, ocorrencia, busca),
+        list(colunas),
+        pagina,
+    )
+
+
+def load_monitor_page(
+    nome,
+    start_date=None,
+    end_date=None,
+    regioes=None,
+    estados=None,
+    ocorrencia=None,
+    busca="",
+    pagina=0,
+):
+    """Carrega uma página da tabela de monitoramento e o total de registros"""
+    filtros = (start_date, end_date, regioes, estados)
+    if get_sql_backend() is not None and AGGREGATION_MODE in SQL_MODES + ("stream",):
+        resultado = load_monitor_page_sql(nome, *filtros, ocorrencia, busca, pagina)
+        if resultado is not None:
+            return resultado
+
+    if AGGREGATION_MODE == "stream" and get_connection_pool() is None:
+        return load_monitor_page_stream(nome, *filtros, ocorrencia, busca, pagina)
+
+    geracao = get_shared_dataset().geracao(nome, *filtros)
+    return compute_monitor_page(nome, geracao, *filtros, ocorrencia, busca, pagina)
+
+
+def render_monitor_grid(nome, filtros, ocorrencias, destacar, mensagem_vazia):
+    """Tabela de monitoramento paginada, com recorte por ocorrência e busca"""
+    col_ocorrencia, col_busca, col_pagina = st.columns([2, 3, 1])
+    with col_ocorrencia:
+        ocorrencia = st.selectbox(
+            "Mostrar",
+            list(ocorrencias),
+            format_func=lambda codigo: ocorrencias[codigo],
+            key=f"{nome}_ocorrencia",
+        )
+    with col_busca:
+        busca = st.text_input(
+            "Buscar",
+            key=f"{nome}_busca",
+            placeholder=(
+                "Rota, estado ou região" if nome == "logistica" else "Estado ou região"
+            ),
+        )
+
+    chave_pagina = f"{nome}_pagina"
+    pagina = st.session_state.get(chave_pagina, 1)
+    df_pagina, total = load_monitor_page(nome, *filtros, ocorrencia, busca, pagina - 1)
+    paginas = max(1, math.ceil(total / TAMANHO_PAGINA))
+    if pagina > paginas:
+        # Os filtros mudaram e a página guardada deixou de existir
+        pagina = st.session_state[chave_pagina] = paginas
+        df_pagina, total = load_monitor_page(
+            nome, *filtros, ocorrencia, busca, pagina - 1
+        )
+
+    with col_pagina:
+        st.number_input(
+            "Página", min_value=1, max_value=paginas, step=1, key=chave_pagina
+        )
+
+    if total == 0:
+        st.info(mensagem_vazia)
+        return
+
+    st.dataframe(
+        df_pagina.style.apply(destacar, axis=None),
+        use_container_width=True,
+        hide_index=True,
+    )
+    st.caption(f"{total:,} registros · página {pagina} de {paginas}")
+
+
+def describe_series(resumo):
+    """Descreve a resolução e o tamanho de uma série de tendência"""
+    return (
+        f"{resumo['pontos']:,} pontos por série (resolução: "
+        f"{resumo['resolucao'].lower()}) · {resumo['bytes'] / 1024:.0f} KB "
+        "enviados ao navegador"
+    )
+
 
+ROTULOS_PERCENTIS = {
+    "Tempo_Resposta_Real": "Tempo de entrega (dias)",
+    "Custo_Logistico_USD": "Custo logístico (USD)",
+}
 
-df = load_data()
-df_estoque = load_estoque_data()
 
-if df.empty:
+def format_percentiles(df_percentis, chave, rotulo):
+    """Tabela de percentis por região ou mês, com os nomes exibidos no dashboard"""
+    tabela = df_percentis.assign(Medida=df_percentis["Medida"].map(ROTULOS_PERCENTIS))
+    if chave == "Mes":
+        tabela[chave] = pd.to_datetime(tabela[chave]).dt.strftime("%Y-%m")
+    return (
+        tabela.sort_values(["Medida", chave])
+        .rename(columns={chave: rotulo, "linhas": "Registros"})[
+            [rotulo, "Medida", "Registros", "p50", "p90", "p99"]
+        ]
+        .round(2)
+    )
+
+
+opcoes_filtro = load_filter_options()
+
+if opcoes_filtro is None:
     st.stop()
 
-tab1, tab2 = st.tabs(["📦 Logística", "📊 Estoque e Demanda"])
+# Apenas a seção selecionada é executada a cada interação, ao contrário de
+# st.tabs, que processa o conteúdo de todas as abas mesmo quando ocultas
+SECOES = ["📦 Logística", "📊 Estoque e Demanda"]
+secao = st.radio(
+    "Seção", SECOES, horizontal=True, key="secao", label_visibility="collapsed"
+)
 
 st.sidebar.header("Filtros de Análise")
 
-data_min = df["Data"].min().date()
-data_max = df["Data"].max().date()
+data_min = opcoes_filtro["data_min"]
+data_max = opcoes_filtro["data_max"]
 
 data_selecionada = st.sidebar.date_input(
     "Selecione o Período", [data_min, data_max], min_value=data_min, max_value=data_max
 )
 
 if len(data_selecionada) == 2:
-    start_date = pd.to_datetime(data_selecionada[0])
-    end_date = pd.to_datetime(data_selecionada[1])
-    df_filtered = df[(df["Data"] >= start_date) & (df["Data"] <= end_date)]
-    if not df_estoque.empty:
-        df_estoque_filtered = df_estoque[
-            (df_estoque["Data"] >= start_date) & (df_estoque["Data"] <= end_date)
-        ]
-    else:
-        df_estoque_filtered = df_estoque.copy()
+    start_date, end_date = data_selecionada[0], data_selecionada[1]
 else:
-    df_filtered = df.copy()
-    df_estoque_filtered = df_estoque.copy()
+    start_date, end_date = None, None
 
-regioes_unicas = ["Todas"] + sorted(df["Regiao"].unique().tolist())
+estados_por_regiao = opcoes_filtro["estados_por_regiao"]
+regioes_unicas = ["Todas"] + sorted(estados_por_regiao)
 regiao_selecionada = st.sidebar.multiselect(
     "Filtrar por Região", regioes_unicas, default=["Todas"]
 )
 
+regioes = None
 if "Todas" not in regiao_selecionada:
-    df_filtered = df_filtered[df_filtered["Regiao"].isin(regiao_selecionada)]
-    if not df_estoque_filtered.empty:
-        df_estoque_filtered = df_estoque_filtered[
-            df_estoque_filtered["Regiao"].isin(regiao_selecionada)
-        ]
-
-if "Estado" in df.columns:
-    estados_unicos = ["Todos"] + sorted(df_filtered["Estado"].unique().tolist())
+    regioes = tuple(sorted(regiao_selecionada))
+
+estados = None
+estados_disponiveis = sorted(
+    estado
+    for regiao, lista_estados in estados_por_regiao.items()
+    if regioes is None or regiao in regioes
+    for estado in lista_estados
+)
+if estados_disponiveis:
+    estados_unicos = ["Todos"] + estados_disponiveis
     estado_selecionado = st.sidebar.multiselect(
         "Filtrar por Estado", estados_unicos, default=["Todos"]
     )
 
     if "Todos" not in estado_selecionado:
-        df_filtered = df_filtered[df_filtered["Estado"].isin(estado_selecionado)]
-        if not df_estoque_filtered.empty:
-            df_estoque_filtered = df_estoque_filtered[
-                df_estoque_filtered["Estado"].isin(estado_selecionado)
-            ]
+        estados = tuple(sorted(estado_selecionado))
+
+granularidade = st.sidebar.selectbox(
+    "Agrupar séries temporais por",
+    list(GRANULARIDADES),
+    index=list(GRANULARIDADES).index("mes"),
+    format_func=lambda codigo: GRANULARIDADES[codigo][1],
+)
+
+pool = get_connection_pool()
+if pool is not None:
+    with st.sidebar.expander("🔌 Pool de Conexões"):
+        pool_stats = pool.stats()
+        st.caption(
+            f"Em uso: {pool_stats['em_uso']}/{pool_stats['max_size']} · "
+            f"Ociosas: {pool_stats['ociosas']} · "
+            f"Pico: {pool_stats['pico_em_uso']}"
+        )
+        st.caption(
+            f"Checkouts: {pool_stats['checkouts']} · "
+            f"Reutilizadas: {pool_stats['conexoes_reutilizadas']} · "
+            f"Criadas: {pool_stats['conexoes_criadas']}"
+        )
+        st.caption(
+            f"Espera média: {pool_stats['espera_media_ms']:.1f} ms · "
+            f"Máxima: {pool_stats['espera_max_s'] * 1000:.1f} ms · "
+            f"Timeouts: {pool_stats['timeouts']}"
+        )
+
+dataset = get_shared_dataset()
+if dataset.carregado:
+    st.sidebar.caption(
+        f"🕒 Dados verificados há {dataset.idade():.0f} s · "
+        f"versão carregada às {pd.Timestamp.fromtimestamp(dataset.carregado_em):%H:%M:%S}"
+    )
+    if dataset.ultimo_erro:
+        st.sidebar.caption(
+            "⚠️ A última atualização falhou; exibindo a última versão válida dos dados"
+        )
+
+    with st.sidebar.expander("💾 Memória dos Dados"):
+        rotulos = {"logistica": "Logística", "estoque": "Estoque"}
+        for nome, uso in dataset.memoria.items():
+            st.caption(
+                f"{rotulos[nome]}: {uso['linhas']:,} linhas · "
+                f"{uso['bytes'] / 1024 ** 2:.1f} MB"
+            )
+        st.caption(
+            f"Compartilhado entre as sessões · Recargas completas: {dataset.recargas} · "
+            f"Incrementais: {dataset.incrementos}"
+        )
+        if dataset.duracao_carga is not None:
+            st.caption(
+                f"Última carga completa: {dataset.duracao_carga:.2f} s ("
+                + " · ".join(
+                    f"{rotulos[nome]}: {tempo:.2f} s"
+                    for nome, tempo in dataset.tempos_carga.items()
+                )
+                + ", em paralelo)"
+            )
+        primeira = first_render()
+        if primeira is not None:
+            st.caption(
+                f"Primeira renderização do processo: {primeira['total']:.2f} s "
+                f"(importações: {primeira['importacoes']:.2f} s)"
+            )
+        figuras_stats = get_figure_cache().stats()
+        st.caption(
+            f"Gráficos em cache: {figuras_stats['entradas']}/"
+            f"{figuras_stats['max_entries']} · Acertos: {figuras_stats['acertos']} · "
+            f"Descartes: {figuras_stats['descartes']}"
+        )
+
 
-with tab1:
+def render_logistica(start_date, end_date, regioes, estados, granularidade):
+    """Monta a seção de logística para a combinação de filtros"""
+    agregados_logistica = load_logistica_aggregates(
+        start_date, end_date, regioes, estados
+    )
     st.header("📦 Métricas de Impacto e Desempenho Logístico")
 
-    tempo_medio_real = df_filtered["Tempo_Resposta_Real"].mean()
-    tempo_medio_previsto = df_filtered["Tempo_Resposta_Previsto"].mean()
+    resumo = agregados_logistica["resumo"]
+    tempo_medio_real = resumo["tempo_medio_real"]
+    tempo_medio_previsto = resumo["tempo_medio_previsto"]
     reducao_tempo = (
         (1 - (tempo_medio_real / tempo_medio_previsto)) * 100
         if tempo_medio_previsto > 0
         else 0
     )
-    custo_total = df_filtered["Custo_Logistico_USD"].sum()
-    emissao_media = df_filtered["Emissao_CO2_kg"].mean()
+    custo_total = resumo["custo_total"]
+    emissao_media = resumo["emissao_media"]
     taxa_atraso = (
-        (df_filtered["Status"] == "Atrasado").sum() / len(df_filtered) * 100
-        if len(df_filtered) > 0
-        else 0
+        resumo["atrasados"] / resumo["linhas"] * 100 if resumo["linhas"] > 0 else 0
     )
 
     col1, col2, col3, col4 = st.columns(4)
@@ -313,233 +1169,109 @@ with tab1:
 
     st.markdown("---")
 
+    # Os gráficos são montados depois dos indicadores, que já aparecem na
+    # tela enquanto o Plotly é carregado e as figuras são construídas
+    figuras = load_section_figures(
+        "logistica",
+        agregados_logistica,
+        granularidade,
+        start_date,
+        end_date,
+        regioes,
+        estados,
+    )
+
     col_chart1, col_chart2 = st.columns(2)
 
     with col_chart1:
         st.subheader("Tendência de Eficiência: Tempo Real vs. Previsto")
-        df_trend = (
-            df_filtered.groupby("Data")[
-                ["Tempo_Resposta_Previsto", "Tempo_Resposta_Real"]
-            ]
-            .mean()
-            .reset_index()
-        )
-
-        fig_trend = px.line(
-            df_trend,
-            x="Data",
-            y=["Tempo_Resposta_Previsto", "Tempo_Resposta_Real"],
-            labels={"value": "Tempo Médio (dias)", "variable": "Métrica"},
-            title="Comparação de Tempo de Resposta ao Longo do Tempo",
-        )
-        fig_trend.update_layout(legend_title_text="Tempo de Resposta")
-        st.plotly_chart(fig_trend, use_container_width=True)
+        st.plotly_chart(figuras["tendencia"], use_container_width=True)
+        st.caption(describe_series(figuras["series_temporais"]["tendencia"]))
 
     with col_chart2:
         st.subheader("Desempenho da Distribuição por Região")
-        df_region = (
-            df_filtered.groupby(["Regiao", "Status"])
-            .size()
-            .reset_index(name="Contagem")
-        )
-        df_region_total = df_filtered.groupby("Regiao").size().reset_index(name="Total")
-        df_region = pd.merge(df_region, df_region_total, on="Regiao")
-        df_region["Taxa_Atraso"] = np.where(
-            df_region["Status"] == "Atrasado",
-            (df_region["Contagem"] / df_region["Total"]) * 100,
-            0,
-        )
-
-        fig_region = px.bar(
-            df_region.sort_values("Taxa_Atraso", ascending=False),
-            x="Regiao",
-            y="Taxa_Atraso",
-            color="Regiao",
-            labels={"Taxa_Atraso": "Taxa de Atraso (%)", "Regiao": "Região"},
-            title="Taxa de Atraso por Região",
-        )
-        st.plotly_chart(fig_region, use_container_width=True)
+        st.plotly_chart(figuras["regiao"], use_container_width=True)
 
     st.markdown("---")
 
     st.subheader("Monitoramento de Rotas")
     st.caption("Visualização das rotas com alertas de condições")
 
-    df_latest = df_filtered.sort_values("Data", ascending=False).head(20)
-
-    def highlight_status(s):
-        if s.Status == "Atrasado":
-            return ["background-color: #ff6b6b; color: #000000"] * len(s)
-        else:
-            return [""] * len(s)
-
-    column_order = [
-        "Rota_ID",
-        "Data",
-    ]
-    if "Estado" in df_latest.columns:
-        column_order.append("Estado")
-    column_order.extend(
-        [
-            "Regiao",
-            "Status",
-            "Tempo_Resposta_Real",
-            "Custo_Logistico_USD",
-            "Emissao_CO2_kg",
-        ]
+    render_monitor_grid(
+        "logistica",
+        (start_date, end_date, regioes, estados),
+        OCORRENCIAS_ROTAS,
+        highlight_routes,
+        "Nenhuma rota encontrada para os filtros selecionados.",
     )
 
-    st.dataframe(
-        df_latest.style.apply(highlight_status, axis=1),
-        use_container_width=True,
-        column_order=column_order,
-    )
+    df_por_estado = agregados_logistica["por_estado"]
 
-    if "Estado" in df_filtered.columns:
+    if "Estado" in df_por_estado.columns:
         st.markdown("---")
         st.subheader("🗺️ Desempenho por Estado")
 
         col_estado1, col_estado2 = st.columns(2)
 
         with col_estado1:
-            df_estado_tempo = (
-                df_filtered.groupby("Estado")["Tempo_Resposta_Real"]
-                .mean()
-                .reset_index()
-                .sort_values("Tempo_Resposta_Real")
-                .head(10)
-            )
-            df_estado_tempo.columns = ["Estado", "Tempo Médio (dias)"]
-
-            fig_estado_rapido = px.bar(
-                df_estado_tempo,
-                x="Tempo Médio (dias)",
-                y="Estado",
-                orientation="h",
-                title="Top 10 Estados - Menor Tempo de Entrega",
-                color="Tempo Médio (dias)",
-                color_continuous_scale="Greens_r",
-            )
-            st.plotly_chart(fig_estado_rapido, use_container_width=True)
+            st.plotly_chart(figuras["estado_rapido"], use_container_width=True)
 
         with col_estado2:
-            df_estado_tempo_lento = (
-                df_filtered.groupby("Estado")["Tempo_Resposta_Real"]
-                .mean()
-                .reset_index()
-                .sort_values("Tempo_Resposta_Real", ascending=False)
-                .head(10)
-            )
-            df_estado_tempo_lento.columns = ["Estado", "Tempo Médio (dias)"]
-
-            fig_estado_lento = px.bar(
-                df_estado_tempo_lento,
-                x="Tempo Médio (dias)",
-                y="Estado",
-                orientation="h",
-                title="Top 10 Estados - Maior Tempo de Entrega",
-                color="Tempo Médio (dias)",
-                color_continuous_scale="Reds",
-            )
-            st.plotly_chart(fig_estado_lento, use_container_width=True)
+            st.plotly_chart(figuras["estado_lento"], use_container_width=True)
 
-    st.subheader("💰 Análise de Otimização de Custo e Sustentabilidade")
+        col_percentil1, col_percentil2 = st.columns(2)
+
+        with col_percentil1:
+            st.plotly_chart(figuras["percentis_tempo_estado"], use_container_width=True)
+
+        with col_percentil2:
+            st.plotly_chart(figuras["percentis_custo_estado"], use_container_width=True)
 
-    df_summary = (
-        df_filtered.groupby("Regiao")
-        .agg(
-            Custo_Medio_USD=("Custo_Logistico_USD", "mean"),
-            Emissao_Media_CO2=("Emissao_CO2_kg", "mean"),
+        st.caption(
+            "Percentis estimados por sketches combináveis, com erro de até "
+            f"{PRECISAO_RELATIVA:.0%} do valor exato"
         )
-        .reset_index()
-        .sort_values("Custo_Medio_USD", ascending=False)
-    )
 
-    fig_cost_emission = px.scatter(
-        df_summary,
-        x="Custo_Medio_USD",
-        y="Emissao_Media_CO2",
-        color="Regiao",
-        size="Emissao_Media_CO2",
-        hover_name="Regiao",
-        title="Relação Custo vs. Emissão de Carbono por Região",
-        labels={
-            "Custo_Medio_USD": "Custo Médio Logístico (USD)",
-            "Emissao_Media_CO2": "Emissão Média de CO2 (kg)",
-        },
-    )
-    st.plotly_chart(fig_cost_emission, use_container_width=True)
+        percentis = agregados_logistica["percentis"]
+        with st.expander("Percentis por região e por mês"):
+            col_regiao, col_mes = st.columns(2)
+            with col_regiao:
+                st.dataframe(
+                    format_percentiles(percentis["Regiao"], "Regiao", "Região"),
+                    hide_index=True,
+                    use_container_width=True,
+                )
+            with col_mes:
+                st.dataframe(
+                    format_percentiles(percentis["Mes"], "Mes", "Mês"),
+                    hide_index=True,
+                    use_container_width=True,
+                )
+
+    st.subheader("💰 Análise de Otimização de Custo e Sustentabilidade")
+
+    st.plotly_chart(figuras["custo_emissao"], use_container_width=True)
 
     st.markdown("---")
 
     st.subheader("📊 Análise de Correlações")
     st.markdown("Matriz de correlação entre variáveis de logística")
 
-    vars_correlacao = ["Tempo_Resposta_Real", "Custo_Logistico_USD", "Emissao_CO2_kg"]
-    df_corr = df_filtered[vars_correlacao].corr()
-
-    fig_corr = px.imshow(
-        df_corr,
-        text_auto=".2f",
-        aspect="auto",
-        color_continuous_scale="RdBu",
-        title="Matriz de Correlação - Variáveis de Logística",
-        labels=dict(color="Correlação"),
-    )
-    fig_corr.update_layout(height=500)
-    st.plotly_chart(fig_corr, use_container_width=True)
+    st.plotly_chart(figuras["correlacao"], use_container_width=True)
 
     st.markdown("---")
 
-    st.subheader("📈 Análise Temporal Mensal")
-    st.markdown("Tendências mensais de desempenho logístico")
-
-    df_filtered["Ano_Mes"] = df_filtered["Data"].dt.to_period("M").astype(str)
-    df_mensal = (
-        df_filtered.groupby("Ano_Mes")
-        .agg(
-            {
-                "Tempo_Resposta_Real": "mean",
-                "Custo_Logistico_USD": "mean",
-                "Emissao_CO2_kg": "mean",
-                "Status": lambda x: (x == "Atrasado").sum() / len(x) * 100,
-            }
-        )
-        .reset_index()
-    )
-    df_mensal.columns = [
-        "Ano_Mes",
-        "Tempo_Medio",
-        "Custo_Medio",
-        "Emissao_Media",
-        "Taxa_Atraso",
-    ]
+    adjetivo, periodo = GRANULARIDADES[granularidade]
+    st.subheader(f"📈 Análise Temporal {adjetivo}")
+    st.markdown(f"Tendências de desempenho logístico por {periodo.lower()}")
 
     col_temp1, col_temp2 = st.columns(2)
 
     with col_temp1:
-        fig_tempo_mensal = px.line(
-            df_mensal,
-            x="Ano_Mes",
-            y="Tempo_Medio",
-            markers=True,
-            title="Tempo Médio de Entrega Mensal",
-            labels={"Tempo_Medio": "Tempo (dias)", "Ano_Mes": "Mês"},
-        )
-        fig_tempo_mensal.update_xaxes(tickangle=45)
-        st.plotly_chart(fig_tempo_mensal, use_container_width=True)
+        st.plotly_chart(figuras["tempo_periodo"], use_container_width=True)
 
     with col_temp2:
-        fig_custo_mensal = px.line(
-            df_mensal,
-            x="Ano_Mes",
-            y="Custo_Medio",
-            markers=True,
-            title="Custo Médio Mensal (USD)",
-            labels={"Custo_Medio": "Custo (USD)", "Ano_Mes": "Mês"},
-        )
-        fig_custo_mensal.update_xaxes(tickangle=45)
-        st.plotly_chart(fig_custo_mensal, use_container_width=True)
+        st.plotly_chart(figuras["custo_periodo"], use_container_width=True)
 
     st.markdown("---")
 
@@ -549,67 +1281,35 @@ with tab1:
 
     with col_rank1:
         st.markdown("**Top 10 Estados - Maior Custo Total**")
-        df_custo_estado = (
-            df_filtered.groupby("Estado")["Custo_Logistico_USD"]
-            .sum()
-            .reset_index()
-            .sort_values("Custo_Logistico_USD", ascending=False)
-            .head(10)
-        )
-        df_custo_estado.columns = ["Estado", "Custo Total (USD)"]
-
-        fig_custo_estado = px.bar(
-            df_custo_estado,
-            x="Custo Total (USD)",
-            y="Estado",
-            orientation="h",
-            title="Top 10 Estados - Maior Custo Logístico",
-            color="Custo Total (USD)",
-            color_continuous_scale="Blues",
-        )
-        st.plotly_chart(fig_custo_estado, use_container_width=True)
+        st.plotly_chart(figuras["custo_estado"], use_container_width=True)
 
     with col_rank2:
         st.markdown("**Top 10 Estados - Maior Emissão de CO2**")
-        df_emissao_estado = (
-            df_filtered.groupby("Estado")["Emissao_CO2_kg"]
-            .sum()
-            .reset_index()
-            .sort_values("Emissao_CO2_kg", ascending=False)
-            .head(10)
-        )
-        df_emissao_estado.columns = ["Estado", "Emissão Total (kg CO2)"]
-
-        fig_emissao_estado = px.bar(
-            df_emissao_estado,
-            x="Emissão Total (kg CO2)",
-            y="Estado",
-            orientation="h",
-            title="Top 10 Estados - Maior Emissão de CO2",
-            color="Emissão Total (kg CO2)",
-            color_continuous_scale="Oranges",
-        )
-        st.plotly_chart(fig_emissao_estado, use_container_width=True)
+        st.plotly_chart(figuras["emissao_estado"], use_container_width=True)
 
-with tab2:
-    if df_estoque_filtered.empty:
+
+def render_estoque(start_date, end_date, regioes, estados, granularidade):
+    """Monta a seção de estoque e demanda para a combinação de filtros"""
+    agregados_estoque = load_estoque_aggregates(start_date, end_date, regioes, estados)
+    if agregados_estoque is None:
         st.warning(
             "⚠️ Dados de estoque não disponíveis. Execute primeiro o script gerar_demanda_estoque.py para gerar os dados."
         )
-        st.stop()
+        return
 
     st.header("📊 Análise de Estoque e Demanda")
     st.markdown("Monitoramento de estoque, stock out e demanda não atendida")
 
     st.subheader("📊 Métricas Principais de Estoque")
 
-    demanda_total = df_estoque_filtered["Demanda_Diaria"].sum()
-    demanda_atendida = df_estoque_filtered["Demanda_Atendida"].sum()
-    demanda_nao_atendida = df_estoque_filtered["Demanda_Nao_Atendida"].sum()
-    stock_out_total = df_estoque_filtered["Stock_Out"].sum()
-    estoque_final_medio = df_estoque_filtered["Estoque_Final"].mean()
-    taxa_atendimento_media = df_estoque_filtered["Taxa_Atendimento"].mean()
-    dias_stock_out = (df_estoque_filtered["Indicador_Stock_Out"] == 1).sum()
+    resumo_estoque = agregados_estoque["resumo"]
+    demanda_total = resumo_estoque["demanda_total"]
+    demanda_atendida = resumo_estoque["demanda_atendida"]
+    demanda_nao_atendida = resumo_estoque["demanda_nao_atendida"]
+    stock_out_total = resumo_estoque["stock_out_total"]
+    estoque_final_medio = resumo_estoque["estoque_final_medio"]
+    taxa_atendimento_media = resumo_estoque["taxa_atendimento_media"]
+    dias_stock_out = resumo_estoque["dias_stock_out"]
 
     col1, col2, col3, col4 = st.columns(4)
 
@@ -647,49 +1347,26 @@ with tab2:
 
     st.markdown("---")
 
+    figuras = load_section_figures(
+        "estoque",
+        agregados_estoque,
+        granularidade,
+        start_date,
+        end_date,
+        regioes,
+        estados,
+    )
+
     col_chart1, col_chart2 = st.columns(2)
 
     with col_chart1:
         st.subheader("Demanda vs Estoque ao Longo do Tempo")
-        df_tendencia = (
-            df_estoque_filtered.groupby("Data")
-            .agg({"Demanda_Diaria": "sum", "Estoque_Final": "mean", "Stock_Out": "sum"})
-            .reset_index()
-        )
-
-        fig_demanda_estoque = px.line(
-            df_tendencia,
-            x="Data",
-            y=["Demanda_Diaria", "Estoque_Final"],
-            labels={"value": "Quantidade", "variable": "Métrica"},
-            title="Tendência de Demanda e Estoque",
-        )
-        fig_demanda_estoque.update_layout(legend_title_text="Métrica")
-        st.plotly_chart(fig_demanda_estoque, use_container_width=True)
+        st.plotly_chart(figuras["demanda_estoque"], use_container_width=True)
+        st.caption(describe_series(figuras["series_temporais"]["demanda_estoque"]))
 
     with col_chart2:
         st.subheader("Stock Out por Região")
-        df_stock_out_regiao = (
-            df_estoque_filtered.groupby("Regiao")
-            .agg({"Stock_Out": "sum", "Demanda_Diaria": "sum"})
-            .reset_index()
-        )
-        df_stock_out_regiao["Percentual_Stock_Out"] = (
-            df_stock_out_regiao["Stock_Out"]
-            / df_stock_out_regiao["Demanda_Diaria"]
-            * 100
-        )
-
-        fig_stock_out = px.bar(
-            df_stock_out_regiao.sort_values("Stock_Out", ascending=False),
-            x="Regiao",
-            y="Stock_Out",
-            color="Percentual_Stock_Out",
-            color_continuous_scale="Reds",
-            labels={"Stock_Out": "Stock Out Total", "Regiao": "Região"},
-            title="Stock Out Total por Região",
-        )
-        st.plotly_chart(fig_stock_out, use_container_width=True)
+        st.plotly_chart(figuras["stock_out"], use_container_width=True)
 
     st.markdown("---")
 
@@ -699,110 +1376,42 @@ with tab2:
 
     with col_atend1:
         st.subheader("Taxa de Atendimento por Região")
-        df_atendimento = (
-            df_estoque_filtered.groupby("Regiao")["Taxa_Atendimento"]
-            .mean()
-            .reset_index()
-        )
-        df_atendimento = df_atendimento.sort_values("Taxa_Atendimento", ascending=False)
-
-        fig_atendimento = px.bar(
-            df_atendimento,
-            x="Regiao",
-            y="Taxa_Atendimento",
-            color="Taxa_Atendimento",
-            color_continuous_scale="Greens",
-            labels={"Taxa_Atendimento": "Taxa de Atendimento (%)", "Regiao": "Região"},
-            title="Taxa Média de Atendimento por Região",
-        )
-        st.plotly_chart(fig_atendimento, use_container_width=True)
+        st.plotly_chart(figuras["atendimento"], use_container_width=True)
 
     with col_atend2:
         st.subheader("Top 10 Estados - Maior Stock Out")
-        df_stock_out_estado = (
-            df_estoque_filtered.groupby("Estado")["Stock_Out"].sum().reset_index()
-        )
-        df_stock_out_estado = df_stock_out_estado.sort_values(
-            "Stock_Out", ascending=False
-        ).head(10)
-
-        fig_estado_stock = px.bar(
-            df_stock_out_estado,
-            x="Stock_Out",
-            y="Estado",
-            orientation="h",
-            color="Stock_Out",
-            color_continuous_scale="Reds",
-            labels={"Stock_Out": "Stock Out Total"},
-            title="Top 10 Estados com Maior Stock Out",
-        )
-        st.plotly_chart(fig_estado_stock, use_container_width=True)
+        st.plotly_chart(figuras["estado_stock"], use_container_width=True)
 
     st.markdown("---")
 
     st.subheader("⚠️ Monitoramento de Estoque e Stock Out")
     st.caption("Registros com indicadores de estoque baixo e stock out")
 
-    df_monitor = (
-        df_estoque_filtered[
-            (df_estoque_filtered["Indicador_Estoque_Baixo"] == 1)
-            | (df_estoque_filtered["Indicador_Stock_Out"] == 1)
-        ]
-        .sort_values("Data", ascending=False)
-        .head(30)
+    render_monitor_grid(
+        "estoque",
+        (start_date, end_date, regioes, estados),
+        OCORRENCIAS_ESTOQUE,
+        highlight_stock,
+        "✅ Nenhum registro com estoque baixo ou stock out no período selecionado.",
     )
 
-    if not df_monitor.empty:
-
-        def highlight_estoque(s):
-            styles = [""] * len(s)
-            if s.Indicador_Stock_Out == 1:
-                styles = ["background-color: #ff6b6b; color: #000000"] * len(s)
-            elif s.Indicador_Estoque_Baixo == 1:
-                styles = ["background-color: #ffd93d; color: #000000"] * len(s)
-            return styles
-
-        colunas_monitor = [
-            "Data",
-            "Estado",
-            "Regiao",
-            "Demanda_Diaria",
-            "Estoque_Disponivel",
-            "Estoque_Final",
-            "Stock_Out",
-            "Demanda_Nao_Atendida",
-            "Taxa_Atendimento",
-            "Indicador_Estoque_Baixo",
-            "Indicador_Stock_Out",
-        ]
+    df_estoque_estado = agregados_estoque["por_estado"]
 
-        st.dataframe(
-            df_monitor[colunas_monitor].style.apply(highlight_estoque, axis=1),
-            use_container_width=True,
-        )
-    else:
-        st.info(
-            "✅ Nenhum registro com estoque baixo ou stock out no período selecionado."
-        )
-
-    if "Estado" in df_estoque_filtered.columns:
+    if "Estado" in df_estoque_estado.columns:
         st.markdown("---")
         st.subheader("📋 Resumo por Estado")
 
-        resumo_estados = (
-            df_estoque_filtered.groupby("Estado")
-            .agg(
-                {
-                    "Regiao": "first",
-                    "Demanda_Diaria": "sum",
-                    "Stock_Out": "sum",
-                    "Taxa_Atendimento": "mean",
-                    "Estoque_Final": "mean",
-                    "Reabastecimento": "sum",
-                }
-            )
-            .reset_index()
-        )
+        resumo_estados = df_estoque_estado[
+            [
+                "Estado",
+                "Regiao",
+                "Demanda_Diaria",
+                "Stock_Out",
+                "Taxa_Atendimento",
+                "Estoque_Final",
+                "Reabastecimento",
+            ]
+        ].copy()
 
         resumo_estados.columns = [
             "Estado",
@@ -822,117 +1431,21 @@ with tab2:
     st.subheader("📊 Análise de Correlações - Estoque e Demanda")
     st.markdown("Matriz de correlação entre variáveis de estoque e demanda")
 
-    vars_correlacao_estoque = [
-        "Demanda_Diaria",
-        "Estoque_Final",
-        "Stock_Out",
-        "Taxa_Atendimento",
-        "Custo_Total_USD",
-        "Tempo_Medio_Entrega_Dias",
-    ]
-
-    vars_disponiveis = [
-        v for v in vars_correlacao_estoque if v in df_estoque_filtered.columns
-    ]
-    df_corr_estoque = df_estoque_filtered[vars_disponiveis].corr()
-
-    fig_corr_estoque = px.imshow(
-        df_corr_estoque,
-        text_auto=".2f",
-        aspect="auto",
-        color_continuous_scale="RdYlGn",
-        title="Matriz de Correlação - Variáveis de Estoque e Demanda",
-        labels=dict(color="Correlação"),
-    )
-    fig_corr_estoque.update_layout(height=600)
-    st.plotly_chart(fig_corr_estoque, use_container_width=True)
+    st.plotly_chart(figuras["correlacao"], use_container_width=True)
 
     st.markdown("---")
 
-    st.subheader("📈 Análise Temporal Mensal - Estoque")
-    st.markdown("Tendências mensais de demanda, estoque e stock out")
-
-    df_estoque_filtered["Ano_Mes"] = (
-        df_estoque_filtered["Data"].dt.to_period("M").astype(str)
-    )
-    df_mensal_estoque = (
-        df_estoque_filtered.groupby("Ano_Mes")
-        .agg(
-            {
-                "Demanda_Diaria": "sum",
-                "Estoque_Final": "mean",
-                "Stock_Out": "sum",
-                "Taxa_Atendimento": "mean",
-                "Reabastecimento": "sum",
-            }
-        )
-        .reset_index()
-    )
+    adjetivo, periodo = GRANULARIDADES[granularidade]
+    st.subheader(f"📈 Análise Temporal {adjetivo} - Estoque")
+    st.markdown(f"Tendências de demanda, estoque e stock out por {periodo.lower()}")
 
     col_temp_est1, col_temp_est2 = st.columns(2)
 
     with col_temp_est1:
-        fig_demanda_mensal = go.Figure()
-        fig_demanda_mensal.add_trace(
-            go.Scatter(
-                x=df_mensal_estoque["Ano_Mes"],
-                y=df_mensal_estoque["Demanda_Diaria"],
-                name="Demanda Total",
-                line=dict(color="#00FFC6", width=2),
-                mode="lines+markers",
-            )
-        )
-        fig_demanda_mensal.add_trace(
-            go.Scatter(
-                x=df_mensal_estoque["Ano_Mes"],
-                y=df_mensal_estoque["Estoque_Final"],
-                name="Estoque Final Médio",
-                line=dict(color="#1DE9B6", width=2),
-                mode="lines+markers",
-            )
-        )
-        fig_demanda_mensal.update_layout(
-            title="Demanda e Estoque Mensal",
-            xaxis_title="Mês",
-            yaxis_title="Quantidade",
-            hovermode="x unified",
-            height=400,
-        )
-        fig_demanda_mensal.update_xaxes(tickangle=45)
-        st.plotly_chart(fig_demanda_mensal, use_container_width=True)
+        st.plotly_chart(figuras["demanda_periodo"], use_container_width=True)
 
     with col_temp_est2:
-        fig_stock_mensal = go.Figure()
-        fig_stock_mensal.add_trace(
-            go.Scatter(
-                x=df_mensal_estoque["Ano_Mes"],
-                y=df_mensal_estoque["Stock_Out"],
-                name="Stock Out Total",
-                line=dict(color="#FF6B6B", width=2),
-                mode="lines+markers",
-                yaxis="y",
-            )
-        )
-        fig_stock_mensal.add_trace(
-            go.Scatter(
-                x=df_mensal_estoque["Ano_Mes"],
-                y=df_mensal_estoque["Taxa_Atendimento"],
-                name="Taxa de Atendimento (%)",
-                line=dict(color="#FFD93D", width=2),
-                mode="lines+markers",
-                yaxis="y2",
-            )
-        )
-        fig_stock_mensal.update_layout(
-            title="Stock Out e Taxa de Atendimento Mensal",
-            xaxis_title="Mês",
-            yaxis=dict(title="Stock Out Total", side="left"),
-            yaxis2=dict(title="Taxa de Atendimento (%)", side="right", overlaying="y"),
-            hovermode="x unified",
-            height=400,
-        )
-        fig_stock_mensal.update_xaxes(tickangle=45)
-        st.plotly_chart(fig_stock_mensal, use_container_width=True)
+        st.plotly_chart(figuras["stock_periodo"], use_container_width=True)
 
     st.markdown("---")
 
@@ -942,47 +1455,11 @@ with tab2:
 
     with col_rank_est1:
         st.markdown("**Top 10 Estados - Maior Demanda Total**")
-        df_demanda_estado = (
-            df_estoque_filtered.groupby("Estado")["Demanda_Diaria"]
-            .sum()
-            .reset_index()
-            .sort_values("Demanda_Diaria", ascending=False)
-            .head(10)
-        )
-        df_demanda_estado.columns = ["Estado", "Demanda Total"]
-
-        fig_demanda_estado = px.bar(
-            df_demanda_estado,
-            x="Demanda Total",
-            y="Estado",
-            orientation="h",
-            title="Top 10 Estados - Maior Demanda Total",
-            color="Demanda Total",
-            color_continuous_scale="Blues",
-        )
-        st.plotly_chart(fig_demanda_estado, use_container_width=True)
+        st.plotly_chart(figuras["demanda_estado"], use_container_width=True)
 
     with col_rank_est2:
         st.markdown("**Top 10 Estados - Melhor Taxa de Atendimento**")
-        df_atendimento_estado = (
-            df_estoque_filtered.groupby("Estado")["Taxa_Atendimento"]
-            .mean()
-            .reset_index()
-            .sort_values("Taxa_Atendimento", ascending=False)
-            .head(10)
-        )
-        df_atendimento_estado.columns = ["Estado", "Taxa de Atendimento (%)"]
-
-        fig_atendimento_estado = px.bar(
-            df_atendimento_estado,
-            x="Taxa de Atendimento (%)",
-            y="Estado",
-            orientation="h",
-            title="Top 10 Estados - Melhor Taxa de Atendimento",
-            color="Taxa de Atendimento (%)",
-            color_continuous_scale="Greens",
-        )
-        st.plotly_chart(fig_atendimento_estado, use_container_width=True)
+        st.plotly_chart(figuras["atendimento_estado"], use_container_width=True)
 
     st.markdown("---")
 
@@ -993,78 +1470,152 @@ with tab2:
 
     with col_reab1:
         st.markdown("**Total de Reabastecimentos por Região**")
-        df_reab_regiao = (
-            df_estoque_filtered.groupby("Regiao")["Reabastecimento"]
-            .sum()
-            .reset_index()
-            .sort_values("Reabastecimento", ascending=False)
-        )
-
-        fig_reab_regiao = px.bar(
-            df_reab_regiao,
-            x="Regiao",
-            y="Reabastecimento",
-            title="Total de Reabastecimentos por Região",
-            color="Reabastecimento",
-            color_continuous_scale="Viridis",
-            labels={"Reabastecimento": "Total Reabastecimentos", "Regiao": "Região"},
-        )
-        st.plotly_chart(fig_reab_regiao, use_container_width=True)
+        st.plotly_chart(figuras["reab_regiao"], use_container_width=True)
 
     with col_reab2:
         st.markdown("**Top 10 Estados - Mais Reabastecimentos**")
-        df_reab_estado = (
-            df_estoque_filtered.groupby("Estado")["Reabastecimento"]
-            .sum()
-            .reset_index()
-            .sort_values("Reabastecimento", ascending=False)
-            .head(10)
-        )
-        df_reab_estado.columns = ["Estado", "Total Reabastecimentos"]
-
-        fig_reab_estado = px.bar(
-            df_reab_estado,
-            x="Total Reabastecimentos",
-            y="Estado",
-            orientation="h",
-            title="Top 10 Estados - Mais Reabastecimentos",
-            color="Total Reabastecimentos",
-            color_continuous_scale="Purples",
-        )
-        st.plotly_chart(fig_reab_estado, use_container_width=True)
+        st.plotly_chart(figuras["reab_estado"], use_container_width=True)
 
     st.markdown("---")
 
     st.subheader("📊 Comparação: Demanda Atendida vs Não Atendida")
 
-    df_atend_vs_nao = (
-        df_estoque_filtered.groupby("Regiao")
-        .agg({"Demanda_Atendida": "sum", "Demanda_Nao_Atendida": "sum"})
-        .reset_index()
+    st.plotly_chart(figuras["atend_comparacao"], use_container_width=True)
+
+    st.markdown("---")
+
+    render_simulation(start_date, end_date, regioes, estados, agregados_estoque)
+
+
+def render_simulation(start_date, end_date, regioes, estados, agregados_estoque):
+    """Simulação de cenários de reposição sobre a demanda filtrada"""
+    st.subheader("🧪 Simulação de Cenários de Reposição")
+    st.markdown(
+        "Reprocessa a demanda diária de cada estado no período filtrado com a "
+        "política de reposição escolhida. Ponto de reposição, estoque de "
+        "segurança e lote são medidos em dias da demanda média de cada estado."
     )
 
-    fig_atend_comparacao = go.Figure()
-    fig_atend_comparacao.add_trace(
-        go.Bar(
-            x=df_atend_vs_nao["Regiao"],
-            y=df_atend_vs_nao["Demanda_Atendida"],
-            name="Demanda Atendida",
-            marker_color="#00FFC6",
+    matriz = load_demand_matrix(start_date, end_date, regioes, estados)
+    if matriz is None:
+        st.warning(
+            "⚠️ Demanda diária não disponível para a simulação. Verifique a conexão com o banco de dados."
         )
+        return
+
+    estados_simulados, datas, demanda = matriz
+    if demanda.size == 0:
+        st.info("Sem demanda no período selecionado para simular.")
+        return
+
+    col_param1, col_param2, col_param3, col_param4 = st.columns(4)
+    with col_param1:
+        lead_time = st.slider("Lead time (dias)", 1, 30, 5, key="sim_lead_time")
+    with col_param2:
+        ponto_reposicao = st.slider(
+            "Ponto de reposição (dias)", 0.0, 30.0, 5.0, 0.5, key="sim_ponto"
+        )
+    with col_param3:
+        estoque_seguranca = st.slider(
+            "Estoque de segurança (dias)", 0.0, 15.0, 2.0, 0.5, key="sim_seguranca"
+        )
+    with col_param4:
+        lote = st.slider(
+            "Lote de reposição (dias)", 1.0, 60.0, 7.0, 1.0, key="sim_lote"
+        )
+
+    inicio = time.perf_counter()
+    resultado = simulate_inventory(
+        demanda, lead_time, ponto_reposicao, estoque_seguranca, lote
+    )
+    duracao = time.perf_counter() - inicio
+    por_estado = simulation_summary(demanda, estados_simulados, resultado)
+
+    resumo = agregados_estoque["resumo"]
+    demanda_total = por_estado["Demanda_Diaria"].sum()
+    atendimento = (
+        por_estado["Demanda_Atendida"].sum() / demanda_total * 100
+        if demanda_total > 0
+        else 0
     )
-    fig_atend_comparacao.add_trace(
-        go.Bar(
-            x=df_atend_vs_nao["Regiao"],
-            y=df_atend_vs_nao["Demanda_Nao_Atendida"],
-            name="Demanda Não Atendida",
-            marker_color="#FF6B6B",
+    atendimento_historico = (
+        resumo["demanda_atendida"] / resumo["demanda_total"] * 100
+        if resumo["demanda_total"] > 0
+        else 0
+    )
+    stock_out = por_estado["Stock_Out"].sum()
+    estoque_medio = resultado["estoque_final"].mean()
+
+    col1, col2, col3, col4 = st.columns(4)
+
+    with col1:
+        st.metric(
+            label="Atendimento da Demanda (Simulado)",
+            value=f"{atendimento:.1f}%",
+            delta=f"{atendimento - atendimento_historico:+.1f} p.p. vs. histórico",
         )
+
+    with col2:
+        st.metric(
+            label="Stock Out Total (Simulado)",
+            value=f"{stock_out:,.0f}",
+            delta=f"{stock_out - resumo['stock_out_total']:+,.0f} vs. histórico",
+            delta_color="inverse",
+        )
+
+    with col3:
+        st.metric(
+            label="Estoque Final Médio (Simulado)",
+            value=f"{estoque_medio:.0f} unidades",
+            delta=f"{estoque_medio - resumo['estoque_final_medio']:+,.0f} vs. histórico",
+            delta_color="inverse",
+        )
+
+    with col4:
+        st.metric(
+            label="Pedidos de Reposição",
+            value=f"{por_estado['Pedidos'].sum():,}",
+            delta=f"Dias com stock out: {por_estado['Dias_Stock_Out'].sum():,}",
+            delta_color="off",
+        )
+
+    from figures import simulation_figures
+
+    serie, resolucao = simulation_series(
+        datas, resultado, agregados_estoque["diario"], MAX_CHART_POINTS
     )
-    fig_atend_comparacao.update_layout(
-        title="Demanda Atendida vs Não Atendida por Região",
-        xaxis_title="Região",
-        yaxis_title="Demanda",
-        barmode="group",
-        height=500,
+    figuras = simulation_figures(serie, resolucao)
+
+    col_sim1, col_sim2 = st.columns(2)
+
+    with col_sim1:
+        st.plotly_chart(figuras["estoque"], use_container_width=True)
+
+    with col_sim2:
+        st.plotly_chart(figuras["stock_out"], use_container_width=True)
+
+    st.caption(
+        f"{len(estados_simulados)} estados × {len(datas)} dias simulados em "
+        f"{duracao * 1000:.0f} ms"
     )
-    st.plotly_chart(fig_atend_comparacao, use_container_width=True)
+
+    resumo_simulacao = por_estado.sort_values("Stock_Out", ascending=False)
+    resumo_simulacao.columns = [
+        "Estado",
+        "Demanda Total",
+        "Demanda Atendida",
+        "Stock Out Total",
+        "Atendimento (%)",
+        "Estoque Final Médio",
+        "Dias com Stock Out",
+        "Pedidos",
+    ]
+    st.dataframe(resumo_simulacao.round(1), hide_index=True, use_container_width=True)
+
+
+if secao == SECOES[0]:
+    render_logistica(start_date, end_date, regioes, estados, granularidade)
+else:
+    render_estoque(start_date, end_date, regioes, estados, granularidade)
+
+record_render(INICIO_EXECUCAO, IMPORTACOES_CONCLUIDAS)
@@ -0,0 +1,58 @@
+"""Memoização com limite de tamanho para os objetos montados pelo dashboard.
+
+Guarda, por chave, o resultado de uma função de montagem e descarta as
+entradas usadas há mais tempo quando o limite é atingido. É compartilhado
+entre as sessões do processo, então os valores guardados devem ser tratados
+como somente leitura.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Cache com política LRU, limitado em número de entradas e seguro entre threads"""
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self._acertos = 0
+        self._faltas = 0
+        self._descartes = 0
+
+    def get_or_build(self, chave, montar):
+        """Retorna o valor guardado para `chave` ou o monta com `montar()`"""
+        with self._lock:
+            if chave in self._entradas:
+                self._entradas.move_to_end(chave)
+                self._acertos += 1
+                return self._entradas[chave]
+            self._faltas += 1
+
+        # Montado fora do lock: sessões com outras chaves não ficam esperando
+        valor = montar()
+
+        with self._lock:
+            self._entradas[chave] = valor
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_entries:
+                self._entradas.popitem(last=False)
+                self._descartes += 1
+        return valor
+
+    def clear(self):
+        """Remove todas as entradas"""
+        with self._lock:
+            self._entradas.clear()
+
+    def stats(self):
+        """Retorna o uso do cache para monitoramento"""
+        with self._lock:
+            return {
+                "entradas": len(self._entradas),
+                "max_entries": self.max_entries,
+                "acertos": self._acertos,
+                "faltas": self._faltas,
+                "descartes": self._descartes,
+            }
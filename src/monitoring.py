@@ -0,0 +1,294 @@
+"""Páginas das tabelas de monitoramento de rotas e de estoque.
+
+Em vez de ordenar todas as linhas filtradas para exibir as mais recentes,
+cada página é selecionada por top-k (`nlargest`) em memória ou por
+LIMIT/OFFSET no PostgreSQL, e apenas as linhas da página são enviadas ao
+navegador. O destaque das linhas é calculado de uma vez para a página
+inteira, sem uma chamada Python por linha.
+"""
+
+import numpy as np
+import pandas as pd
+
+TAMANHO_PAGINA = 25
+
+# Recortes disponíveis em cada tabela: código -> rótulo exibido
+OCORRENCIAS_ROTAS = {
+    "todas": "Todas as rotas",
+    "atrasadas": "Apenas atrasadas",
+}
+OCORRENCIAS_ESTOQUE = {
+    "alertas": "Estoque baixo ou stock out",
+    "stock_out": "Apenas stock out",
+    "estoque_baixo": "Apenas estoque baixo",
+}
+
+COLUNAS_ROTAS_SQL = {
+    "Rota_ID": "rota_id",
+    "Data": "data",
+    "Estado": "estado",
+    "Regiao": "regiao",
+    "Status": "status",
+    "Tempo_Resposta_Real": "tempo_resposta_real::float8",
+    "Custo_Logistico_USD": "custo_logistico_usd::float8",
+    "Emissao_CO2_kg": "emissao_co2_kg::float8",
+}
+
+COLUNAS_ESTOQUE_SQL = {
+    "Data": "data",
+    "Estado": "estado",
+    "Regiao": "regiao",
+    "Demanda_Diaria": "demanda_diaria",
+    "Estoque_Disponivel": "estoque_disponivel",
+    "Estoque_Final": "estoque_final",
+    "Stock_Out": "stock_out",
+    "Demanda_Nao_Atendida": "demanda_nao_atendida::float8",
+    "Taxa_Atendimento": "taxa_atendimento::float8",
+    "Indicador_Estoque_Baixo": "indicador_estoque_baixo",
+    "Indicador_Stock_Out": "indicador_stock_out",
+}
+
+# Colunas comparadas com o texto da busca, quando existirem
+COLUNAS_BUSCA = ["Rota_ID", "Estado", "Regiao"]
+
+ESTILO_ALERTA = "background-color: #ff6b6b; color: #000000"
+ESTILO_AVISO = "background-color: #ffd93d; color: #000000"
+
+
+def _condicao_rotas(df, ocorrencia):
+    if ocorrencia == "atrasadas":
+        return df["Status"] == "Atrasado"
+    return None
+
+
+def _condicao_estoque(df, ocorrencia):
+    stock_out = df["Indicador_Stock_Out"] == 1
+    if ocorrencia == "stock_out":
+        return stock_out
+    estoque_baixo = df["Indicador_Estoque_Baixo"] == 1
+    if ocorrencia == "estoque_baixo":
+        return estoque_baixo
+    return stock_out | estoque_baixo
+
+
+def _condicao_busca(df, busca):
+    condicao = None
+    for coluna in COLUNAS_BUSCA:
+        if coluna not in df:
+            continue
+        serie = df[coluna]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            # Compara só as categorias e seleciona as linhas pelos códigos
+            categorias = serie.cat.categories.astype(str)
+            codigos = np.flatnonzero(
+                categorias.str.contains(busca, case=False, regex=False)
+            )
+            encontrada = serie.cat.codes.isin(codigos)
+        else:
+            encontrada = serie.str.contains(busca, case=False, regex=False, na=False)
+        condicao = encontrada if condicao is None else condicao | encontrada
+    return condicao
+
+
+def _mais_recentes(datas, chaves, quantidade):
+    """Rótulos das `quantidade` linhas mais recentes de `datas`, em ordem.
+
+    Empates na data são desfeitos pela chave decrescente (o `ID` ou a
+    posição da linha), como no `ORDER BY data DESC, id DESC` do banco;
+    `chaves` é indexado pelos rótulos de `datas`.
+    """
+    candidatas = datas.nlargest(quantidade, keep="all")
+    rotulos = candidatas.index.to_numpy()
+    ordem = np.lexsort((chaves[rotulos], candidatas.to_numpy()))[::-1]
+    return rotulos[ordem[:quantidade]]
+
+
+def page_from_frame(df, condicao, colunas, pagina=0, tamanho=TAMANHO_PAGINA):
+    """Retorna a página `pagina` das linhas mais recentes que atendem à condição.
+
+    Só as datas das linhas selecionadas participam da seleção por top-k, e
+    apenas as linhas da página são materializadas. Retorna a página e o
+    total de linhas encontradas.
+    """
+    datas = pd.Series(df["Data"].to_numpy())
+    chaves = df["ID"].to_numpy() if "ID" in df else np.arange(len(df))
+    if condicao is not None:
+        datas = datas[condicao.to_numpy()]
+    inicio = pagina * tamanho
+    posicoes = _mais_recentes(datas, chaves, inicio + tamanho)[inicio:]
+    colunas = [coluna for coluna in colunas if coluna in df]
+    return df.iloc[posicoes][colunas].reset_index(drop=True), len(datas)
+
+
+def _combinar(*condicoes):
+    combinada = None
+    for condicao in condicoes:
+        if condicao is not None:
+            combinada = condicao if combinada is None else combinada & condicao
+    return combinada
+
+
+def page_from_chunks(chunks, condicao, colunas, pagina=0, tamanho=TAMANHO_PAGINA):
+    """Seleciona a página das linhas mais recentes lendo os dados em blocos.
+
+    `condicao(df)` recebe cada bloco e retorna a máscara das linhas
+    selecionadas (ou None para todas). Entre um bloco e outro, só as linhas
+    que ainda podem estar na página são mantidas. Sem a coluna `ID`, os
+    empates na data são desfeitos pelo índice dos blocos, que no leitor de
+    CSV do pandas é a posição da linha no arquivo.
+    """
+    inicio = pagina * tamanho
+    candidatas = None
+    total = 0
+    for chunk in chunks:
+        mascara = condicao(chunk)
+        selecionadas = chunk if mascara is None else chunk[mascara.to_numpy()]
+        total += len(selecionadas)
+        chaves = (
+            selecionadas["ID"] if "ID" in selecionadas else selecionadas.index
+        ).to_numpy()
+        selecionadas = selecionadas[
+            [coluna for coluna in colunas if coluna in chunk]
+        ].assign(_chave=chaves)
+        selecionadas = pd.concat([candidatas, selecionadas], ignore_index=True)
+        candidatas = selecionadas.iloc[
+            _mais_recentes(
+                selecionadas["Data"],
+                selecionadas["_chave"].to_numpy(),
+                inicio + tamanho,
+            )
+        ]
+
+    if candidatas is None:
+        return pd.DataFrame(columns=colunas), 0
+    return candidatas.iloc[inicio:].drop(columns="_chave").reset_index(drop=True), total
+
+
+def route_condition(df, ocorrencia="todas", busca=""):
+    """Máscara das rotas da ocorrência escolhida que atendem à busca"""
+    busca = busca.strip()
+    return _combinar(
+        _condicao_rotas(df, ocorrencia),
+        _condicao_busca(df, busca) if busca else None,
+    )
+
+
+def stock_condition(df, ocorrencia="alertas", busca=""):
+    """Máscara dos registros de estoque da ocorrência escolhida que atendem à busca"""
+    busca = busca.strip()
+    return _combinar(
+        _condicao_estoque(df, ocorrencia),
+        _condicao_busca(df, busca) if busca else None,
+    )
+
+
+def route_page_from_frame(df, ocorrencia="todas", busca="", pagina=0):
+    """Página das rotas mais recentes, filtradas por ocorrência e busca"""
+    condicao = route_condition(df, ocorrencia, busca)
+    return page_from_frame(df, condicao, list(COLUNAS_ROTAS_SQL), pagina)
+
+
+def stock_page_from_frame(df, ocorrencia="alertas", busca="", pagina=0):
+    """Página dos registros de estoque mais recentes com alertas"""
+    condicao = stock_condition(df, ocorrencia, busca)
+    return page_from_frame(df, condicao, list(COLUNAS_ESTOQUE_SQL), pagina)
+
+
+def _busca_sql(busca, colunas):
+    # Curingas digitados na busca são tratados como texto
+    termo = busca.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    condicao = " OR ".join(f"{coluna}::text ILIKE %s ESCAPE '\\'" for coluna in colunas)
+    return f"({condicao})", [f"%{termo}%"] * len(colunas)
+
+
+def page_from_sql(
+    conn, tabela, colunas_sql, clauses, params, pagina=0, tamanho=TAMANHO_PAGINA
+):
+    """Lê do PostgreSQL uma página das linhas mais recentes com LIMIT/OFFSET.
+
+    A contagem é feita em uma consulta separada, que não traz linhas. Retorna
+    a página e o total de linhas encontradas.
+    """
+    where = " AND ".join(clauses) or "TRUE"
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT COUNT(*) FROM {tabela} WHERE {where}", params)
+        total = cur.fetchone()[0]
+
+    selecao = ", ".join(
+        f'{expressao} AS "{coluna}"' for coluna, expressao in colunas_sql.items()
+    )
+    df = pd.read_sql_query(
+        f"""
+        SELECT {selecao}
+        FROM {tabela}
+        WHERE {where}
+        ORDER BY data DESC, id DESC
+        LIMIT %s OFFSET %s
+        """,
+        conn,
+        params=list(params) + [tamanho, pagina * tamanho],
+    )
+    df["Data"] = pd.to_datetime(df["Data"])
+    return df, total
+
+
+def route_page_from_sql(conn, clauses, params, ocorrencia="todas", busca="", pagina=0):
+    """Página das rotas mais recentes lida do PostgreSQL"""
+    clauses, params = ["status != 'Em Rota'"] + list(clauses), list(params)
+    if ocorrencia == "atrasadas":
+        clauses.append("status = 'Atrasado'")
+    busca = busca.strip()
+    if busca:
+        condicao, termos = _busca_sql(busca, ["rota_id", "estado", "regiao"])
+        clauses.append(condicao)
+        params += termos
+    return page_from_sql(conn, "logistica", COLUNAS_ROTAS_SQL, clauses, params, pagina)
+
+
+def stock_page_from_sql(
+    conn, clauses, params, ocorrencia="alertas", busca="", pagina=0
+):
+    """Página dos registros de estoque com alertas lida do PostgreSQL"""
+    clauses, params = list(clauses), list(params)
+    if ocorrencia == "stock_out":
+        clauses.append("indicador_stock_out = 1")
+    elif ocorrencia == "estoque_baixo":
+        clauses.append("indicador_estoque_baixo = 1")
+    else:
+        clauses.append("(indicador_estoque_baixo = 1 OR indicador_stock_out = 1)")
+    busca = busca.strip()
+    if busca:
+        condicao, termos = _busca_sql(busca, ["estado", "regiao"])
+        clauses.append(condicao)
+        params += termos
+    return page_from_sql(
+        conn, "demanda_estoque", COLUNAS_ESTOQUE_SQL, clauses, params, pagina
+    )
+
+
+def _estilos_linhas(df, cores):
+    """Repete a cor de cada linha em todas as colunas da página"""
+    return pd.DataFrame(
+        np.repeat(cores[:, np.newaxis], df.shape[1], axis=1),
+        index=df.index,
+        columns=df.columns,
+    )
+
+
+def highlight_routes(df):
+    """Estilos da página de rotas: rotas atrasadas em vermelho"""
+    cores = np.where(df["Status"].to_numpy() == "Atrasado", ESTILO_ALERTA, "")
+    return _estilos_linhas(df, cores)
+
+
+def highlight_stock(df):
+    """Estilos da página de estoque: stock out em vermelho, estoque baixo em amarelo"""
+    cores = np.select(
+        [
+            df["Indicador_Stock_Out"].to_numpy() == 1,
+            df["Indicador_Estoque_Baixo"].to_numpy() == 1,
+        ],
+        [ESTILO_ALERTA, ESTILO_AVISO],
+        default="",
+    )
+    return _estilos_linhas(df, cores)
@@ -0,0 +1,139 @@
+"""Tabela de rollup materializada de demanda_estoque (dia×estado)"""
+
+# Transações longas de importação podem gravar created_at anterior à marca
+# d'água já registrada; como recalcular um dia é idempotente, reprocessamos
+# uma pequena janela de sobreposição para não perder essas linhas.
+REFRESH_OVERLAP = "5 minutes"
+
+ROLLUP_MEDIDAS_SQL = """
+    COUNT(*) AS linhas,
+    SUM(demanda_diaria) AS demanda_diaria,
+    SUM(demanda_atendida) AS demanda_atendida,
+    SUM(demanda_nao_atendida) AS demanda_nao_atendida,
+    SUM(stock_out) AS stock_out,
+    SUM(reabastecimento) AS reabastecimento,
+    SUM(estoque_final) AS soma_estoque_final,
+    SUM(taxa_atendimento) AS soma_taxa_atendimento,
+    COUNT(*) FILTER (WHERE indicador_stock_out = 1) AS dias_stock_out
+"""
+
+ROLLUP_COLUNAS = [
+    "linhas",
+    "demanda_diaria",
+    "demanda_atendida",
+    "demanda_nao_atendida",
+    "stock_out",
+    "reabastecimento",
+    "soma_estoque_final",
+    "soma_taxa_atendimento",
+    "dias_stock_out",
+]
+
+ROLLUP_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS demanda_estoque_diario (
+        data DATE NOT NULL,
+        estado TEXT NOT NULL,
+        regiao TEXT NOT NULL,
+        linhas INTEGER NOT NULL,
+        demanda_diaria BIGINT NOT NULL,
+        demanda_atendida NUMERIC(14, 2) NOT NULL,
+        demanda_nao_atendida NUMERIC(14, 2) NOT NULL,
+        stock_out BIGINT NOT NULL,
+        reabastecimento BIGINT NOT NULL,
+        soma_estoque_final BIGINT NOT NULL,
+        soma_taxa_atendimento NUMERIC(14, 2) NOT NULL,
+        dias_stock_out INTEGER NOT NULL,
+        PRIMARY KEY (data, estado, regiao)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rollup_refresh (
+        tabela TEXT PRIMARY KEY,
+        created_at_max TIMESTAMP,
+        atualizado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_demanda_estoque_created_at ON demanda_estoque (created_at)",
+    # O rollup mês×estado foi substituído pela reagregação do diário; bancos
+    # que já o criaram ficariam com uma tabela órfã e desatualizada
+    "DROP TABLE IF EXISTS demanda_estoque_mensal",
+]
+
+
+def ensure_rollups(conn):
+    """Cria as tabelas de rollup e o controle de atualização e remove as obsoletas"""
+    with conn.cursor() as cur:
+        for sql in ROLLUP_DDL:
+            cur.execute(sql)
+    conn.commit()
+
+
+def _inserir_diario(cur, dias=None):
+    filtro = "WHERE data = ANY(%s)" if dias is not None else ""
+    cur.execute(
+        f"""
+        INSERT INTO demanda_estoque_diario (data, estado, regiao, {", ".join(ROLLUP_COLUNAS)})
+        SELECT data, estado, regiao, {ROLLUP_MEDIDAS_SQL}
+        FROM demanda_estoque
+        {filtro}
+        GROUP BY data, estado, regiao
+        """,
+        [dias] if dias is not None else None,
+    )
+
+
+def refresh_rollups(conn, full=False):
+    """Atualiza os rollups de demanda_estoque de forma incremental.
+
+    Usa o maior `created_at` já processado como marca d'água: apenas os dias
+    que receberam linhas novas desde a última atualização são recalculados
+    no rollup diário. Na primeira execução (ou com `full=True`) o rollup é
+    reconstruído.
+    Retorna o número de dias recalculados.
+    """
+    with conn.cursor() as cur:
+        # Serializa atualizações concorrentes de réplicas diferentes
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext('demanda_estoque_rollup'))")
+        cur.execute("SELECT MAX(created_at) FROM demanda_estoque")
+        created_at_max = cur.fetchone()[0]
+        cur.execute(
+            "SELECT created_at_max FROM rollup_refresh WHERE tabela = 'demanda_estoque'"
+        )
+        linha = cur.fetchone()
+
+        if full or linha is None or linha[0] is None:
+            cur.execute("TRUNCATE demanda_estoque_diario")
+            _inserir_diario(cur)
+            cur.execute("SELECT COUNT(DISTINCT data) FROM demanda_estoque_diario")
+            dias_recalculados = cur.fetchone()[0]
+        else:
+            cur.execute(
+                f"""
+                SELECT DISTINCT data
+                FROM demanda_estoque
+                WHERE created_at > %s - INTERVAL '{REFRESH_OVERLAP}'
+                  AND created_at <= %s
+                """,
+                (linha[0], created_at_max),
+            )
+            dias = [row[0] for row in cur.fetchall()]
+            dias_recalculados = len(dias)
+            if dias:
+                cur.execute(
+                    "DELETE FROM demanda_estoque_diario WHERE data = ANY(%s)", (dias,)
+                )
+                _inserir_diario(cur, dias)
+
+        cur.execute(
+            """
+            INSERT INTO rollup_refresh (tabela, created_at_max, atualizado_em)
+            VALUES ('demanda_estoque', %s, CURRENT_TIMESTAMP)
+            ON CONFLICT (tabela) DO UPDATE
+            SET created_at_max = EXCLUDED.created_at_max,
+                atualizado_em = EXCLUDED.atualizado_em
+            """,
+            (created_at_max,),
+        )
+    conn.commit()
+    return dias_recalculados
@@ -0,0 +1,111 @@
+"""Esquema de tipos das colunas dos conjuntos de dados do dashboard.
+
+Textos de baixa cardinalidade viram categóricos, identificadores únicos
+(`Rota_ID`) usam strings Arrow e medidas numéricas usam o menor tipo que
+preserva os valores exibidos: indicadores 0/1 em int8, contagens em int32 e
+médias (tempos, taxas) em float32. Colunas que são somadas nos totais do painel
+(custos, demanda atendida, acumulados) permanecem em float64, pois o pandas
+soma float32 em float32 e os totais formatados como inteiros perderiam
+unidades em bases grandes.
+"""
+
+import numpy as np
+import pandas as pd
+
+LOGISTICA_DTYPES = {
+    "ID": "int32",
+    "Data": "datetime64[ns]",
+    "Estado": "category",
+    "Regiao": "category",
+    "Rota_ID": "string[pyarrow]",
+    "Tempo_Resposta_Previsto": "float32",
+    "Tempo_Resposta_Real": "float32",
+    "Status": "category",
+    "Custo_Logistico_USD": "float64",
+    "Emissao_CO2_kg": "float64",
+}
+
+ESTOQUE_DTYPES = {
+    "ID": "int32",
+    "Data": "datetime64[ns]",
+    "Estado": "category",
+    "Regiao": "category",
+    "Demanda_Diaria": "int32",
+    "Entregas_Concluidas": "int32",
+    "Entregas_Atrasadas": "int32",
+    "Custo_Total_USD": "float64",
+    "Custo_Medio_USD": "float32",
+    "Emissao_Total_CO2_kg": "float64",
+    "Emissao_Media_CO2_kg": "float32",
+    "Tempo_Medio_Entrega_Dias": "float32",
+    "Tempo_Previsto_Medio_Dias": "float32",
+    "Estoque_Inicial": "int32",
+    "Estoque_Disponivel": "int32",
+    "Estoque_Final": "int32",
+    "Reabastecimento": "int32",
+    "Reabastecimento_Chegando": "int32",
+    "Stock_Out": "int32",
+    "Demanda_Atendida": "float64",
+    "Demanda_Nao_Atendida": "float64",
+    "Taxa_Atendimento": "float32",
+    "Nivel_Servico": "float32",
+    "Dias_Estoque_Restante": "int32",
+    "Ponto_Reposicao": "int32",
+    "Indicador_Estoque_Baixo": "int8",
+    "Indicador_Stock_Out": "int8",
+    "Demanda_Acumulada": "float64",
+    "Stock_Out_Acumulado": "int32",
+    "Custo_Total_Acumulado": "float64",
+}
+
+
+def _cabe_no_tipo(serie, dtype):
+    if serie.isna().any():
+        return False
+    if serie.empty:
+        return True
+    limites = np.iinfo(dtype)
+    return limites.min <= serie.min() and serie.max() <= limites.max
+
+
+def apply_schema(df, dtypes):
+    """Converte as colunas presentes no DataFrame para os tipos declarados.
+
+    Colunas inteiras com nulos ou valores fora da faixa do tipo declarado são
+    mantidas como estão, para não truncar valores.
+    """
+    convertidas = {}
+    for coluna, dtype in dtypes.items():
+        if coluna not in df.columns or df[coluna].dtype == dtype:
+            continue
+
+        serie = df[coluna]
+        if dtype == "category":
+            categorias = sorted(serie.dropna().unique())
+            convertidas[coluna] = serie.astype(pd.CategoricalDtype(categorias))
+        elif dtype.startswith("datetime64"):
+            convertidas[coluna] = pd.to_datetime(serie).astype(dtype)
+        elif dtype.startswith("int"):
+            if _cabe_no_tipo(serie, dtype):
+                convertidas[coluna] = serie.astype(dtype)
+        else:
+            convertidas[coluna] = serie.astype(dtype)
+
+    return df.assign(**convertidas) if convertidas else df
+
+
+def arrow_types_mapper(tipo):
+    """Mantém texto não categórico em strings Arrow ao converter tabelas Arrow para o pandas"""
+    import pyarrow as pa
+
+    if tipo == pa.string():
+        return pd.StringDtype("pyarrow")
+    return None
+
+
+def memory_footprint(df):
+    """Retorna o número de linhas e os bytes ocupados pelo DataFrame"""
+    return {
+        "linhas": len(df),
+        "bytes": int(df.memory_usage(deep=True).sum()),
+    }
@@ -0,0 +1,175 @@
+"""Simulação de cenários de reposição de estoque sobre a demanda histórica.
+
+A demanda diária de cada estado no período filtrado é reprocessada com uma
+política de ponto de reposição: ao fim de cada dia, se o estoque mais os
+pedidos em trânsito ficam no ponto de reposição mais o estoque de
+segurança, ou abaixo, é feito um pedido que leva essa posição até esse
+nível mais um lote, e o pedido chega `lead_time` dias depois. A demanda
+que o estoque não cobre é perdida (stock out), como em `Demanda_Nao_Atendida`.
+
+Ponto de reposição, estoque de segurança e lote são informados em dias da
+demanda média de cada estado, para que um mesmo cenário sirva a estados de
+tamanhos diferentes. Os estados são simulados juntos, como linhas de um
+array estados × dias: cada dia é um punhado de operações vetorizadas do
+NumPy, então o custo cresce com o número de dias e quase nada com o de
+estados.
+"""
+
+import numpy as np
+import pandas as pd
+
+from aggregations import downsample_statistics
+
+DEMANDA_DIARIA_SQL = """
+    SELECT data, estado, SUM(demanda_diaria) AS demanda_diaria
+    FROM demanda_estoque_diario
+    {where}
+    GROUP BY data, estado
+"""
+
+
+def daily_demand_from_sql(conn, clauses, params):
+    """Demanda por dia e estado lida do rollup `demanda_estoque_diario`"""
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    demanda = pd.read_sql_query(
+        DEMANDA_DIARIA_SQL.format(where=where), conn, params=params
+    )
+    return pd.DataFrame(
+        {
+            "Data": pd.to_datetime(demanda["data"]),
+            "Estado": demanda["estado"],
+            "Demanda_Diaria": demanda["demanda_diaria"].astype("float64"),
+        }
+    )
+
+
+def daily_demand(df, coluna="Demanda_Diaria"):
+    """Soma `coluna` por dia e estado (linhas de estoque ou células do cubo)"""
+    return (
+        df.groupby(["Data", "Estado"], observed=True)[coluna]
+        .sum()
+        .astype("float64")
+        .rename("Demanda_Diaria")
+        .reset_index()
+    )
+
+
+def demand_matrix(demanda):
+    """Converte a demanda por dia e estado em um array estados × dias.
+
+    Os dias vão do primeiro ao último dia com dados, sem lacunas; dias sem
+    registro de um estado entram com demanda zero. Retorna os estados, as
+    datas e o array.
+    """
+    if demanda.empty:
+        return [], pd.DatetimeIndex([]), np.zeros((0, 0))
+    tabela = demanda.pivot_table(
+        index="Estado",
+        columns="Data",
+        values="Demanda_Diaria",
+        aggfunc="sum",
+        fill_value=0.0,
+        observed=True,
+    )
+    datas = pd.date_range(tabela.columns.min(), tabela.columns.max(), freq="D")
+    tabela = tabela.reindex(columns=datas, fill_value=0.0)
+    return list(tabela.index.astype(str)), datas, tabela.to_numpy(dtype="float64")
+
+
+def simulate_inventory(
+    demanda, lead_time=5, ponto_reposicao=5.0, estoque_seguranca=2.0, lote=7.0
+):
+    """Simula o estoque de cada estado dia a dia sob a política de reposição.
+
+    `demanda` é o array estados × dias de `demand_matrix`; `lead_time` é o
+    número de dias (ao menos 1) entre o pedido e a chegada, e os demais
+    parâmetros são dias da demanda média de cada estado. Cada estado começa
+    com o estoque no nível máximo da política. Retorna arrays estados × dias
+    de estoque final, demanda atendida, stock out, pedidos e chegadas.
+    """
+    estados, dias = demanda.shape
+    lead_time = max(int(lead_time), 1)
+    media = demanda.mean(axis=1) if dias else np.zeros(estados)
+    minimo = (ponto_reposicao + estoque_seguranca) * media
+    maximo = minimo + lote * media
+
+    estoque = maximo.copy()
+    em_transito = np.zeros(estados)
+    chegadas = np.zeros((estados, dias + lead_time))
+    resultado = {
+        nome: np.empty((estados, dias))
+        for nome in ("estoque_final", "atendida", "stock_out", "pedidos")
+    }
+    for dia in range(dias):
+        chegada = chegadas[:, dia]
+        estoque += chegada
+        em_transito -= chegada
+
+        atendida = np.minimum(estoque, demanda[:, dia])
+        estoque -= atendida
+
+        posicao = estoque + em_transito
+        pedido = np.where(posicao <= minimo, maximo - posicao, 0.0)
+        chegadas[:, dia + lead_time] += pedido
+        em_transito += pedido
+
+        resultado["estoque_final"][:, dia] = estoque
+        resultado["atendida"][:, dia] = atendida
+        resultado["stock_out"][:, dia] = demanda[:, dia] - atendida
+        resultado["pedidos"][:, dia] = pedido
+    resultado["chegadas"] = chegadas[:, :dias]
+    return resultado
+
+
+def simulation_summary(demanda, estados, resultado):
+    """Resume a simulação por estado: atendimento, stock out, estoque e pedidos"""
+    total = demanda.sum(axis=1)
+    atendida = resultado["atendida"].sum(axis=1)
+    return pd.DataFrame(
+        {
+            "Estado": estados,
+            "Demanda_Diaria": total,
+            "Demanda_Atendida": atendida,
+            "Stock_Out": resultado["stock_out"].sum(axis=1),
+            "Taxa_Atendimento": np.divide(
+                atendida * 100,
+                total,
+                out=np.full(len(estados), np.nan),
+                where=total > 0,
+            ),
+            "Estoque_Final": resultado["estoque_final"].mean(axis=1),
+            "Dias_Stock_Out": (resultado["stock_out"] > 0).sum(axis=1),
+            "Pedidos": (resultado["pedidos"] > 0).sum(axis=1),
+        }
+    )
+
+
+def simulation_series(datas, resultado, diario, max_pontos=None):
+    """Estoque e stock out totais por dia, simulados e históricos.
+
+    `diario` são as estatísticas diárias dos agregados de estoque. Como nas
+    séries de tendência, os dias são agrupados em semanas, meses ou
+    trimestres para caber em `max_pontos` pontos, com médias por dia.
+    Retorna a série e a resolução usada.
+    """
+    simulado = pd.DataFrame(
+        {
+            "Data": datas,
+            "soma_Estoque_Simulado": resultado["estoque_final"].sum(axis=0),
+            "soma_Stock_Out_Simulado": resultado["stock_out"].sum(axis=0),
+        }
+    )
+    historico = diario[["Data", "soma_Estoque_Final", "soma_Stock_Out"]]
+    simulado = simulado.merge(historico, on="Data", how="left").fillna(0.0)
+    estatisticas, resolucao = downsample_statistics(simulado, max_pontos)
+    dias = estatisticas["dias"]
+    serie = pd.DataFrame(
+        {
+            "Data": estatisticas["Data"],
+            "Estoque_Simulado": estatisticas["soma_Estoque_Simulado"] / dias,
+            "Estoque_Historico": estatisticas["soma_Estoque_Final"] / dias,
+            "Stock_Out_Simulado": estatisticas["soma_Stock_Out_Simulado"] / dias,
+            "Stock_Out_Historico": estatisticas["soma_Stock_Out"] / dias,
+        }
+    )
+    return serie, resolucao
@@ -0,0 +1,206 @@
+"""Preparação e medição da inicialização do dashboard.
+
+`python src/startup.py` é executado na subida do contêiner, antes do
+Streamlit: compila o código para bytecode, converte os CSVs para o cache
+colunar (e os importa no DuckDB, no modo duckdb) e garante os índices e
+rollups do banco, para que a primeira sessão não pague por esse trabalho.
+`python src/startup.py --profile` mostra o tempo de importação de cada
+dependência do `main.py` (`python -X importtime`).
+
+O tempo até a primeira renderização de cada processo é registrado por
+`record_render`, chamado ao final de cada execução do `main.py`.
+"""
+
+import argparse
+import compileall
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+SRC_DIR = Path(__file__).resolve().parent
+BASE_DIR = SRC_DIR.parent
+
+# Importações do main.py, na ordem em que acontecem na primeira execução
+APP_MODULES = [
+    "streamlit",
+    "pandas",
+    "dotenv",
+    "aggregations",
+    "columnar_cache",
+    "cube",
+    "dataset",
+    "database",
+    "memo",
+    "monitoring",
+    "rollups",
+    "schema",
+    "simulation",
+    "sketches",
+    "streaming",
+    "startup",
+    "figures",
+]
+
+_lock = threading.Lock()
+_primeira_renderizacao = None
+
+
+def record_render(inicio, importado):
+    """Registra a execução do script; a primeira do processo é reportada no log.
+
+    `inicio` e `importado` são instantes de `time.perf_counter()` no começo
+    do script e ao fim das importações. Retorna os tempos da primeira
+    renderização do processo.
+    """
+    global _primeira_renderizacao
+    fim = time.perf_counter()
+    with _lock:
+        if _primeira_renderizacao is not None:
+            return _primeira_renderizacao
+        _primeira_renderizacao = {
+            "total": fim - inicio,
+            "importacoes": importado - inicio,
+        }
+
+    mensagem = (
+        f"Primeira renderização em {fim - inicio:.2f} s "
+        f"(importações: {importado - inicio:.2f} s)"
+    )
+    objetivo = os.getenv("FIRST_RENDER_SLO")
+    if objetivo and fim - inicio > float(objetivo):
+        mensagem += f" - acima do objetivo de {float(objetivo):.2f} s"
+    print(mensagem)
+    return _primeira_renderizacao
+
+
+def first_render():
+    """Tempos da primeira renderização do processo, ou None se ainda não terminou"""
+    return _primeira_renderizacao
+
+
+def import_profile(modulos=APP_MODULES):
+    """Mede o tempo de importação de cada módulo em um interpretador novo.
+
+    Os módulos são importados em sequência, então cada tempo inclui só as
+    dependências que os anteriores ainda não tinham carregado. Retorna uma
+    lista de (módulo, segundos).
+    """
+    resultado = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modulos)}"],
+        cwd=SRC_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    tempos = {}
+    for linha in resultado.stderr.splitlines():
+        if not linha.startswith("import time:") or "|" not in linha:
+            continue
+        _, acumulado, nome = linha.split("|")
+        # Só os módulos importados diretamente (sem recuo) entram no perfil
+        if nome.startswith("  ") or not acumulado.strip().isdigit():
+            continue
+        tempos[nome.strip()] = int(acumulado) / 1_000_000
+    return [(modulo, tempos.get(modulo, 0.0)) for modulo in modulos]
+
+
+def _etapa(descricao, funcao):
+    inicio = time.perf_counter()
+    try:
+        funcao()
+        print(f"{descricao}: {time.perf_counter() - inicio:.2f} s")
+    except Exception as e:
+        print(f"Erro ao {descricao.lower()}: {e}")
+
+
+def _aquecer_csv():
+    from columnar_cache import read_csv_cached
+    from schema import ESTOQUE_DTYPES, LOGISTICA_DTYPES
+
+    assets_dir = BASE_DIR / "assets"
+    cache_dir = Path(os.getenv("COLUMNAR_CACHE_DIR", BASE_DIR / ".cache"))
+    for nome, dtypes in (
+        ("logistica_simulada.csv", LOGISTICA_DTYPES),
+        ("demanda_estoque.csv", ESTOQUE_DTYPES),
+    ):
+        csv_path = assets_dir / nome
+        if csv_path.exists():
+            read_csv_cached(csv_path, dtypes, cache_dir)
+
+
+def _aquecer_banco(database_url):
+    from database import ConnectionPool, ensure_indexes
+    from rollups import ensure_rollups, refresh_rollups
+
+    pool = ConnectionPool(
+        database_url,
+        max_size=1,
+        connect_timeout=int(os.getenv("DB_CONNECT_TIMEOUT", "10")),
+    )
+    try:
+        ensure_indexes(pool)
+        pool.run(ensure_rollups)
+        pool.run(refresh_rollups, retries=0)
+    finally:
+        pool.close()
+
+
+def _aquecer_duckdb():
+    from embedded import EmbeddedDatabase
+
+    cache_dir = Path(os.getenv("COLUMNAR_CACHE_DIR", BASE_DIR / ".cache"))
+    caminho = Path(os.getenv("DUCKDB_PATH", cache_dir / "assets.duckdb"))
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    banco = EmbeddedDatabase(BASE_DIR / "assets", caminho)
+    try:
+        banco.sync()
+    finally:
+        banco.close()
+
+
+def warm_up():
+    """Prepara bytecode, cache colunar e banco antes de o Streamlit atender"""
+    load_dotenv()
+    inicio = time.perf_counter()
+    _etapa(
+        "Compilar o código para bytecode",
+        lambda: compileall.compile_dir(SRC_DIR, quiet=1),
+    )
+    _etapa("Gerar o cache colunar dos CSVs", _aquecer_csv)
+    if os.getenv("AGGREGATION_MODE", "sql").lower() == "duckdb":
+        _etapa("Importar os arquivos para o DuckDB", _aquecer_duckdb)
+    database_url = os.getenv("DATABASE_URL")
+    if database_url:
+        _etapa(
+            "Preparar índices e rollups do banco",
+            lambda: _aquecer_banco(database_url),
+        )
+    print(f"Aquecimento concluído em {time.perf_counter() - inicio:.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="mostra o tempo de importação das dependências em vez de aquecer",
+    )
+    args = parser.parse_args()
+
+    if not args.profile:
+        warm_up()
+        return
+
+    perfil = import_profile()
+    for modulo, segundos in perfil:
+        print(f"{modulo:<16} {segundos * 1000:8.1f} ms")
+    print(f"{'total':<16} {sum(s for _, s in perfil) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Leitura em blocos para agregar conjuntos de dados maiores que a memória.
+
+As linhas chegam em blocos de tamanho fixo, por um cursor do lado do
+servidor no PostgreSQL ou pelo `chunksize` do `pd.read_csv`, e cada bloco é
+resumido em estatísticas aditivas (somas, contagens e momentos) antes do
+próximo ser lido. A memória usada depende do tamanho do bloco e do número de
+grupos, e não do tamanho da tabela.
+"""
+
+import uuid
+
+import pandas as pd
+
+from aggregations import combine_statistics
+from database import decimal_as_float
+from schema import apply_schema
+
+
+def iter_query_chunks(conn, query, params=None, chunksize=100_000):
+    """Lê o resultado de uma consulta em DataFrames de até `chunksize` linhas.
+
+    Usa um cursor nomeado, que mantém o resultado no servidor e traz apenas
+    um bloco por vez, com NUMERIC já convertido para float. Sempre produz ao
+    menos um bloco, mesmo que vazio, para que quem consome conheça as colunas.
+    """
+    import psycopg2.extensions
+
+    with conn.cursor(name=f"stream_{uuid.uuid4().hex}") as cur:
+        cur.itersize = chunksize
+        psycopg2.extensions.register_type(decimal_as_float(), cur)
+        cur.execute(query, params)
+        primeiro = True
+        while True:
+            linhas = cur.fetchmany(chunksize)
+            if not linhas and not primeiro:
+                break
+            colunas = [descricao[0] for descricao in cur.description]
+            yield pd.DataFrame.from_records(linhas, columns=colunas)
+            if len(linhas) < chunksize:
+                break
+            primeiro = False
+
+
+def iter_csv_chunks(csv_path, dtypes, columns=None, chunksize=100_000):
+    """Lê um CSV em DataFrames de até `chunksize` linhas, já com os tipos do esquema"""
+    with pd.read_csv(csv_path, usecols=columns, chunksize=chunksize) as leitor:
+        for chunk in leitor:
+            yield apply_schema(chunk, dtypes)
+
+
+class StreamingAggregator:
+    """Acumula, bloco a bloco, as estatísticas aditivas de uma seção.
+
+    `estatisticas` resume um bloco de linhas (ex.: `logistica_statistics`).
+    Os resumos são combinados a cada `compactar_a_cada` blocos, então só o
+    bloco atual e os resumos já combinados ficam em memória.
+    """
+
+    def __init__(self, estatisticas, compactar_a_cada=16):
+        self._estatisticas = estatisticas
+        self._compactar_a_cada = compactar_a_cada
+        self._partes = []
+        self.linhas = 0
+        self.blocos = 0
+
+    def add(self, df):
+        """Resume um bloco de linhas e o acrescenta ao acumulado"""
+        self._partes.append(self._estatisticas(df))
+        self.linhas += len(df)
+        self.blocos += 1
+        if len(self._partes) >= self._compactar_a_cada:
+            self._partes = [combine_statistics(self._partes)]
+
+    def consume(self, chunks):
+        """Acrescenta todos os blocos de um iterador"""
+        for chunk in chunks:
+            self.add(chunk)
+        return self
+
+    def result(self):
+        """Retorna as estatísticas combinadas, ou None se nenhum bloco foi lido"""
+        if not self._partes:
+            return None
+        return combine_statistics(self._partes)
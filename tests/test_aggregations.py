@@ -0,0 +1,79 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+import pandas as pd  # noqa: E402
+from aggregations import (  # noqa: E402
+    logistica_aggregates_from_sql,
+    logistica_period_series,
+    logistica_sketch_cells,
+    logistica_sketches,
+    logistica_trend_series,
+    percentile_tables,
+)
+from cube import cube_sketches, sketch_cube  # noqa: E402
+from database import build_filters  # noqa: E402
+from embedded import EmbeddedDatabase  # noqa: E402
+
+ROTAS_CSV = """\
+Rota_ID,Data,Estado,Regiao,Tempo_Resposta_Previsto,Tempo_Resposta_Real,Status,Custo_Logistico_USD,Emissao_CO2_kg
+R0000000,2023-01-13,MG,Sudeste,3.49,3.17,Entregue,378.81,61.56
+R0000001,2023-07-16,MT,Centro-Oeste,2.19,2.12,Atrasado,215.67,56.64
+R0000002,2023-07-17,MT,Centro-Oeste,1.50,1.40,Em Rota,120.00,20.00
+R0000003,2023-07-17,GO,Centro-Oeste,2.80,3.60,Atrasado,260.10,48.20
+R0000004,2023-08-02,MT,Centro-Oeste,1.90,,Entregue,198.40,40.00
+"""
+
+
+def agregar_no_banco(pasta, start_date=None, end_date=None, regioes=None, estados=None):
+    banco = EmbeddedDatabase(pasta)
+    clauses, params = build_filters(start_date, end_date, regioes, estados)
+
+    def ler(conn):
+        sketches = cube_sketches(
+            sketch_cube(*logistica_sketch_cells(conn)),
+            start_date,
+            end_date,
+            regioes,
+            estados,
+        )
+        return logistica_aggregates_from_sql(conn, clauses, params, sketches)
+
+    try:
+        return banco.run(ler)
+    finally:
+        banco.close()
+
+
+def test_filtro_sem_linhas_no_sql(tmp_path):
+    (tmp_path / "logistica_simulada.csv").write_text(ROTAS_CSV)
+    agregados = agregar_no_banco(tmp_path, "2030-01-01", "2030-12-31")
+
+    assert agregados["resumo"]["linhas"] == 0
+    assert agregados["diario"].empty
+    for granularidade in ("dia", "semana", "mes"):
+        assert logistica_period_series(agregados["diario"], granularidade).empty
+    serie, _ = logistica_trend_series(agregados["diario"], 300)
+    assert serie.empty
+    assert all(tabela.empty for tabela in agregados["percentis"].values())
+
+
+def test_percentis_das_celulas_no_sql(tmp_path):
+    # Os sketches por dia × estado, filtrados e combinados, dão os mesmos
+    # percentis que os sketches das linhas filtradas
+    caminho = tmp_path / "logistica_simulada.csv"
+    caminho.write_text(ROTAS_CSV)
+    agregados = agregar_no_banco(tmp_path, "2023-07-01", None, None, ["MT", "GO"])
+
+    df = pd.read_csv(caminho, parse_dates=["Data"])
+    df = df[(df["Status"] != "Em Rota") & (df["Data"] >= "2023-07-01")]
+    esperado = percentile_tables(logistica_sketches(df))
+    for chave, tabela in esperado.items():
+        pd.testing.assert_frame_equal(
+            agregados["percentis"][chave].sort_values([chave, "Medida"]),
+            tabela.sort_values([chave, "Medida"]),
+            check_dtype=False,
+            check_index_type=False,
+            check_like=True,
+        )
@@ -0,0 +1,51 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from cube import estoque_cube, logistica_cube  # noqa: E402
+from dataset import SharedDataset  # noqa: E402
+
+
+def rotas():
+    return pd.DataFrame(
+        {
+            "ID": [3, 1, 2],
+            "Data": pd.to_datetime(["2024-01-03", "2024-01-01", "2024-01-02"]),
+            "Estado": ["PR", "SC", "PR"],
+            "Regiao": ["Sul", "Sul", "Sul"],
+        }
+    )
+
+
+def test_carrega_com_um_csv_ausente():
+    # Um CSV ausente chega como DataFrame vazio, sem colunas
+    dataset = SharedDataset(
+        {"logistica": rotas, "estoque": pd.DataFrame}, lambda: "v1", interval=3600
+    )
+    try:
+        frames = dataset.snapshot()
+        assert frames["logistica"]["ID"].tolist() == [1, 2, 3]
+        assert frames["estoque"].empty
+
+        assert dataset.view("estoque", "2024-01-01", "2024-01-02", ["Sul"]).empty
+        filtrado = dataset.view("logistica", "2024-01-02", None, ["Sul"], ["PR"])
+        assert filtrado["ID"].tolist() == [2, 3]
+    finally:
+        dataset.stop()
+
+
+def test_cubo_de_um_csv_ausente_e_none():
+    dataset = SharedDataset(
+        {"logistica": pd.DataFrame, "estoque": pd.DataFrame},
+        lambda: "v1",
+        interval=3600,
+        cubes={"logistica": logistica_cube, "estoque": estoque_cube},
+    )
+    try:
+        assert dataset.cube("logistica") is None
+        assert dataset.cube("estoque") is None
+    finally:
+        dataset.stop()
@@ -0,0 +1,81 @@
+import sys
+from pathlib import Path
+
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from embedded import EmbeddedConnection  # noqa: E402
+from monitoring import (  # noqa: E402
+    COLUNAS_ROTAS_SQL,
+    TAMANHO_PAGINA,
+    page_from_chunks,
+    route_condition,
+    route_page_from_frame,
+    route_page_from_sql,
+)
+
+
+def rotas_com_datas_repetidas(linhas=120):
+    """Rotas em apenas três dias, com IDs fora da ordem das linhas"""
+    gerador = np.random.default_rng(0)
+    return pd.DataFrame(
+        {
+            "ID": gerador.permutation(linhas).astype("int32") + 1,
+            "Rota_ID": [f"R{i:07d}" for i in range(linhas)],
+            "Data": pd.to_datetime("2024-01-01")
+            + pd.to_timedelta(gerador.integers(0, 3, linhas), unit="D"),
+            "Estado": gerador.choice(["PR", "SC", "RS"], linhas),
+            "Regiao": "Sul",
+            "Status": gerador.choice(["Entregue", "Atrasado"], linhas),
+            "Tempo_Resposta_Real": gerador.uniform(1, 10, linhas),
+            "Custo_Logistico_USD": gerador.uniform(100, 500, linhas),
+            "Emissao_CO2_kg": gerador.uniform(10, 90, linhas),
+        }
+    )
+
+
+def ler_pagina_sql(df, pagina, ocorrencia="todas"):
+    banco = duckdb.connect()
+    tabela = df.rename(columns=str.lower)
+    banco.register("origem", tabela)
+    banco.execute("CREATE TABLE logistica AS SELECT * FROM origem")
+    try:
+        return route_page_from_sql(
+            EmbeddedConnection(banco.cursor()), [], [], ocorrencia, "", pagina
+        )
+    finally:
+        banco.close()
+
+
+@pytest.mark.parametrize("ocorrencia", ["todas", "atrasadas"])
+@pytest.mark.parametrize("pagina", [0, 1, 2])
+def test_paginas_do_frame_e_do_banco_coincidem_com_datas_repetidas(pagina, ocorrencia):
+    df = rotas_com_datas_repetidas()
+    pagina_frame, total_frame = route_page_from_frame(df, ocorrencia, "", pagina)
+    pagina_sql, total_sql = ler_pagina_sql(df, pagina, ocorrencia)
+
+    assert total_frame == total_sql
+    assert len(pagina_frame) == min(
+        TAMANHO_PAGINA, total_frame - pagina * TAMANHO_PAGINA
+    )
+    assert pagina_frame["Rota_ID"].tolist() == pagina_sql["Rota_ID"].tolist()
+
+
+@pytest.mark.parametrize("com_id", [True, False])
+def test_paginas_do_frame_e_dos_blocos_coincidem_com_datas_repetidas(com_id):
+    df = rotas_com_datas_repetidas()
+    if not com_id:
+        df = df.drop(columns="ID")
+    blocos = [df.iloc[inicio : inicio + 17] for inicio in range(0, len(df), 17)]
+
+    for pagina in range(3):
+        pagina_frame, total_frame = route_page_from_frame(df, "todas", "", pagina)
+        pagina_blocos, total_blocos = page_from_chunks(
+            blocos, route_condition, list(COLUNAS_ROTAS_SQL), pagina
+        )
+        assert total_frame == total_blocos
+        pd.testing.assert_frame_equal(pagina_frame, pagina_blocos)